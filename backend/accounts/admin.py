@@ -31,9 +31,11 @@ class CurrencyAdmin(admin.ModelAdmin):
 
 @admin.register(UserCurrency)
 class UserCurrencyAdmin(admin.ModelAdmin):
-    list_display = ('user', 'currency', 'balance')
+    list_display = ('user', 'currency', 'balance', 'snapshot_at')
     search_fields = ('user__email', 'currency')
     ordering = ('user', 'currency')
+    # Balances are snapshots of the currency ledger; adjust them with mint/burn entries instead.
+    readonly_fields = ('balance', 'snapshot_transaction_id', 'snapshot_at')
 
 # Transaction admin now in transactions app
 
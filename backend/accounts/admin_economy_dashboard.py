@@ -1,39 +1,43 @@
-
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
-from accounts.models import User, UserCurrency
-from items.models import Item, InventoryItem
-from transactions.models import InventoryTransaction, CurrencyTransaction
-from django.db.models import Sum, Count, F
+from accounts.models import UserCurrency
+from items.models import InventoryItem, InventorySummary
+from transactions.models import (
+    InventoryTransaction, CurrencyTransaction, CurrencyCirculation, ItemCirculation, UserTransactionHour, LARGE_TRANSACTION_THRESHOLD,
+)
+from django.db.models import Sum, F
 from django.utils import timezone
 from datetime import timedelta
 
+# Every panel reads a rollup from transactions.rollups or walks an index for its top N,
+# so the page cost does not grow with the transaction tables.
 @staff_member_required
 def economy_dashboard(request):
     # Total currency in circulation by type
-    currency_totals = UserCurrency.objects.values('currency').annotate(total=Sum('balance')).order_by('-total')
+    currency_totals = CurrencyCirculation.objects.select_related('currency').order_by('-total')
     # Top users by currency balance
-    top_balances = UserCurrency.objects.values('user__email', 'currency').annotate(balance=Sum('balance')).order_by('-balance')[:10]
+    top_balances = UserCurrency.objects.values('user__email', 'currency', 'balance').order_by('-balance')[:10]
     # Top users by inventory quantity
-    top_inventory = InventoryItem.objects.values('user__email').annotate(total_items=Sum('quantity')).order_by('-total_items')[:10]
+    top_inventory = InventorySummary.objects.values('user__email', total_items=F('total_quantity')).order_by('-total_quantity')[:10]
     # Most traded items
-    most_traded_items = InventoryTransaction.objects.values('item__name').annotate(trades=Count('id')).order_by('-trades')[:10]
+    most_traded_items = ItemCirculation.objects.values('item__name', trades=F('transactions')).order_by('-transactions')[:10]
     # Most valuable items (by base_price * quantity)
-    item_values = InventoryItem.objects.values('item__name').annotate(
-        total_value=Sum(F('quantity') * F('item__base_price'))
+    item_values = ItemCirculation.objects.values('item__name').annotate(
+        total_value=F('quantity') * F('item__base_price')
     ).order_by('-total_value')[:10]
     # Large transactions (over threshold)
-    threshold = 1000  # Change as needed
-    large_transactions = CurrencyTransaction.objects.filter(amount__gte=threshold).order_by('-timestamp')[:20]
+    # Served by the partial index on CurrencyTransaction, so it must match its condition.
+    threshold = LARGE_TRANSACTION_THRESHOLD
+    large_transactions = CurrencyTransaction.objects.select_related('user', 'currency').filter(amount__gte=threshold).order_by('-id')[:20]
     # Rapid/frequent changes (last 24h, more than N transactions)
     since = timezone.now() - timedelta(days=1)
-    rapid_users = CurrencyTransaction.objects.filter(timestamp__gte=since).values('user__email').annotate(
-        tx_count=Count('id')).filter(tx_count__gte=10).order_by('-tx_count')
+    rapid_users = UserTransactionHour.objects.filter(hour__gte=since).values('user__email').annotate(
+        tx_count=Sum('currency_transactions')).filter(tx_count__gte=10).order_by('-tx_count')
     # Users with high balances or item quantities
-    high_balances = UserCurrency.objects.filter(balance__gte=threshold).order_by('-balance')[:10]
-    high_items = InventoryItem.objects.filter(quantity__gte=threshold).order_by('-quantity')[:10]
+    high_balances = UserCurrency.objects.select_related('user', 'currency').filter(balance__gte=threshold).order_by('-balance')[:10]
+    high_items = InventoryItem.objects.select_related('user', 'item').filter(quantity__gte=threshold).order_by('-quantity')[:10]
     # Recent admin adjustments
-    recent_admin_adjustments = InventoryTransaction.objects.filter(action='admin').order_by('-timestamp')[:20]
+    recent_admin_adjustments = InventoryTransaction.objects.select_related('user', 'item').filter(action='admin').order_by('-id')[:20]
     context = {
         'currency_totals': currency_totals,
         'top_balances': top_balances,
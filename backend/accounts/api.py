@@ -8,6 +8,7 @@ from .serializers import (
     UserProfileSerializer, UserApprovalSerializer, ChangeUsernameSerializer, BanUserSerializer, SetUsernameSerializer
 )
 from items.models import Item, InventoryItem
+from transactions.services import atomic_use_item
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
 from django.contrib.auth import login, authenticate
@@ -77,14 +78,16 @@ class ChangeUsernameView(views.APIView):
             new_username = serializer.validated_data['username']
             user = request.user
             try:
-                item_to_use = InventoryItem.objects.get(user=user, item__name="Username Change")
+                item_to_use = InventoryItem.objects.filter(user=user, item__name="Username Change", quantity__gt=0).first()
+                if item_to_use is None:
+                    raise InventoryItem.DoesNotExist
                 
                 if User.objects.filter(username=new_username).exclude(pk=user.pk).exists():
                     return Response({'error': 'This username is already taken.'}, status=status.HTTP_400_BAD_REQUEST)
 
                 user.username = new_username
                 user.save()
-                item_to_use.delete()
+                atomic_use_item(item_to_use, 'use', 'username_change', {'new_username': new_username})
                 ActivityLog.objects.create(user=user, action="Username Changed", details={'new_username': new_username})
 
                 return Response({'status': 'Username changed successfully!'})
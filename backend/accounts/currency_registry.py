@@ -0,0 +1,55 @@
+from django.conf import settings
+from campus_rpg.snapshot import VersionedSnapshot
+from .models import Currency
+
+
+class CurrencyRegistry(VersionedSnapshot):
+    """
+    Process-local map of every Currency by code and by ID.
+
+    The primary currency, used by shops and payouts that do not name one, is the
+    currency whose code is settings.PRIMARY_CURRENCY_CODE, or the oldest currency if
+    that setting is unset. Saving or deleting a Currency invalidates the registry in
+    every process. The returned Currency instances are shared and must not be mutated.
+    """
+    VERSION_CACHE_KEY = 'accounts:currency_registry_version'
+
+    def __init__(self, version, currencies):
+        super().__init__(version)
+        self._by_code = {currency.code: currency for currency in currencies}
+        self._by_id = {currency.id: currency for currency in currencies}
+        primary_code = getattr(settings, 'PRIMARY_CURRENCY_CODE', None)
+        self._primary = self._by_code.get(primary_code) if primary_code else (currencies[0] if currencies else None)
+
+    @classmethod
+    def build(cls, version):
+        return cls(version, list(Currency.objects.order_by('id')))
+
+    def by_code(self, code):
+        """The Currency with code. Raises Currency.DoesNotExist for unknown codes."""
+        try:
+            return self._by_code[code]
+        except KeyError:
+            raise Currency.DoesNotExist(f"Unknown currency code: {code}")
+
+    def by_id(self, currency_id):
+        """The Currency with currency_id. Raises Currency.DoesNotExist for unknown IDs."""
+        try:
+            return self._by_id[currency_id]
+        except KeyError:
+            raise Currency.DoesNotExist(f"Unknown currency ID: {currency_id}")
+
+    def id_for(self, code):
+        return self.by_code(code).id
+
+    def many(self, codes):
+        """{code: Currency} for codes. Raises Currency.DoesNotExist naming every unknown code."""
+        codes = set(codes)
+        missing = codes - set(self._by_code)
+        if missing:
+            raise Currency.DoesNotExist(f"Unknown currency codes: {', '.join(sorted(missing))}")
+        return {code: self._by_code[code] for code in codes}
+
+    def primary(self):
+        """The primary currency, or None if no currency is configured."""
+        return self._primary
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_game_has_kd_user_total_deaths_user_total_kills_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercurrency',
+            name='snapshot_transaction_id',
+            field=models.BigIntegerField(default=0, help_text='The last CurrencyTransaction included in balance.'),
+        ),
+        migrations.AddField(
+            model_name='usercurrency',
+            name='snapshot_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_usercurrency_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usercurrency',
+            index=models.Index(fields=['-balance'], name='usercurrency_balance_idx'),
+        ),
+    ]
@@ -74,10 +74,17 @@ class Currency(models.Model):
 class UserCurrency(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='currencies')
     currency = models.ForeignKey(Currency, on_delete=models.CASCADE)
+    # The balance as of snapshot_transaction_id. The live balance adds every
+    # CurrencyTransaction after it; see transactions.ledger.
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    snapshot_transaction_id = models.BigIntegerField(default=0, help_text='The last CurrencyTransaction included in balance.')
+    snapshot_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         unique_together = ('user', 'currency')
+        indexes = [
+            models.Index(fields=['-balance'], name='usercurrency_balance_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.currency.code}: {self.balance}"
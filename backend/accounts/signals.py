@@ -1,9 +1,10 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
-from .models import User
+from .models import User, Currency
+from .currency_registry import CurrencyRegistry
 from notifications.notification_utils import send_notification, notify_admins_pending_approval
 
 @receiver(pre_save, sender=User)
@@ -33,3 +34,7 @@ def send_admin_approval_email(sender, instance, **kwargs):
 def notify_admins_on_new_user(sender, instance, created, **kwargs):
     if created and not instance.is_approved:
         notify_admins_pending_approval()
+
+@receiver([post_save, post_delete], sender=Currency)
+def invalidate_currency_registry(sender, **kwargs):
+    CurrencyRegistry.invalidate()
@@ -1,3 +1,34 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from .currency_registry import CurrencyRegistry
+from .models import Currency
 
-# Create your tests here.
+
+class CurrencyRegistryTests(TestCase):
+    def setUp(self):
+        self.game = Currency.objects.create(name='Game Coin', code='game')
+        self.club = Currency.objects.create(name='Club Coin', code='club')
+        CurrencyRegistry._bump_version()
+
+    def test_resolves_codes_without_queries(self):
+        CurrencyRegistry.get()
+        with self.assertNumQueries(0):
+            registry = CurrencyRegistry.get()
+            self.assertEqual(registry.id_for('club'), self.club.id)
+            self.assertEqual(registry.by_id(self.game.id).code, 'game')
+            self.assertEqual(set(registry.many(['game', 'club'])), {'game', 'club'})
+        with self.assertRaises(Currency.DoesNotExist):
+            registry.by_code('gems')
+        with self.assertRaises(Currency.DoesNotExist):
+            registry.many(['game', 'gems'])
+
+    def test_primary_currency(self):
+        self.assertEqual(CurrencyRegistry.get().primary(), self.game)
+        with override_settings(PRIMARY_CURRENCY_CODE='club'):
+            CurrencyRegistry._bump_version()
+            self.assertEqual(CurrencyRegistry.get().primary(), self.club)
+
+    def test_saving_a_currency_invalidates(self):
+        CurrencyRegistry.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Currency.objects.create(name='Gems', code='gems')
+        self.assertEqual(CurrencyRegistry.get().by_code('gems').name, 'Gems')
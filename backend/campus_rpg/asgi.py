@@ -15,6 +15,7 @@ from django.core.asgi import get_asgi_application
 import teams.routing
 import notifications.routing
 import messaging.routing
+import dungeons.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'campus_rpg.settings')
 
@@ -24,7 +25,8 @@ application = ProtocolTypeRouter({
         URLRouter(
             teams.routing.websocket_urlpatterns +
             notifications.routing.websocket_urlpatterns +
-            messaging.routing.websocket_urlpatterns
+            messaging.routing.websocket_urlpatterns +
+            dungeons.routing.websocket_urlpatterns
         )
     ),
 })
@@ -1,7 +1,55 @@
 import os
+from datetime import timedelta
 from celery import Celery
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'campus_rpg.settings')
 app = Celery('campus_rpg')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+
+# WorldTickService scales its per-tick changes to this interval.
+WORLD_TICK_INTERVAL = timedelta(hours=1)
+
+app.conf.beat_schedule = {
+    'resolve-expired-encounters': {
+        'task': 'dungeons.tasks.resolve_expired_encounters',
+        'schedule': 5.0,
+    },
+    'aggregate-dungeon-breaks': {
+        'task': 'dungeons.tasks.aggregate_dungeon_breaks',
+        'schedule': 2.0,
+    },
+    'schedule-world-events': {
+        'task': 'dungeons.tasks.schedule_world_events',
+        'schedule': 60.0,
+    },
+    'world-tick': {
+        'task': 'dungeons.tasks.world_tick',
+        'schedule': WORLD_TICK_INTERVAL,
+    },
+    'snapshot-currency-balances': {
+        'task': 'transactions.tasks.snapshot_currency_balances',
+        'schedule': 60.0,
+    },
+    'fold-economy-rollups': {
+        'task': 'transactions.tasks.fold_economy_rollups',
+        'schedule': 60.0,
+    },
+    'reconcile-item-circulation': {
+        'task': 'transactions.tasks.reconcile_item_circulation',
+        'schedule': 24 * 60 * 60.0,
+    },
+    'sweep-flash-sales': {
+        'task': 'trading.tasks.sweep_flash_sales',
+        'schedule': 30.0,
+    },
+    'verify-currency-ledger': {
+        'task': 'transactions.tasks.verify_currency_ledger',
+        'schedule': 24 * 60 * 60.0,
+        'kwargs': {'repair': True},
+    },
+    'archive-finished-dungeon-runs': {
+        'task': 'dungeons.tasks.archive_finished_runs',
+        'schedule': 24 * 60 * 60.0,
+    },
+}
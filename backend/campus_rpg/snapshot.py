@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.db import transaction
+
+
+class VersionedSnapshot:
+    """
+    Base class for process-local, read-mostly snapshots of database tables.
+
+    Each process builds the snapshot once and keeps it in memory. A version
+    number in the shared cache says which build is current; invalidate() bumps
+    it after the writing transaction commits, and every process rebuilds on its
+    next get(). Subclasses set VERSION_CACHE_KEY and implement build().
+    """
+    VERSION_CACHE_KEY = None
+
+    _instance = None
+
+    def __init__(self, version):
+        self.version = version
+
+    @classmethod
+    def get(cls):
+        version = cls.current_version()
+        if cls._instance is None or cls._instance.version != version:
+            cls._instance = cls.build(version)
+        return cls._instance
+
+    @classmethod
+    def current_version(cls):
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(cls.VERSION_CACHE_KEY, 1, timeout=None)
+            version = cache.get(cls.VERSION_CACHE_KEY, 1)
+        return version
+
+    @classmethod
+    def invalidate(cls):
+        """Bumps the shared version once the surrounding transaction commits."""
+        transaction.on_commit(cls._bump_version)
+
+    @classmethod
+    def _bump_version(cls):
+        cls._instance = None
+        try:
+            cache.incr(cls.VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_CACHE_KEY, 1, timeout=None)
+
+    @classmethod
+    def build(cls, version):
+        raise NotImplementedError
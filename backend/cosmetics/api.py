@@ -6,7 +6,10 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from .models import ProfileBanner, UserBanner
 from .serializers import ProfileBannerSerializer
 from .filters import ProfileBannerFilter
-from accounts.models import Currency, UserCurrency
+from django.db import transaction
+from accounts.models import Currency
+from accounts.currency_registry import CurrencyRegistry
+from transactions import ledger
 from notifications.utils import send_user_notification
 
 class ProfileBannerViewSet(viewsets.ReadOnlyModelViewSet):
@@ -31,22 +34,17 @@ class ProfileBannerViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({'error': 'You already own this banner.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Assume the first currency is the primary one for the shop
-            primary_currency = Currency.objects.first()
+            primary_currency = CurrencyRegistry.get().primary()
             if not primary_currency:
                 return Response({'error': 'Shop currency not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            user_currency, created = UserCurrency.objects.get_or_create(
-                user=user, 
-                currency=primary_currency
-            )
-
-            if user_currency.balance < banner.cost:
-                return Response({'error': 'You do not have enough currency.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            user_currency.balance -= banner.cost
-            user_currency.save()
-            UserBanner.objects.create(user=user, banner=banner)
+            with transaction.atomic():
+                try:
+                    if banner.cost > 0:
+                        ledger.debit(user, primary_currency, banner.cost, 'purchase', 'banner_shop', {'banner_id': banner.id})
+                except ValueError:
+                    return Response({'error': 'You do not have enough currency.'}, status=status.HTTP_400_BAD_REQUEST)
+                UserBanner.objects.create(user=user, banner=banner)
 
             # Send notification to user
             message = f"You purchased the banner '{banner.name}' for {banner.cost} {primary_currency.name}."
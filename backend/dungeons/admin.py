@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Dungeon, Entity, DungeonRun, WorldZone,  PlayerDungeonState, EntityCategory
+from .models import Dungeon, Entity, DungeonRun, ArchivedDungeonRun, WorldZone,  PlayerDungeonState, EntityCategory
 
 
 @admin.register(Dungeon)
@@ -31,6 +31,13 @@ class DungeonRunAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'dungeon__name')
     list_filter = ('dungeon', 'status')
 
+@admin.register(ArchivedDungeonRun)
+class ArchivedDungeonRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'dungeon_name', 'floors_reached', 'status', 'start_time', 'archived_at')
+    search_fields = ('user__email', 'dungeon_name')
+    list_filter = ('status',)
+    exclude = ('payload',)
+    raw_id_fields = ('user', 'dungeon')
 
 
 
@@ -41,7 +48,7 @@ class PlayerDungeonStateAdmin(admin.ModelAdmin):
 
 
 # WORLD EVENTS
-from .models import WorldEvent, WorldEventEffect, EventEffectApplication, ActiveWorldEvent
+from .models import WorldEvent, WorldEventEffect, EventEffectApplication, ActiveWorldEvent, DungeonBreakParticipant
 
 class DungeonInline(admin.TabularInline):
     model = Dungeon
@@ -114,6 +121,13 @@ class ActiveWorldEventAdmin(admin.ModelAdmin):
     readonly_fields = ('start_time',)
     autocomplete_fields = ('event', 'zone')
 
+@admin.register(DungeonBreakParticipant)
+class DungeonBreakParticipantAdmin(admin.ModelAdmin):
+    list_display = ('user', 'active_event', 'damage', 'hits', 'last_attack_at', 'reward_granted')
+    list_filter = ('reward_granted',)
+    search_fields = ('user__username',)
+    raw_id_fields = ('user', 'active_event')
+
 from .models import TacticalApproach
 
 @admin.register(TacticalApproach)
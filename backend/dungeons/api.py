@@ -3,10 +3,15 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 import random
+import hashlib
+import logging
 from .engine import DungeonEngine
+from .run_context import RunConflict
 from .models import Dungeon, DungeonRun, WorldZone, ActiveWorldEvent, PlayerDungeonState, PlayerGate
 from .dungeon_manifest_service import DungeonManifestService
 
+logger = logging.getLogger(__name__)
+
 # --- Placeholder Views ---
 class HunterDashboardView(APIView):
     permission_classes = [IsAuthenticated]
@@ -31,19 +36,47 @@ class DungeonScoutingView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
+from .run_archive_service import RunArchiveService
+
 class DungeonRunView(APIView):
+    """One run with its encounter log, whether it is still live or already archived."""
     permission_classes = [IsAuthenticated]
+    def get(self, request, dungeon_run_id, *args, **kwargs):
+        run = RunArchiveService.get_run(request.user, dungeon_run_id)
+        if run is None:
+            return Response({"error": "Dungeon run not found."}, status=404)
+        return Response(run)
+
+class DungeonRunHistoryView(APIView):
+    """The user's expeditions, newest first, across live and archived runs."""
+    permission_classes = [IsAuthenticated]
+    MAX_LIMIT = 100
     def get(self, request, *args, **kwargs):
-        return Response({"message": "Dungeon Run"})
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), self.MAX_LIMIT)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({"error": "limit and offset must be integers."}, status=400)
+        return Response(RunArchiveService.get_history(request.user, limit=limit, offset=offset))
+
+from .dungeon_break_service import DungeonBreakService
 
 class DungeonBreakActiveView(APIView):
     def get(self, request, *args, **kwargs):
-        return Response({"message": "Dungeon Break Active"})
+        active_event_ids = DungeonBreakService.active_breaks().values_list('id', flat=True)
+        readouts = [DungeonBreakService.get_readout(active_event_id) for active_event_id in active_event_ids]
+        return Response({"dungeon_breaks": [readout for readout in readouts if readout]})
 
 class DungeonBreakParticipateView(APIView):
     permission_classes = [IsAuthenticated]
     def post(self, request, *args, **kwargs):
-        return Response({"message": "Dungeon Break Participate"})
+        active_event_id = request.data.get('active_event_id')
+        if not active_event_id:
+            return Response({"error": "Active event ID is required."}, status=400)
+        try:
+            return Response(DungeonBreakService.attack(request.user, int(active_event_id)))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
 class RedGateDetailView(APIView):
     def get(self, request, *args, **kwargs):
@@ -109,23 +142,37 @@ class WorldZonesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        zones_data = MapDataService.get_map_data(request.user)
-        active_run = DungeonRun.objects.filter(user=request.user, status__in=['in_progress', 'advancing']).first()
+        map_data = MapDataService.get_cached_map(request.user)
+        active_run = DungeonRun.objects.filter(user=request.user, status__in=['in_progress', 'advancing']).values('id', 'dungeon_id').first()
         active_run_data = {
-            'id': active_run.id,
-            'dungeon_id': active_run.dungeon.id
+            'id': active_run['id'],
+            'dungeon_id': active_run['dungeon_id']
         } if active_run else None
 
-        return Response({
-            'zones': zones_data,
+        etag = None
+        if map_data['etag']:
+            etag = '"{}"'.format(hashlib.md5(f"{map_data['etag']}:{active_run_data}".encode()).hexdigest())
+            if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+                response = Response(status=304)
+                response['ETag'] = etag
+                return response
+
+        response = Response({
+            'zones': map_data['zones'],
             'active_run': active_run_data,
+            'manifest_status': map_data['status'],
         })
+        if etag:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
 
 from accounts.leveling_service import LevelingService
 from .loot_services import LootService
 from items.models import Item
+from accounts.currency_registry import CurrencyRegistry
 from django.db import transaction
-from transactions.services import atomic_item_currency_transfer
+from transactions.services import atomic_item_currency_transfer, atomic_batch_item_grant
 
 class ClaimRewardsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -137,13 +184,14 @@ class ClaimRewardsView(APIView):
             return Response({"error": "Dungeon Run ID is required."}, status=400)
 
         try:
-            dungeon_run = DungeonRun.objects.get(id=dungeon_run_id, user=request.user)
+            dungeon_run = DungeonRun.objects.select_for_update().get(id=dungeon_run_id, user=request.user)
             if not dungeon_run.unclaimed_rewards:
                 return Response({"message": "No rewards to claim."})
 
             total_xp = 0
             total_coins = 0
-            items_granted = []
+            item_quantities = {}
+            reward_item_ids = []
 
             for reward_group in dungeon_run.unclaimed_rewards:
                 total_xp += reward_group.get('xp', 0)
@@ -154,32 +202,41 @@ class ClaimRewardsView(APIView):
                         item_id = item_data.get('item_id') or item_data.get('id')
                         if not item_id:
                             continue
-
                         quantity = item_data.get('quantity', 1)
-                        item_to_add = Item.objects.get(id=item_id)
-                        atomic_item_currency_transfer(
-                            user=request.user,
-                            item=item_to_add,
-                            item_delta=quantity,
-                            currency='GAME_COIN',
-                            currency_delta=0,
-                            action='DUNGEON_REWARD',
-                            source=f"Dungeon Run: {dungeon_run.id}",
-                            metadata={'dungeon_run_id': dungeon_run.id}
-                        )
-                        items_granted.append(item_to_add.name)
-                    except Item.DoesNotExist:
-                        failed_item_id = item_data.get('item_id') or item_data.get('id', 'N/A')
-                        print(f"Could not find item with ID {failed_item_id} to grant as a reward.")
-                    except (KeyError, TypeError):
-                        print(f"Malformed item data in reward group: {item_data}")
+                        item_quantities[item_id] = item_quantities.get(item_id, 0) + quantity
+                        reward_item_ids.append(item_id)
+                    except (AttributeError, TypeError):
+                        logger.warning("Malformed item data in reward group of dungeon run %s: %r", dungeon_run.id, item_data)
+
+            # Coins are paid in the primary currency; check it exists before granting anything.
+            currency = CurrencyRegistry.get().primary()
+            if currency is None and total_coins:
+                return Response({"error": "No currency is configured for rewards."}, status=500)
+
+            try:
+                granted_items, _ = atomic_batch_item_grant(
+                    user=request.user,
+                    item_quantities=item_quantities,
+                    action='DUNGEON_REWARD',
+                    source=f"Dungeon Run: {dungeon_run.id}",
+                    metadata={'dungeon_run_id': dungeon_run.id}
+                )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+
+            items_granted = []
+            for item_id in reward_item_ids:
+                if item_id in granted_items:
+                    items_granted.append(granted_items[item_id].name)
+                else:
+                    logger.warning("Could not find item with ID %s to grant as a reward for dungeon run %s.", item_id, dungeon_run.id)
 
             LevelingService.add_xp(request.user, total_xp)
             atomic_item_currency_transfer(
                 user=request.user,
                 item=None,
                 item_delta=0,
-                currency='GAME_COIN',
+                currency=currency.code if currency else None,
                 currency_delta=total_coins,
                 action='DUNGEON_REWARD',
                 source=f"Dungeon Run: {dungeon_run.id}",
@@ -187,12 +244,14 @@ class ClaimRewardsView(APIView):
             )
 
             dungeon_run.unclaimed_rewards = []
-            dungeon_run.save()
+            dungeon_run.version += 1
+            dungeon_run.save(update_fields=['unclaimed_rewards', 'version'])
 
             # Mark the gate as completed
             player_gate = PlayerGate.objects.get(user=request.user, dungeon=dungeon_run.dungeon)
             player_gate.is_completed = True
             player_gate.save()
+            MapDataService.invalidate([request.user.id])
 
             return Response({
                 "message": "Rewards claimed successfully!",
@@ -205,6 +264,27 @@ class ClaimRewardsView(APIView):
 
 
 # --- Interactive Expedition Views ---
+def run_conflict_response(engine, dungeon_run_id, conflict):
+    """
+    409 with the run's current state, so the client can re-render instead of retrying blindly.
+    The state is None if the run is gone, as when the conflict rolled back the request that created it.
+    """
+    try:
+        state = engine.get_run_state(dungeon_run_id)
+    except DungeonRun.DoesNotExist:
+        state = None
+    return Response({"error": str(conflict), "conflict": True, "state": state}, status=409)
+
+def create_run_from_gate(user, player_gate):
+    return DungeonRun.objects.create(
+        user=user,
+        dungeon=player_gate.dungeon,
+        total_floors=player_gate.total_floors,
+        encounter_log=player_gate.encounter_log,
+        seed=player_gate.seed,
+        content_version=player_gate.content_version,
+    )
+
 class StartExpeditionView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -214,7 +294,7 @@ class StartExpeditionView(APIView):
             return Response({"error": "Gate ID is required."}, status=400)
 
         try:
-            player_gate = PlayerGate.objects.get(user=request.user, id=gate_id)
+            player_gate = PlayerGate.objects.select_related('dungeon').get(user=request.user, id=gate_id)
         except PlayerGate.DoesNotExist:
             return Response({"error": "Gate not found for this player."}, status=404)
 
@@ -223,22 +303,51 @@ class StartExpeditionView(APIView):
         if player_gate.is_lost:
             return Response({"error": "This gate has been lost and cannot be re-entered today."}, status=400)
 
+        if request.data.get('preview'):
+            return Response({'gate_id': player_gate.id, 'forecast': DungeonEngine(request.user).forecast_gate(player_gate)})
+
         active_run = DungeonRun.objects.filter(user=request.user, status__in=['in_progress', 'advancing']).first()
         if active_run:
             return Response({'run_id': active_run.id, 'message': 'Active run already in progress.'}, status=200)
 
-        dungeon_run = DungeonRun.objects.create(
-            user=request.user,
-            dungeon=player_gate.dungeon,
-            total_floors=player_gate.total_floors,
-            encounter_log=player_gate.encounter_log
-        )
+        dungeon_run = create_run_from_gate(request.user, player_gate)
 
         engine = DungeonEngine(request.user)
         run_state = engine.start_expedition(dungeon_run.id)
+        dungeon_run.refresh_from_db()
+        # A copy, since the published state may not have been sent yet.
+        run_state = {**run_state, 'forecast': engine.forecast_run(dungeon_run)}
 
         return Response(run_state)
 
+class AutoExpeditionView(APIView):
+    """Resolves a whole expedition in one request, for gates the player outlevels."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        dungeon_run_id = request.data.get('dungeon_run_id')
+        gate_id = request.data.get('gate_id')
+        if not dungeon_run_id and not gate_id:
+            return Response({"error": "Dungeon Run ID or Gate ID is required."}, status=400)
+
+        engine = DungeonEngine(request.user)
+        try:
+            with transaction.atomic():
+                if not dungeon_run_id:
+                    player_gate = PlayerGate.objects.get(user=request.user, id=gate_id)
+                    if player_gate.is_completed or player_gate.is_lost:
+                        return Response({"error": "This gate cannot be entered again today."}, status=400)
+                    if DungeonRun.objects.filter(user=request.user, status__in=['in_progress', 'advancing']).exists():
+                        return Response({"error": "Finish your active run first."}, status=400)
+                    dungeon_run_id = create_run_from_gate(request.user, player_gate).id
+                return Response(engine.auto_expedition(dungeon_run_id))
+        except (PlayerGate.DoesNotExist, DungeonRun.DoesNotExist):
+            return Response({"error": "Gate or dungeon run not found."}, status=404)
+        except RunConflict as e:
+            return run_conflict_response(engine, dungeon_run_id, e)
+        except Exception as e:
+            return Response({"error": str(e)}, status=400)
+
 class DungeonRunStateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -266,6 +375,8 @@ class AdvanceFloorView(APIView):
         try:
             run_state = engine.advance_floor(dungeon_run_id, choice_id)
             return Response(run_state)
+        except RunConflict as e:
+            return run_conflict_response(engine, dungeon_run_id, e)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
@@ -281,6 +392,8 @@ class AdvanceEncounterView(APIView):
         try:
             run_state = engine.advance_encounter(dungeon_run_id)
             return Response(run_state)
+        except RunConflict as e:
+            return run_conflict_response(engine, dungeon_run_id, e)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
@@ -296,6 +409,8 @@ class ProceedToNextEncounterView(APIView):
         try:
             run_state = engine.proceed_to_next_encounter(dungeon_run_id)
             return Response(run_state)
+        except RunConflict as e:
+            return run_conflict_response(engine, dungeon_run_id, e)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
@@ -311,6 +426,8 @@ class AbandonExpeditionView(APIView):
         try:
             result = engine.abandon_expedition(dungeon_run_id)
             return Response(result)
+        except RunConflict as e:
+            return run_conflict_response(engine, dungeon_run_id, e)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+class DungeonsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'dungeons'
+
+    def ready(self):
+        import dungeons.signals
@@ -0,0 +1,143 @@
+from collections import namedtuple
+import numpy as np
+from django.db.models import Avg
+from items.models import Item
+from .models import Entity
+from .encounter_services import EncounterService
+from .entity_catalog import EntityCatalog
+from .floor_generation_service import FloorGenerationService
+from .dungeon_manifest_service import DungeonManifestService
+from .loot_services import LootService
+from .loot_tables import rarity_weights
+from .engine import BASE_PLAYER_POWER_MULTIPLIER, DEFAULT_FLOOR_DURATION_MINUTES
+
+# Squads spend at least 60% of a floor's budget and bosses are the strongest that fit,
+# so encounter power is modelled as a uniform fraction of the budget in this range.
+# The final floor is the exception: it always fields the rank's strongest final boss.
+DEFAULT_BUDGET_SPEND = (0.6, 1.0)
+GUARDIAN_AVERAGE_DROPS = 1.5
+BATCH_SIZE = 250_000
+
+
+class LootModel(namedtuple('LootModel', ['xp_per_power', 'coins_per_power', 'rarity_values'])):
+    """How much loot one point of encounter power is worth, and what an item of each rarity is worth."""
+
+    @classmethod
+    def from_database(cls, rank):
+        entities = Entity.objects.filter(rank=rank, power__gt=0).aggregate(
+            power=Avg('power'), min_xp=Avg('min_xp'), max_xp=Avg('max_xp'),
+            min_coins=Avg('min_coins'), max_coins=Avg('max_coins'),
+        )
+        power = float(entities['power'] or 0)
+        xp = (float(entities['min_xp'] or 0) + float(entities['max_xp'] or 0)) / 2
+        coins = (float(entities['min_coins'] or 0) + float(entities['max_coins'] or 0)) / 2
+        rarity_values = {
+            row['rarity']: float(row['value'] or 0)
+            for row in Item.objects.values('rarity').annotate(value=Avg('base_price'))
+        }
+        return cls(
+            xp_per_power=xp / power if power else 0.0,
+            coins_per_power=coins / power if power else 0.0,
+            rarity_values=rarity_values,
+        )
+
+
+def _expected_item_value(rank_chances, rarity_values):
+    weights = rarity_weights(rank_chances)
+    return sum(chance * rarity_values.get(rarity, 0.0) for rarity, chance in weights.items())
+
+
+def _budget_table(rank, min_floors, max_floors):
+    """budget[total_floors, floor] from FloorGenerationService._calculate_budget; zero past the last floor."""
+    table = np.zeros((max_floors + 1, max_floors + 1))
+    for total_floors in range(min_floors, max_floors + 1):
+        for floor in range(1, total_floors + 1):
+            table[total_floors, floor] = FloorGenerationService._calculate_budget(rank, total_floors, floor)
+    return table
+
+
+def strongest_final_boss_power(rank):
+    """The power of the final boss generate_floor fields for the rank, or None if the catalog has none."""
+    boss = EntityCatalog.get().pool_for_type('final_boss', rank).strongest()
+    return boss.power if boss else None
+
+
+def _success_chance_table(player_power, max_encounter_power):
+    """success_chance[encounter_power] from EncounterService.calculate_success_chance, as a fraction."""
+    return np.array([
+        EncounterService.calculate_success_chance(player_power, encounter_power) / 100
+        for encounter_power in range(max_encounter_power + 1)
+    ])
+
+
+def simulate_expeditions(rank, level, anima, runs=100_000, loot_model=None, seed=None,
+                         budget_spend=DEFAULT_BUDGET_SPEND, floor_minutes=DEFAULT_FLOOR_DURATION_MINUTES,
+                         final_boss_power=None):
+    """
+    Simulates `runs` expeditions of a rank for a player of a level with `anima` lives,
+    following DungeonEngine's rules: one encounter per floor, a lost encounter costs one
+    Anima and yields no loot, and the run fails when Anima reaches zero. All runs of a
+    batch are simulated at once as (runs x floors) arrays.
+
+    The final floor has final_boss_power, by default that of the rank's strongest final
+    boss in the entity catalog. Without one it is modelled like any other floor.
+    """
+    rng = np.random.default_rng(seed)
+    loot_model = loot_model or LootModel(0.0, 0.0, {})
+    min_floors, max_floors = DungeonManifestService.MIN_FLOORS, DungeonManifestService.MAX_FLOORS
+
+    player_power = level * BASE_PLAYER_POWER_MULTIPLIER
+    budgets = _budget_table(rank, min_floors, max_floors)
+    if final_boss_power is None:
+        final_boss_power = strongest_final_boss_power(rank)
+    chances = _success_chance_table(player_power, int(max(budgets.max(), final_boss_power or 0)))
+    floor_numbers = np.arange(1, max_floors + 1)
+    item_value = _expected_item_value(LootService.RARITY_CHANCES.get(rank, LootService.RARITY_CHANCES['E']), loot_model.rarity_values)
+    guardian_item_value = GUARDIAN_AVERAGE_DROPS * _expected_item_value(
+        LootService.GUARDIAN_RARITY_CHANCES.get(rank, LootService.GUARDIAN_RARITY_CHANCES['E']), loot_model.rarity_values
+    )
+
+    totals = {'cleared': 0, 'floors_won': 0, 'floors_played': 0, 'xp': 0.0, 'coins': 0.0, 'item_value': 0.0}
+    remaining = runs
+    while remaining > 0:
+        batch = min(remaining, BATCH_SIZE)
+        remaining -= batch
+
+        total_floors = rng.integers(min_floors, max_floors + 1, size=batch)
+        in_run = floor_numbers[None, :] <= total_floors[:, None]
+        is_final = floor_numbers[None, :] == total_floors[:, None]
+        spend = rng.uniform(budget_spend[0], budget_spend[1], size=in_run.shape)
+        powers = np.floor(budgets[total_floors[:, None], floor_numbers[None, :]] * spend).astype(np.int64)
+        if final_boss_power is not None:
+            powers = np.where(is_final, final_boss_power, powers)
+
+        success = rng.random(in_run.shape) < chances[powers]
+        failures = in_run & ~success
+        failures_before = np.cumsum(failures, axis=1) - failures
+        alive = in_run & (failures_before < anima)
+        won = alive & success
+
+        # Final bosses drop double XP and coins.
+        loot_power = float((won * powers * np.where(is_final, 2, 1)).sum())
+        totals['cleared'] += int(((failures & alive).sum(axis=1) < anima).sum())
+        totals['floors_won'] += int(won.sum())
+        totals['floors_played'] += int(alive.sum())
+        totals['xp'] += loot_power * loot_model.xp_per_power
+        totals['coins'] += loot_power * loot_model.coins_per_power
+        totals['item_value'] += float((won & ~is_final).sum()) * item_value + float((won & is_final).sum()) * guardian_item_value
+
+    hours = totals['floors_played'] * floor_minutes / 60
+    return {
+        'rank': rank,
+        'level': level,
+        'anima': anima,
+        'player_power': player_power,
+        'runs': runs,
+        'clear_rate': totals['cleared'] / runs,
+        'floors_won_per_run': totals['floors_won'] / runs,
+        'xp_per_run': totals['xp'] / runs,
+        'coins_per_run': totals['coins'] / runs,
+        'item_value_per_run': totals['item_value'] / runs,
+        'xp_per_hour': totals['xp'] / hours if hours else 0.0,
+        'coins_per_hour': totals['coins'] / hours if hours else 0.0,
+    }
@@ -0,0 +1,71 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from .models import DungeonRun
+from .engine import DungeonEngine
+from .run_updates import run_group_name, WORLD_GROUP_NAME
+
+class DungeonRunConsumer(AsyncWebsocketConsumer):
+    """Streams a dungeon run's state to its owner whenever the run changes."""
+
+    async def connect(self):
+        self.user = self.scope['user']
+        self.run_id = int(self.scope['url_route']['kwargs']['run_id'])
+
+        if self.user.is_anonymous:
+            await self.close()
+            return
+
+        state = await self.get_run_state()
+        if state is None:
+            await self.close()
+            return
+
+        self.room_group_name = run_group_name(self.run_id)
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await self.accept()
+
+        # Send the current state straight away so the client has something to render.
+        await self.send(text_data=json.dumps({
+            'event': 'snapshot',
+            'state': state,
+        }))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+
+    # Called by publish_run_state for every committed run transition
+    async def run_update(self, event):
+        await self.send(text_data=json.dumps({
+            'event': event['event'],
+            'state': event['state'],
+        }))
+
+    @database_sync_to_async
+    def get_run_state(self):
+        try:
+            return DungeonEngine(self.user).get_run_state(self.run_id)
+        except DungeonRun.DoesNotExist:
+            return None
+
+
+class WorldUpdatesConsumer(AsyncWebsocketConsumer):
+    """Streams instability, anomaly and zone saturation changes from each world tick."""
+
+    async def connect(self):
+        if self.scope['user'].is_anonymous:
+            await self.close()
+            return
+        await self.channel_layer.group_add(WORLD_GROUP_NAME, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(WORLD_GROUP_NAME, self.channel_name)
+
+    # Called by publish_world_changes after every tick that changed something
+    async def world_update(self, event):
+        await self.send(text_data=json.dumps({
+            'event': 'world_tick',
+            'changes': event['changes'],
+        }))
@@ -0,0 +1,227 @@
+import random
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import WorldEvent, ActiveWorldEvent, DungeonBreakDamageShard, DungeonBreakParticipant
+from .entity_catalog import EntityCatalog
+from .player_stats_service import PlayerStatService
+from .services import WorldEventService
+from .world_event_modifiers import WorldEventModifiers
+
+READOUT_CACHE_KEY = 'dungeons:break_readout:{active_event_id}'
+COOLDOWN_CACHE_KEY = 'dungeons:break_cooldown:{active_event_id}:{user_id}'
+
+
+class DungeonBreakService:
+    """
+    Mass-participation boss fights on DUNGEON_BREAK world events.
+
+    Each attack adds its damage to one of SHARD_COUNT counter rows picked at random and
+    to the attacker's own participant row, so concurrent attackers rarely touch the same
+    row. The shards are summed into the event's current_state by aggregate(), which runs
+    periodically and whenever a cached readout goes stale, so the HP players see is at
+    most READOUT_MAX_AGE seconds old. When the boss falls, rewards are paid to every
+    participant in batches.
+    """
+    SHARD_COUNT = 32
+    READOUT_MAX_AGE = 2
+    ATTACK_COOLDOWN_SECONDS = 3
+    DAMAGE_VARIANCE = (0.8, 1.2)
+    BOSS_HP_PER_POWER = 500
+    COIN_POOL_PER_POWER = 100
+    PARTICIPATION_COINS = 25
+    REWARD_BATCH_SIZE = 500
+
+    @staticmethod
+    def start_break(dungeon):
+        """
+        Starts a Dungeon Break in the dungeon's zone against the strongest final boss
+        of its rank. Returns the ActiveWorldEvent, or None if no break can be started.
+        """
+        event = WorldEvent.objects.filter(event_type='DUNGEON_BREAK').order_by('id').first()
+        if event is None or dungeon.zone_id is None:
+            return None
+        if DungeonBreakService.active_breaks().filter(zone_id=dungeon.zone_id).exists():
+            return None
+
+        catalog = EntityCatalog.get()
+        boss = catalog.pool(dungeon, [dungeon.rank], 'final_boss').strongest() or catalog.pool_for_type('final_boss', dungeon.rank).strongest()
+        if boss is None:
+            return None
+
+        with transaction.atomic():
+            active_event = WorldEventService.trigger_event(event.identifier, dungeon.zone, triggered_by='system')
+            active_event.current_state = {
+                'status': 'active',
+                'dungeon_id': dungeon.id,
+                'boss': {'entity_id': boss.id, 'name': boss.name, 'rank': boss.rank},
+                'max_hp': boss.power * DungeonBreakService.BOSS_HP_PER_POWER,
+                'hp': boss.power * DungeonBreakService.BOSS_HP_PER_POWER,
+                'damage': 0,
+                'participants': 0,
+                'coin_pool': boss.power * DungeonBreakService.COIN_POOL_PER_POWER,
+                'aggregated_at': timezone.now().isoformat(),
+            }
+            ActiveWorldEvent.objects.filter(pk=active_event.pk).update(current_state=active_event.current_state)
+            DungeonBreakDamageShard.objects.bulk_create([
+                DungeonBreakDamageShard(active_event=active_event, shard=shard)
+                for shard in range(DungeonBreakService.SHARD_COUNT)
+            ])
+        return active_event
+
+    @staticmethod
+    def active_breaks():
+        return ActiveWorldEvent.objects.filter(event__event_type='DUNGEON_BREAK', is_active=True)
+
+    @staticmethod
+    def attack(user, active_event_id):
+        """
+        Deals one hit of the player's stat sheet power (with some variance) to the boss.
+        Raises ValueError if the boss cannot be attacked or the player is on cooldown.
+        """
+        readout = DungeonBreakService.get_readout(active_event_id)
+        if readout is None:
+            raise ValueError("Dungeon Break not found.")
+        if readout['status'] != 'active' or timezone.now() > parse_datetime(readout['end_time']):
+            raise ValueError("This Dungeon Break is over.")
+        cooldown_key = COOLDOWN_CACHE_KEY.format(active_event_id=active_event_id, user_id=user.id)
+        if not cache.add(cooldown_key, True, DungeonBreakService.ATTACK_COOLDOWN_SECONDS):
+            raise ValueError("You are still recovering from your last attack.")
+
+        power = PlayerStatService.get_stat_sheet(user)['power']
+        damage = max(1, int(power * random.uniform(*DungeonBreakService.DAMAGE_VARIANCE)))
+        now = timezone.now()
+
+        with transaction.atomic():
+            # The readout may be up to READOUT_MAX_AGE old; the event row is authoritative once the boss is down.
+            hit = DungeonBreakDamageShard.objects.filter(
+                active_event_id=active_event_id, active_event__is_active=True,
+                shard=random.randrange(DungeonBreakService.SHARD_COUNT),
+            ).update(damage=F('damage') + damage)
+            if not hit:
+                raise ValueError("This Dungeon Break is over.")
+
+            participant_update = {'damage': F('damage') + damage, 'hits': F('hits') + 1, 'last_attack_at': now}
+            participants = DungeonBreakParticipant.objects.filter(active_event_id=active_event_id, user=user)
+            if not participants.update(**participant_update):
+                try:
+                    with transaction.atomic():
+                        DungeonBreakParticipant.objects.create(
+                            active_event_id=active_event_id, user=user, damage=damage, hits=1, last_attack_at=now
+                        )
+                except IntegrityError:
+                    participants.update(**participant_update)
+
+        return {'damage': damage, 'boss': readout}
+
+    @staticmethod
+    def get_readout(active_event_id):
+        """The boss's state, at most READOUT_MAX_AGE seconds old. None if there is no such break."""
+        readout = cache.get(READOUT_CACHE_KEY.format(active_event_id=active_event_id))
+        if readout is None:
+            active_event = ActiveWorldEvent.objects.filter(pk=active_event_id, event__event_type='DUNGEON_BREAK').first()
+            if active_event is None:
+                return None
+            readout = DungeonBreakService.aggregate(active_event)
+        return readout
+
+    @staticmethod
+    def aggregate(active_event):
+        """
+        Sums the damage shards into the event's current_state, marks the boss defeated
+        (and queues rewards) or escaped, and refreshes the cached readout.
+        """
+        from .tasks import distribute_dungeon_break_rewards
+
+        now = timezone.now()
+        state = dict(active_event.current_state)
+        if state.get('status') == 'active':
+            totals = DungeonBreakDamageShard.objects.filter(active_event=active_event).aggregate(damage=Sum('damage'))
+            state['damage'] = totals['damage'] or 0
+            state['hp'] = max(state['max_hp'] - state['damage'], 0)
+            state['participants'] = DungeonBreakParticipant.objects.filter(active_event=active_event).count()
+            state['aggregated_at'] = now.isoformat()
+            if state['hp'] == 0:
+                state['status'] = 'defeated'
+                state['defeated_at'] = now.isoformat()
+            elif now > active_event.end_time:
+                state['status'] = 'escaped'
+
+            with transaction.atomic():
+                # Only the active -> defeated/escaped transition may be written once.
+                updated = ActiveWorldEvent.objects.filter(
+                    pk=active_event.pk, current_state__status='active'
+                ).update(current_state=state, is_active=state['status'] == 'active')
+                if updated and state['status'] == 'defeated':
+                    transaction.on_commit(lambda: distribute_dungeon_break_rewards.delay(active_event.pk))
+                if updated and state['status'] != 'active':
+                    WorldEventModifiers.invalidate()
+            active_event.current_state = state
+
+        readout = {
+            'id': active_event.pk,
+            'zone_id': active_event.zone_id,
+            'end_time': active_event.end_time.isoformat(),
+            **{key: state.get(key) for key in ('status', 'boss', 'max_hp', 'hp', 'damage', 'participants', 'aggregated_at')},
+        }
+        cache.set(READOUT_CACHE_KEY.format(active_event_id=active_event.pk), readout, DungeonBreakService.READOUT_MAX_AGE)
+        return readout
+
+    @staticmethod
+    def aggregate_active_breaks():
+        return [DungeonBreakService.aggregate(active_event) for active_event in DungeonBreakService.active_breaks()]
+
+    @staticmethod
+    def distribute_rewards(active_event_id):
+        """
+        Pays every unrewarded participant of a defeated boss: a flat participation reward
+        plus a share of the coin pool proportional to their damage, in the primary currency.
+        Transfers are applied REWARD_BATCH_SIZE participants at a time. Returns the number
+        of players paid.
+        """
+        from accounts.currency_registry import CurrencyRegistry
+        from transactions.services import atomic_batch_transfer
+
+        active_event = ActiveWorldEvent.objects.filter(pk=active_event_id).first()
+        if active_event is None or active_event.current_state.get('status') != 'defeated':
+            return 0
+        state = active_event.current_state
+        currency = CurrencyRegistry.get().primary()
+        if currency is None:
+            raise ValueError("No currency is configured for Dungeon Break rewards.")
+
+        participants = DungeonBreakParticipant.objects.filter(active_event=active_event)
+        # Attacks are rejected once the boss is defeated, so the damage totals are final.
+        total_damage = participants.aggregate(damage=Sum('damage'))['damage'] or 0
+        source = f"Dungeon Break: {active_event.id}"
+
+        # Each batch commits on its own; reward_granted makes a retried or concurrent run skip paid players.
+        paid = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    participants.filter(reward_granted=False).select_for_update(skip_locked=True, of=('self',))
+                    .select_related('user').order_by('user_id')[:DungeonBreakService.REWARD_BATCH_SIZE]
+                )
+                if not batch:
+                    break
+                atomic_batch_transfer([
+                    (
+                        participant.user, currency,
+                        DungeonBreakService.PARTICIPATION_COINS + (state['coin_pool'] * participant.damage // total_damage if total_damage else 0),
+                        'reward', source, {'active_event_id': active_event.id, 'damage': participant.damage},
+                    )
+                    for participant in batch
+                ])
+                DungeonBreakParticipant.objects.filter(pk__in=[participant.pk for participant in batch]).update(reward_granted=True)
+            paid += len(batch)
+            if len(batch) < DungeonBreakService.REWARD_BATCH_SIZE:
+                break
+
+        if not participants.filter(reward_granted=False).exists():
+            state = {**state, 'status': 'rewarded', 'rewarded_participants': participants.count()}
+            ActiveWorldEvent.objects.filter(pk=active_event.pk, current_state__status='defeated').update(current_state=state, is_active=False)
+            cache.delete(READOUT_CACHE_KEY.format(active_event_id=active_event.pk))
+        return paid
@@ -1,8 +1,10 @@
-
 import random
+from collections import defaultdict
+from django.db import transaction
 from .models import Dungeon, PlayerDungeonState, WorldZone, PlayerGate
 from accounts.models import User
 from .floor_generation_service import FloorGenerationService
+from .map_data_service import MapDataService
 
 class DungeonManifestService:
 
@@ -11,37 +13,87 @@ class DungeonManifestService:
     MIN_FLOORS = 4
     MAX_FLOORS = 8
     MAX_COORDINATE_OFFSET = 200
+    BULK_CREATE_BATCH_SIZE = 1000
 
     @staticmethod
-    def generate_daily_manifest(user: User):
+    def load_zone_dungeons():
         """
-        Generates a daily manifest of dungeons for a given user.
+        Loads every zone that can spawn gates together with its eligible dungeons.
+        Two queries in total, so callers generating many manifests should load this once.
         """
-        PlayerGate.objects.filter(user=user).delete()
-
-        for zone in WorldZone.objects.all():
-            if not zone.rank_pool:
-                continue
+        zones = [zone for zone in WorldZone.objects.all() if zone.rank_pool]
+        dungeons_by_zone = defaultdict(list)
+        for dungeon in Dungeon.objects.filter(zone__in=zones):
+            dungeons_by_zone[dungeon.zone_id].append(dungeon)
 
-            possible_dungeons = list(Dungeon.objects.filter(zone=zone, rank__in=zone.rank_pool))
-            if not possible_dungeons:
-                continue
+        zone_dungeons = []
+        for zone in zones:
+            possible_dungeons = [d for d in dungeons_by_zone[zone.id] if d.rank in zone.rank_pool]
+            if possible_dungeons:
+                zone_dungeons.append((zone, possible_dungeons))
+        return zone_dungeons
 
+    @staticmethod
+    def build_gates(user_id, zone_dungeons):
+        """
+        Rolls a day's gates for one user and returns them as unsaved PlayerGate objects.
+        Floors are not generated here; each gate gets a seed and its floors are
+        generated from it when a run actually reaches them.
+        """
+        gates = []
+        content_version = FloorGenerationService.content_version()
+        for zone, possible_dungeons in zone_dungeons:
             num_to_spawn = random.randint(DungeonManifestService.MIN_GATES_PER_ZONE, min(DungeonManifestService.MAX_GATES_PER_ZONE, len(possible_dungeons)))
             selected_dungeons = random.sample(possible_dungeons, num_to_spawn)
 
             for dungeon in selected_dungeons:
                 total_floors = random.randint(DungeonManifestService.MIN_FLOORS, DungeonManifestService.MAX_FLOORS)
-                encounter_log = [FloorGenerationService.generate_floor(dungeon, total_floors, i + 1) for i in range(total_floors)]
-                
+
                 x_offset = random.randint(-DungeonManifestService.MAX_COORDINATE_OFFSET, DungeonManifestService.MAX_COORDINATE_OFFSET)
                 y_offset = random.randint(-DungeonManifestService.MAX_COORDINATE_OFFSET, DungeonManifestService.MAX_COORDINATE_OFFSET)
 
-                PlayerGate.objects.create(
-                    user=user,
+                gates.append(PlayerGate(
+                    user_id=user_id,
                     dungeon=dungeon,
-                    map_x=zone.world_map_x + x_offset,
-                    map_y=zone.world_map_y + y_offset,
+                    # Coordinates are unsigned, so gates of zones near the map edge are clamped onto it.
+                    map_x=max(0, zone.world_map_x + x_offset),
+                    map_y=max(0, zone.world_map_y + y_offset),
                     total_floors=total_floors,
-                    encounter_log=encounter_log,
-                )
+                    seed=FloorGenerationService.new_seed(),
+                    content_version=content_version,
+                ))
+        return gates
+
+    @staticmethod
+    def generate_daily_manifest(user: User, zone_dungeons=None):
+        """
+        Generates a daily manifest of dungeons for a given user.
+        """
+        if zone_dungeons is None:
+            zone_dungeons = DungeonManifestService.load_zone_dungeons()
+
+        gates = DungeonManifestService.build_gates(user.id, zone_dungeons)
+        with transaction.atomic():
+            PlayerGate.objects.filter(user=user).delete()
+            gates = PlayerGate.objects.bulk_create(gates)
+            MapDataService.invalidate([user.id])
+        return gates
+
+    @staticmethod
+    def generate_manifests_for_users(user_ids, zone_dungeons=None):
+        """
+        Generates daily manifests for a batch of users, replacing their old gates
+        with one delete and a batched bulk_create. Returns the number of gates written.
+        """
+        if zone_dungeons is None:
+            zone_dungeons = DungeonManifestService.load_zone_dungeons()
+
+        gates = []
+        for user_id in user_ids:
+            gates.extend(DungeonManifestService.build_gates(user_id, zone_dungeons))
+
+        with transaction.atomic():
+            PlayerGate.objects.filter(user_id__in=user_ids).delete()
+            PlayerGate.objects.bulk_create(gates, batch_size=DungeonManifestService.BULK_CREATE_BATCH_SIZE)
+            MapDataService.invalidate(user_ids)
+        return len(gates)
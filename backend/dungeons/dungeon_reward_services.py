@@ -1,7 +1,6 @@
 import random
-from django.db import transaction
-from django.db.models import F
-from accounts.models import UserCurrency, Currency
+from accounts.currency_registry import CurrencyRegistry
+from transactions import ledger
 
 from .loot_services import LootService
 
@@ -23,11 +22,9 @@ def grant_dungeon_rewards(user, dungeon_run, encounter_type, entity_id=None):
     if entity:
         coin_reward = int(base_coin * (1 + entity.power / 100))
         rewards['game_coin'] = coin_reward
-        with transaction.atomic():
-            game_currency = Currency.objects.get(code='game')
-            currency, _ = UserCurrency.objects.get_or_create(user=user, currency=game_currency)
-            currency.balance = F('balance') + coin_reward
-            currency.save()
+        if coin_reward:
+            game_currency = CurrencyRegistry.get().by_code('game')
+            ledger.credit(user, game_currency, coin_reward, 'reward', 'dungeon', {'encounter_type': encounter_type})
 
     # 2. Grant XP
     base_xp = 0
@@ -0,0 +1,65 @@
+import logging
+from django.db import transaction
+from django.utils import timezone
+from .models import DungeonRun
+from .engine import DungeonEngine
+from .run_updates import publish_run_state
+
+logger = logging.getLogger(__name__)
+
+
+class EncounterExpiryService:
+    """Resolves encounters whose timer has run out, so runs progress without the client polling."""
+
+    BATCH_SIZE = 200
+    RESOLVED_FIELDS = ['status', 'anima', 'floor_completion_time', 'encounter_log', 'last_encounter_result', 'active_modifiers', 'version']
+
+    @staticmethod
+    def resolve_expired_encounters(now=None):
+        """
+        Finds advancing runs whose floor_completion_time has passed (an index range scan on
+        status + floor_completion_time) and resolves them batch by batch, writing each batch
+        back with a single bulk_update. Returns the resolved runs.
+        """
+        now = now or timezone.now()
+        failed_ids = set()
+        resolved_runs = []
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    DungeonRun.objects
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .select_related('user', 'dungeon')
+                    .filter(status='advancing', floor_completion_time__lte=now)
+                    .exclude(id__in=failed_ids)
+                    .order_by('floor_completion_time')[:EncounterExpiryService.BATCH_SIZE]
+                )
+                if not batch:
+                    break
+
+                resolved = []
+                published = []
+                for dungeon_run in batch:
+                    try:
+                        # A savepoint per run, so a database error in one run cannot poison the batch.
+                        with transaction.atomic():
+                            engine = DungeonEngine(dungeon_run.user)
+                            engine.finish_encounter(dungeon_run)
+                            # Rows are locked, so bumping the version makes any concurrent API transition conflict.
+                            dungeon_run.version += 1
+                            published.append((dungeon_run.id, engine.resolution_event(dungeon_run), engine.build_run_state(dungeon_run)))
+                        resolved.append(dungeon_run)
+                    except Exception:
+                        logger.exception("Could not resolve expired encounter for dungeon run %s.", dungeon_run.id)
+                        failed_ids.add(dungeon_run.id)
+
+                DungeonRun.objects.bulk_update(resolved, EncounterExpiryService.RESOLVED_FIELDS)
+                for dungeon_run_id, event, state in published:
+                    publish_run_state(dungeon_run_id, event, state)
+                resolved_runs.extend(resolved)
+
+            if len(batch) < EncounterExpiryService.BATCH_SIZE:
+                break
+
+        return resolved_runs
@@ -4,102 +4,193 @@ import json
 import logging
 from .models import Dungeon, WorldZone, WorldEvent, PlayerDungeonState, DungeonRun, Entity, TacticalApproach
 from items.models import Item
-from .talent_services import TalentService
+from .player_stats_service import PlayerStatService, apply_power_modifiers, BASE_PLAYER_POWER_MULTIPLIER
 from .encounter_services import EncounterService
 from .loot_services import LootService
 from .critical_event_services import CriticalEventService
 from .floor_generation_service import FloorGenerationService
+from .run_context import RunContext
+from .expedition_forecast import forecast_expedition
+from .run_updates import publish_run_state
 from accounts.leveling_service import LevelingService
 
 from django.utils import timezone
 from datetime import timedelta
 
+logger = logging.getLogger(__name__)
+
 # Constants
 INITIAL_FLOOR_DURATION_MINUTES = 1
 DEFAULT_FLOOR_DURATION_MINUTES = 1
-BASE_PLAYER_POWER_MULTIPLIER = 18
+# Auto-expeditions are only offered when the player is this many times stronger than the run's final floor.
+AUTO_EXPEDITION_POWER_RATIO = 2.0
 
 class DungeonEngine:
     def __init__(self, user):
         self.user = user
 
     def start_expedition(self, dungeon_run_id):
-        dungeon_run = DungeonRun.objects.get(id=dungeon_run_id, user=self.user)
-        if dungeon_run.status != 'not_started':
-            raise Exception("This dungeon run has already started.")
-
-        # Generate the encounter log for the entire dungeon run
-        encounter_log = []
-        for i in range(dungeon_run.total_floors):
-            floor_data = FloorGenerationService.generate_floor(
-                dungeon_run.dungeon,
-                dungeon_run.total_floors,
-                i + 1
-            )
-            encounter_log.append(floor_data)
-        
-        dungeon_run.encounter_log = encounter_log
-        dungeon_run.status = 'advancing'  # Start advancing on the first floor immediately
-        dungeon_run.floor_completion_time = timezone.now() + timedelta(minutes=INITIAL_FLOOR_DURATION_MINUTES) # Set timer for the first floor
-        dungeon_run.save()
-        return self.get_run_state(dungeon_run.id)
+        with RunContext(self.user, dungeon_run_id) as dungeon_run:
+            if dungeon_run.status != 'not_started':
+                raise Exception("This dungeon run has already started.")
 
-    def advance_floor(self, dungeon_run_id, choice_id=None):
-        dungeon_run = DungeonRun.objects.get(id=dungeon_run_id, user=self.user)
+            # Floors are generated lazily from the run's seed as the player reaches them.
+            # Runs started from legacy gates may already carry a pre-generated log.
+            if dungeon_run.seed is None:
+                dungeon_run.seed = FloorGenerationService.new_seed()
+                dungeon_run.content_version = FloorGenerationService.content_version()
+            self._ensure_floor_generated(dungeon_run, 1)
 
-        if dungeon_run.status != 'in_progress':
-            raise Exception("You must be in the Sanctuary to advance.")
+            dungeon_run.status = 'advancing'  # Start advancing on the first floor immediately
+            dungeon_run.floor_completion_time = timezone.now() + timedelta(minutes=INITIAL_FLOOR_DURATION_MINUTES) # Set timer for the first floor
+        return self._publish_state(dungeon_run, 'timer_started')
 
-        # 1. Apply effects from player's choice (if any)
-        if choice_id:
-            self._apply_player_choice(dungeon_run, choice_id)
+    def advance_floor(self, dungeon_run_id, choice_id=None):
+        with RunContext(self.user, dungeon_run_id) as dungeon_run:
+            if dungeon_run.status != 'in_progress':
+                raise Exception("You must be in the Sanctuary to advance.")
 
-        # 2. Set the timer for floor completion and update the run state
-        dungeon_run.floor_completion_time = timezone.now() + timedelta(minutes=DEFAULT_FLOOR_DURATION_MINUTES)
-        dungeon_run.current_encounter_index = 0
-        dungeon_run.status = 'advancing'
-        dungeon_run.save()
+            # 1. Apply effects from player's choice (if any)
+            if choice_id:
+                self._apply_player_choice(dungeon_run, choice_id)
 
-        return self.get_run_state(dungeon_run.id)
+            # 2. Set the timer for floor completion and update the run state
+            dungeon_run.floor_completion_time = timezone.now() + timedelta(minutes=DEFAULT_FLOOR_DURATION_MINUTES)
+            dungeon_run.current_encounter_index = 0
+            dungeon_run.status = 'advancing'
+        return self._publish_state(dungeon_run, 'timer_started')
 
     def advance_encounter(self, dungeon_run_id):
-        dungeon_run = DungeonRun.objects.get(id=dungeon_run_id, user=self.user)
-
+        with RunContext(self.user, dungeon_run_id) as dungeon_run:
+            # The expiry scheduler may already have resolved this encounter.
+            if dungeon_run.status in ['encounter_resolved', 'failed']:
+                return self.build_run_state(dungeon_run)
+            if dungeon_run.status != 'advancing':
+                raise Exception("There is no encounter in progress.")
+            self.finish_encounter(dungeon_run)
+        return self._publish_state(dungeon_run, self.resolution_event(dungeon_run))
+
+    def finish_encounter(self, dungeon_run):
+        """Resolves the current encounter of an already loaded run and stops its timer. Does not save."""
         self._resolve_encounter(dungeon_run)
-        
+
         # Only change status if the run hasn't already failed during resolution.
         if dungeon_run.status != 'failed':
             dungeon_run.status = 'encounter_resolved'
-        
+
         # Always stop the timer after an encounter is resolved or failed.
         dungeon_run.floor_completion_time = None
-        dungeon_run.save()
 
-        return self.get_run_state(dungeon_run.id)
+    @staticmethod
+    def resolution_event(dungeon_run):
+        return 'run_failed' if dungeon_run.status == 'failed' else 'encounter_resolved'
 
     def proceed_to_next_encounter(self, dungeon_run_id):
-        dungeon_run = DungeonRun.objects.get(id=dungeon_run_id, user=self.user)
-        if dungeon_run.status != 'encounter_resolved':
-            raise Exception("You can only proceed after an encounter has been resolved.")
+        with RunContext(self.user, dungeon_run_id) as dungeon_run:
+            if dungeon_run.status != 'encounter_resolved':
+                raise Exception("You can only proceed after an encounter has been resolved.")
+
+            # Grant rewards for the completed floor
+            floor_log = dungeon_run.encounter_log[dungeon_run.current_floor - 1]
+            floor_rewards = LootService.calculate_floor_rewards(floor_log)
+            dungeon_run.unclaimed_rewards.append(floor_rewards)
+
+            # Transition to the Sanctuary
+            dungeon_run.current_floor += 1
+            dungeon_run.current_encounter_index = 0
+            if dungeon_run.current_floor > dungeon_run.total_floors:
+                dungeon_run.status = 'completed'
+            else:
+                dungeon_run.status = 'in_progress'
+                self._ensure_floor_generated(dungeon_run, dungeon_run.current_floor)
+        return self._publish_state(dungeon_run, 'run_completed' if dungeon_run.status == 'completed' else 'floor_completed')
 
-        # Grant rewards for the completed floor
-        floor_log = dungeon_run.encounter_log[dungeon_run.current_floor - 1]
-        floor_rewards = LootService.calculate_floor_rewards(floor_log)
-        dungeon_run.unclaimed_rewards.append(floor_rewards)
-
-        # Transition to the Sanctuary
-        dungeon_run.current_floor += 1
-        dungeon_run.current_encounter_index = 0
-        if dungeon_run.current_floor > dungeon_run.total_floors:
-            dungeon_run.status = 'completed'
+    def can_auto_resolve(self, dungeon_run):
+        """
+        Whether the player outlevels the run's dungeon enough to resolve it in one pass.
+        The final floor fields the strongest final boss whatever its budget, so the check
+        is against that floor's actual power, read from the log or generated in memory.
+        """
+        if dungeon_run.total_floors <= len(dungeon_run.encounter_log):
+            final_floor = dungeon_run.encounter_log[dungeon_run.total_floors - 1]
+        elif dungeon_run.seed is not None:
+            final_floor = FloorGenerationService.generate_seeded_floor(
+                dungeon_run.dungeon, dungeon_run.total_floors, dungeon_run.total_floors, dungeon_run.seed
+            )
         else:
-            dungeon_run.status = 'in_progress'
+            return False
+        final_power = final_floor['encounters'][0].get('total_power')
+        if final_power is None:
+            return False
+        return PlayerStatService.get_stat_sheet(self.user)['power'] >= AUTO_EXPEDITION_POWER_RATIO * final_power
+
+    def auto_expedition(self, dungeon_run_id):
+        """
+        Resolves every remaining floor of a run in one pass: encounters, Anima loss, loot
+        and floor rewards, with no tactical choices and no timers. The run is saved once
+        and a compact summary is returned instead of a per-floor state.
+        """
+        with RunContext(self.user, dungeon_run_id) as dungeon_run:
+            if dungeon_run.status not in ['not_started', 'in_progress']:
+                raise Exception("Only a run that has not started or is in the Sanctuary can be auto-resolved.")
+            if dungeon_run.seed is None and not dungeon_run.encounter_log:
+                dungeon_run.seed = FloorGenerationService.new_seed()
+                dungeon_run.content_version = FloorGenerationService.content_version()
+            if not self.can_auto_resolve(dungeon_run):
+                raise Exception("You are not strong enough to auto-resolve this dungeon.")
+
+            floors = []
+            while dungeon_run.current_floor <= dungeon_run.total_floors:
+                self._ensure_floor_generated(dungeon_run, dungeon_run.current_floor)
+                dungeon_run.current_encounter_index = 0
+                self._resolve_encounter(dungeon_run, enrich_loot=False)
+                floors.append({
+                    'floor': dungeon_run.current_floor,
+                    'outcome': dungeon_run.last_encounter_result['outcome'],
+                    'enemy': dungeon_run.last_encounter_result['enemy'],
+                })
+                if dungeon_run.status == 'failed':
+                    break
+
+                floor_log = dungeon_run.encounter_log[dungeon_run.current_floor - 1]
+                dungeon_run.unclaimed_rewards.append(LootService.calculate_floor_rewards(floor_log))
+                dungeon_run.current_floor += 1
+
+            dungeon_run.floor_completion_time = None
+            if dungeon_run.status != 'failed':
+                dungeon_run.status = 'completed'
+        self._publish_state(dungeon_run, 'run_failed' if dungeon_run.status == 'failed' else 'run_completed')
+
+        return {
+            'run_id': dungeon_run.id,
+            'status': dungeon_run.status,
+            'anima': dungeon_run.anima,
+            'floors_cleared': sum(1 for floor in floors if floor['outcome'] == 'success'),
+            'floors': floors,
+            'rewards': {
+                'xp': sum(reward.get('xp', 0) for reward in dungeon_run.unclaimed_rewards),
+                'coins': sum(reward.get('coins', 0) for reward in dungeon_run.unclaimed_rewards),
+                'items': sum(len(reward.get('items', [])) for reward in dungeon_run.unclaimed_rewards),
+            },
+        }
 
-        dungeon_run.save()
-        return self.get_run_state(dungeon_run.id)
+    def _publish_state(self, dungeon_run, event):
+        """Builds the run's state and pushes it to any open DungeonRunConsumer."""
+        state = self.build_run_state(dungeon_run)
+        publish_run_state(dungeon_run.id, event, state)
+        return state
 
     def get_run_state(self, dungeon_run_id):
-        dungeon_run = DungeonRun.objects.get(id=dungeon_run_id, user=self.user)
+        dungeon_run = DungeonRun.objects.select_related('dungeon').get(id=dungeon_run_id, user=self.user)
+        return self.build_run_state(dungeon_run, include_forecast=True)
+
+    def build_run_state(self, dungeon_run, include_forecast=False):
+        """
+        Builds the API payload for a run that is already loaded. Only process and shared
+        caches are read (the stat sheet and the loot/entity snapshots); the run is not reloaded.
+        The forecast regenerates the remaining floors, so transitions leave it out and it is
+        only added on request.
+        """
         player_power = self._get_player_power(dungeon_run)
 
         base_state = {
@@ -149,12 +240,91 @@ class DungeonEngine:
             base_state['rewards'] = dungeon_run.rewards
             base_state['unclaimed_rewards'] = dungeon_run.unclaimed_rewards
 
+        if include_forecast:
+            base_state['forecast'] = self.forecast_run(dungeon_run)
         return base_state
 
-    def _resolve_encounter(self, dungeon_run):
+    def forecast_run(self, dungeon_run):
+        """The odds of clearing the run's remaining floors with its current Anima."""
+        if dungeon_run.status == 'completed':
+            return {'clear_probability': 1.0}
+        if dungeon_run.status in ['failed', 'abandoned']:
+            return {'clear_probability': 0.0}
+
+        first_floor = dungeon_run.current_floor
+        if dungeon_run.status == 'not_started':
+            first_floor = 1
+        elif dungeon_run.status in ['encounter_resolved', 'floor_completed']:
+            first_floor += 1
+        # The run's tactical modifiers only last until the end of the current floor.
+        current_power = self._get_player_power(dungeon_run) if dungeon_run.status in ['in_progress', 'advancing'] else None
+
+        return self.forecast_floors(
+            dungeon_run.dungeon, dungeon_run.total_floors, dungeon_run.seed, dungeon_run.content_version,
+            dungeon_run.encounter_log, first_floor, dungeon_run.anima, current_power
+        )
+
+    def forecast_gate(self, player_gate):
+        """The odds of clearing a gate that has not been entered yet, with a fresh run's Anima."""
+        return self.forecast_floors(
+            player_gate.dungeon, player_gate.total_floors, player_gate.seed, player_gate.content_version,
+            player_gate.encounter_log, 1, DungeonRun._meta.get_field('anima').default
+        )
+
+    def forecast_floors(self, dungeon, total_floors, seed, content_version, encounter_log, first_floor, anima, current_power=None):
+        """
+        Forecasts floors first_floor..total_floors, reading each from the encounter log or
+        regenerating it from the seed in memory. Returns None for legacy data it cannot read,
+        and when the seed was rolled against other content, since its floors would differ.
+        """
+        reproducible = seed is not None and content_version == FloorGenerationService.content_version()
+        sheet_power = PlayerStatService.get_stat_sheet(self.user)['power']
+        success_chances = []
+        expected_loot = []
+        for floor_number in range(first_floor, total_floors + 1):
+            if floor_number <= len(encounter_log):
+                floor = encounter_log[floor_number - 1]
+            elif reproducible:
+                floor = FloorGenerationService.generate_seeded_floor(dungeon, total_floors, floor_number, seed)
+            else:
+                return None
+            encounter = floor['encounters'][0]
+            if 'total_power' not in encounter:
+                return None
+
+            power = current_power if current_power is not None and floor_number == first_floor else sheet_power
+            success_chances.append(EncounterService.calculate_success_chance(power, encounter['total_power']) / 100)
+            expected_loot.append(LootService.expected_squad_loot([entity['entity_id'] for entity in encounter['entities']]))
+
+        return forecast_expedition(success_chances, expected_loot, anima)
+
+    def _ensure_floor_generated(self, dungeon_run, floor_number):
+        """
+        Appends floors to the encounter log from the run's seed until floor_number exists.
+        If the floor generation code or the entity catalog changed since the seed was rolled,
+        the seed can no longer reproduce the floors it stood for; the missing floors are then
+        generated from the current content and the run is re-stamped with its version.
+        """
+        if len(dungeon_run.encounter_log) >= floor_number:
+            return
+        content_version = FloorGenerationService.content_version()
+        if dungeon_run.content_version != content_version:
+            logger.info("Dungeon run %s was rolled against other floor content; generating its remaining floors from the current content.", dungeon_run.id)
+            dungeon_run.content_version = content_version
+        while len(dungeon_run.encounter_log) < floor_number:
+            next_floor = len(dungeon_run.encounter_log) + 1
+            dungeon_run.encounter_log.append(FloorGenerationService.generate_seeded_floor(
+                dungeon_run.dungeon,
+                dungeon_run.total_floors,
+                next_floor,
+                dungeon_run.seed
+            ))
+
+    def _resolve_encounter(self, dungeon_run, enrich_loot=True):
         """
         Resolves a single encounter and updates the run state with the result.
         This method does NOT handle advancing the floor or encounter index.
+        enrich_loot=False skips loading item names and icons for the response.
         """
         floor_log = dungeon_run.encounter_log[dungeon_run.current_floor - 1]
         encounter_log_entry = floor_log['encounters'][0]
@@ -187,14 +357,9 @@ class DungeonEngine:
                 'summary_text': summary_text
             }
         else: # Success
-            total_loot = {'xp': 0, 'coins': 0, 'items': []}
-
-            for entity_data in encounter_log_entry['entities']:
-                entity = Entity.objects.get(id=entity_data['entity_id'])
-                loot = LootService.generate_loot(entity)
-                total_loot['xp'] += loot.get('xp', 0)
-                total_loot['coins'] += loot.get('coins', 0)
-                total_loot['items'].extend(loot.get('items', []))
+            total_loot = LootService.generate_squad_loot(
+                [entity_data['entity_id'] for entity_data in encounter_log_entry['entities']]
+            )
 
             # The loot generated here is for the immediate encounter result display.
             # It is NOT added to the final unclaimed_rewards list here. That happens
@@ -209,7 +374,7 @@ class DungeonEngine:
             # Create a separate, enriched version of the loot for the immediate API response.
             loot_for_response = total_loot.copy()
             item_ids = [item['item_id'] for item in loot_for_response.get('items', [])]
-            if item_ids:
+            if item_ids and enrich_loot:
                 items = Item.objects.filter(id__in=item_ids).in_bulk()
                 enriched_items = []
                 for item_data in total_loot['items']:
@@ -274,8 +439,6 @@ class DungeonEngine:
                 'effects_applied': effects_data
             })
 
-            dungeon_run.save()
-
         except TacticalApproach.DoesNotExist:
             logging.warning(f"Could not find TacticalApproach with id: {choice_id}")
             pass
@@ -298,30 +461,17 @@ class DungeonEngine:
         return ", ".join(enemy_string_parts)
 
     def _get_player_power(self, dungeon_run):
-        base_power = self.user.level * BASE_PLAYER_POWER_MULTIPLIER
-        player_stats = {'power': base_power}
-
-        # active_modifiers is now a flat list of effect dictionaries
-        for effect in dungeon_run.active_modifiers:
-            if isinstance(effect, dict) and effect.get('type') == 'PLAYER_MODIFIER' and effect.get('stat') == 'PlayerPower':
-                operation = effect.get('operation')
-                value = effect.get('value')
-                if operation == 'ADD':
-                    player_stats['power'] += value
-                elif operation == 'MULTIPLY':
-                    player_stats['power'] *= value
-
-        # Placeholder for talent effects
-        # player_stats = TalentService.apply_talent_effects(self.user, player_stats)
-        return player_stats['power']
+        """The cached stat sheet's power with the run's own modifiers applied on top."""
+        stat_sheet = PlayerStatService.get_stat_sheet(self.user)
+        return apply_power_modifiers(stat_sheet['power'], dungeon_run.active_modifiers)
 
     def abandon_expedition(self, dungeon_run_id):
-        dungeon_run = DungeonRun.objects.get(id=dungeon_run_id, user=self.user)
-        if dungeon_run.status not in ['in_progress', 'advancing', 'encounter_resolved', 'floor_completed']:
-            raise Exception("This dungeon run cannot be abandoned in its current state.")
+        with RunContext(self.user, dungeon_run_id) as dungeon_run:
+            if dungeon_run.status not in ['in_progress', 'advancing', 'encounter_resolved', 'floor_completed']:
+                raise Exception("This dungeon run cannot be abandoned in its current state.")
 
-        dungeon_run.status = 'abandoned'
-        dungeon_run.end_time = timezone.now()
-        dungeon_run.save()
+            dungeon_run.status = 'abandoned'
+            dungeon_run.end_time = timezone.now()
+        self._publish_state(dungeon_run, 'run_abandoned')
 
         return {"message": "Expedition abandoned successfully."}
@@ -0,0 +1,116 @@
+import bisect
+import random
+import zlib
+from collections import namedtuple, defaultdict
+from campus_rpg.snapshot import VersionedSnapshot
+from .models import Entity, Dungeon, TacticalApproach
+
+CatalogEntity = namedtuple('CatalogEntity', ['id', 'name', 'rank', 'entity_type', 'power'])
+
+
+class EntityPool:
+    """A read-only list of entities sorted by power, searchable by bisection."""
+
+    def __init__(self, entities):
+        self.entities = sorted(entities, key=lambda e: (e.power, e.id))
+        self.powers = [e.power for e in self.entities]
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __bool__(self):
+        return bool(self.entities)
+
+    def strongest(self):
+        return self.entities[-1] if self.entities else None
+
+    def strongest_within(self, budget):
+        """The most powerful entity whose power does not exceed the budget."""
+        index = bisect.bisect_right(self.powers, budget)
+        return self.entities[index - 1] if index else None
+
+    def random_within(self, budget, min_power=1, rng=random):
+        """A uniformly random entity with min_power <= power <= budget."""
+        lo = bisect.bisect_left(self.powers, min_power)
+        hi = bisect.bisect_right(self.powers, budget)
+        if lo >= hi:
+            return None
+        return self.entities[rng.randrange(lo, hi)]
+
+
+class EntityCatalog(VersionedSnapshot):
+    """
+    A process-local snapshot of the entity tables used by floor generation.
+
+    Entities are grouped by (category, rank, entity_type) and merged pools for a
+    dungeon's categories are memoized, so generating a floor needs no queries.
+    Saving an Entity, EntityCategory, TacticalApproach or a dungeon's categories
+    invalidates the snapshot in every process.
+
+    Everything is kept in a stable order so that seeded floor generation picks
+    the same entities in every process. fingerprint is a checksum of everything
+    floor generation reads, so it only changes when a seed could produce another floor.
+    """
+    VERSION_CACHE_KEY = 'dungeons:entity_catalog_version'
+
+    def __init__(self, version):
+        super().__init__(version)
+        self.groups = defaultdict(list)
+        self.by_type = defaultdict(list)
+        self.entities = {}
+        self.dungeon_categories = defaultdict(set)
+        self.approaches = []
+        self.approaches_by_category = defaultdict(list)
+        self._pools = {}
+        self.fingerprint = 0
+
+    @classmethod
+    def build(cls, version):
+        catalog = cls(version)
+
+        for row in Entity.objects.order_by('id').values('id', 'name', 'rank', 'entity_type', 'power'):
+            entity = CatalogEntity(**row)
+            catalog.entities[entity.id] = entity
+            catalog.by_type[entity.entity_type].append(entity)
+
+        memberships = sorted(Entity.categories.through.objects.values_list('entity_id', 'entitycategory_id'))
+        for entity_id, category_id in memberships:
+            entity = catalog.entities.get(entity_id)
+            if entity:
+                catalog.groups[(category_id, entity.rank, entity.entity_type)].append(entity)
+
+        dungeon_memberships = sorted(Dungeon.entity_categories.through.objects.values_list('dungeon_id', 'entitycategory_id'))
+        for dungeon_id, category_id in dungeon_memberships:
+            catalog.dungeon_categories[dungeon_id].add(category_id)
+
+        for approach in TacticalApproach.objects.order_by('category', 'id').values('id', 'name', 'description', 'category'):
+            catalog.approaches.append(approach)
+            catalog.approaches_by_category[approach['category']].append(approach)
+
+        catalog.fingerprint = zlib.crc32(
+            repr((list(catalog.entities.values()), memberships, dungeon_memberships, catalog.approaches)).encode('utf-8')
+        )
+        return catalog
+
+    def pool(self, dungeon, ranks, entity_type):
+        """Entities of the given ranks and type that belong to any of the dungeon's categories."""
+        category_ids = frozenset(self.dungeon_categories.get(dungeon.id, ()))
+        key = (category_ids, tuple(ranks), entity_type)
+        pool = self._pools.get(key)
+        if pool is None:
+            members = {}
+            for category_id in category_ids:
+                for rank in ranks:
+                    for entity in self.groups.get((category_id, rank, entity_type), ()):
+                        members[entity.id] = entity
+            pool = self._pools[key] = EntityPool(members.values())
+        return pool
+
+    def pool_for_type(self, entity_type, rank=None):
+        """Every entity of the given type (and optionally rank), regardless of category."""
+        key = (None, rank, entity_type)
+        pool = self._pools.get(key)
+        if pool is None:
+            members = [e for e in self.by_type.get(entity_type, ()) if rank is None or e.rank == rank]
+            pool = self._pools[key] = EntityPool(members)
+        return pool
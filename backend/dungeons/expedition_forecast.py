@@ -0,0 +1,37 @@
+def forecast_expedition(success_chances, expected_loot, anima):
+    """
+    The exact odds of an expedition from its per-floor success chances.
+
+    The run is a Markov chain over remaining Anima: each floor is one encounter, a win
+    keeps Anima and yields that floor's loot, a loss costs one Anima, and the run fails
+    when Anima reaches zero. One pass over the floors carries the probability of every
+    Anima count forward, so the cost is O(floors x anima).
+
+    success_chances are fractions in [0, 1]; expected_loot holds one {'xp', 'coins',
+    'items'} dict of expected values per floor.
+    """
+    anima = max(int(anima), 0)
+    alive = [0.0] * (anima + 1)
+    alive[anima] = 1.0
+    loot = {'xp': 0.0, 'coins': 0.0, 'items': 0.0}
+    expected_wins = 0.0
+
+    for chance, floor_loot in zip(success_chances, expected_loot):
+        still_alive = sum(alive[1:])
+        expected_wins += still_alive * chance
+        for key in loot:
+            loot[key] += still_alive * chance * floor_loot.get(key, 0)
+
+        next_alive = [0.0] * (anima + 1)
+        next_alive[0] = alive[0]
+        for remaining in range(1, anima + 1):
+            next_alive[remaining] += alive[remaining] * chance
+            next_alive[remaining - 1] += alive[remaining] * (1 - chance)
+        alive = next_alive
+
+    return {
+        'clear_probability': round(1 - alive[0], 4),
+        'expected_floors_won': round(expected_wins, 2),
+        'expected_anima_left': round(sum(remaining * p for remaining, p in enumerate(alive)), 2),
+        'expected_loot': {key: round(value, 1) for key, value in loot.items()},
+    }
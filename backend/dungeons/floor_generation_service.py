@@ -1,6 +1,7 @@
 
 import random
-from dungeons.models import Entity, TacticalApproach
+import zlib
+from dungeons.entity_catalog import EntityCatalog
 
 class FloorGenerationService:
     RANK_HIERARCHY = ['E', 'D', 'C', 'B', 'A', 'S', 'SS', 'SSS', 'National']
@@ -8,16 +9,39 @@ class FloorGenerationService:
         'E': 16, 'D': 50, 'C': 80, 'B': 120, 'A': 180, 
         'S': 250, 'SS': 350, 'SSS': 500, 'National': 1000
     }
+    # Bump whenever a change alters which floor a given seed produces.
+    CONTENT_VERSION = 1
+
+    @staticmethod
+    def content_version():
+        """
+        CONTENT_VERSION combined with the entity catalog's fingerprint. A seed only
+        reproduces its floors while this stays the same, so it is stored next to every seed.
+        """
+        key = f"{FloorGenerationService.CONTENT_VERSION}:{EntityCatalog.get().fingerprint}"
+        return zlib.crc32(key.encode('utf-8')) & 0x7FFFFFFF
+
+    @staticmethod
+    def new_seed():
+        return random.getrandbits(63)
+
+    @staticmethod
+    def floor_rng(seed, floor_number):
+        """Each floor gets its own RNG so any floor can be generated without generating the ones before it."""
+        return random.Random(f"{seed}:{floor_number}")
+
+    @staticmethod
+    def generate_seeded_floor(dungeon, total_floors, current_floor, seed):
+        rng = FloorGenerationService.floor_rng(seed, current_floor)
+        return FloorGenerationService.generate_floor(dungeon, total_floors, current_floor, rng=rng)
 
     @staticmethod
     def _get_random_entity(rank, entity_type, max_power=None):
         """Fetches a random entity of a specific rank and type, with an optional power cap."""
-        query = Entity.objects.filter(rank=rank, entity_type=entity_type)
+        pool = EntityCatalog.get().pool_for_type(entity_type, rank=rank)
         if max_power:
-            query = query.filter(power__lte=max_power)
-        
-        entity = query.order_by('?').first()
-        return entity
+            return pool.random_within(max_power, min_power=0)
+        return random.choice(pool.entities) if pool else None
 
     @staticmethod
     def _calculate_budget(dungeon_rank, total_floors, current_floor):
@@ -36,9 +60,9 @@ class FloorGenerationService:
         return int(budget)
 
     @staticmethod
-    def generate_floor(dungeon, total_floors, current_floor):
+    def generate_floor(dungeon, total_floors, current_floor, rng=random):
+        catalog = EntityCatalog.get()
         budget = FloorGenerationService._calculate_budget(dungeon.rank, total_floors, current_floor)
-        thematic_entities = Entity.objects.filter(categories__in=dungeon.entity_categories.all())
         final_entities = []
 
         is_final_floor = current_floor == total_floors
@@ -46,18 +70,18 @@ class FloorGenerationService:
 
         if is_final_floor:
             # Final floor MUST be a final_boss
-            boss = thematic_entities.filter(entity_type='final_boss', rank=dungeon.rank).order_by('-power').first()
+            boss = catalog.pool(dungeon, [dungeon.rank], 'final_boss').strongest()
             if boss:
                 final_entities.append({'entity_id': boss.id, 'name': boss.name, 'power': boss.power})
         elif is_mid_boss_floor:
             # Mid-boss floor is guaranteed to be a boss
-            boss = FloorGenerationService._find_suitable_boss(budget, thematic_entities.filter(entity_type='boss', rank=dungeon.rank))
+            boss = FloorGenerationService._find_suitable_boss(budget, catalog.pool(dungeon, [dungeon.rank], 'boss'))
             if boss:
                 final_entities.append({'entity_id': boss.id, 'name': boss.name, 'power': boss.power})
         else:
             # Regular floors have a chance for a boss, otherwise a squad
-            if random.random() < 0.40:
-                boss = FloorGenerationService._find_suitable_boss(budget, thematic_entities.filter(entity_type='boss', rank=dungeon.rank))
+            if rng.random() < 0.40:
+                boss = FloorGenerationService._find_suitable_boss(budget, catalog.pool(dungeon, [dungeon.rank], 'boss'))
                 if boss:
                     final_entities.append({'entity_id': boss.id, 'name': boss.name, 'power': boss.power})
         
@@ -66,9 +90,9 @@ class FloorGenerationService:
             dungeon_rank_index = FloorGenerationService.RANK_HIERARCHY.index(dungeon.rank)
             allowed_rank_indices = range(max(0, dungeon_rank_index - 1), dungeon_rank_index + 1)
             allowed_ranks = [FloorGenerationService.RANK_HIERARCHY[i] for i in allowed_rank_indices]
-            squad_pool = thematic_entities.filter(entity_type='minion', rank__in=allowed_ranks)
-            if squad_pool.exists():
-                final_entities = FloorGenerationService._build_squad(budget, squad_pool)
+            squad_pool = catalog.pool(dungeon, allowed_ranks, 'minion')
+            if squad_pool:
+                final_entities = FloorGenerationService._build_squad(budget, squad_pool, rng)
 
         if not final_entities:
             raise Exception(f"CRITICAL ERROR: Could not populate floor for dungeon '{dungeon.name}'. No suitable entities found for budget {budget}.")
@@ -80,22 +104,21 @@ class FloorGenerationService:
         }]
 
         # Generate tactical approaches
-        distinct_categories = TacticalApproach.objects.values_list('category', flat=True).distinct()
-        random_categories = random.sample(list(distinct_categories), min(len(distinct_categories), 3))
+        distinct_categories = list(catalog.approaches_by_category.keys())
+        random_categories = rng.sample(distinct_categories, min(len(distinct_categories), 3))
 
         tactical_choices = []
         for category in random_categories:
-            approach = TacticalApproach.objects.filter(category=category).order_by('?').first()
-            if approach:
-                tactical_choices.append({'id': approach.id, 'name': approach.name, 'description': approach.description})
+            approach = rng.choice(catalog.approaches_by_category[category])
+            tactical_choices.append({'id': approach['id'], 'name': approach['name'], 'description': approach['description']})
 
         # Fallback if we still don't have enough choices
         if len(tactical_choices) < 3:
             existing_ids = {tc['id'] for tc in tactical_choices}
+            remaining = [ta for ta in catalog.approaches if ta['id'] not in existing_ids]
             remaining_needed = 3 - len(tactical_choices)
-            fallback_choices = TacticalApproach.objects.exclude(id__in=existing_ids).order_by('?')[:remaining_needed]
-            for ta in fallback_choices:
-                 tactical_choices.append({'id': ta.id, 'name': ta.name, 'description': ta.description})
+            for ta in rng.sample(remaining, min(len(remaining), remaining_needed)):
+                tactical_choices.append({'id': ta['id'], 'name': ta['name'], 'description': ta['description']})
 
         return {
             'encounters': encounters,
@@ -105,32 +128,26 @@ class FloorGenerationService:
     @staticmethod
     def _find_suitable_boss(budget, pool):
         # Try to find a boss that fits the budget, starting from the most powerful
-        boss = pool.filter(power__lte=budget).order_by('-power').first()
+        boss = pool.strongest_within(budget)
         if not boss:
             # If no boss fits, find the closest one below the budget from any lower rank
-            boss = Entity.objects.filter(entity_type='boss', power__lte=budget).order_by('-power').first()
+            boss = EntityCatalog.get().pool_for_type('boss').strongest_within(budget)
         return boss
 
     @staticmethod
-    def _build_squad(budget, pool):
+    def _build_squad(budget, pool, rng=random):
         """Builds a varied squad of minions by spending a power budget."""
         squad = []
         current_budget = budget
         min_budget_spend = budget * 0.6
         max_squad_size = 5
 
-        possible_minions = list(pool.filter(power__lte=current_budget).order_by('-power'))
-
-        if not possible_minions:
-            return []
-
         while len(squad) < max_squad_size and current_budget > 0:
-            suitable_minions = [m for m in possible_minions if m.power <= current_budget and m.power > 0]
-            if not suitable_minions:
+            # The pool is sorted by power, so the affordable minions are a prefix of it.
+            minion_to_add = pool.random_within(current_budget, rng=rng)
+            if not minion_to_add:
                 break
 
-            minion_to_add = random.choice(suitable_minions)
-
             squad.append({
                 'entity_id': minion_to_add.id,
                 'name': minion_to_add.name,
@@ -2,8 +2,12 @@
 import random
 from django.db import transaction
 from .models import Entity
+from .loot_tables import LootTables, LootProfile, rarity_sampler
 from items.models import Item, InventoryItem
-from accounts.models import User, Currency, UserCurrency
+from items.inventory_summary_service import InventorySummaryService
+from accounts.models import User, Currency
+from accounts.currency_registry import CurrencyRegistry
+from transactions import ledger
 
 class LootService:
 
@@ -26,9 +30,13 @@ class LootService:
                 defaults={'quantity': quantity, 'metadata': metadata or {}}
             )
 
-            if not created:
+            if created:
+                InventorySummaryService.apply_stack_change(user, 0, quantity)
+            else:
+                before_quantity = inventory_item.quantity
                 inventory_item.quantity += quantity
                 inventory_item.save()
+                InventorySummaryService.apply_stack_change(user, before_quantity, inventory_item.quantity)
             return inventory_item
         else:
             # For non-stackable items, always create a new row
@@ -38,30 +46,27 @@ class LootService:
                 quantity=1, # Non-stackable items always have a quantity of 1
                 metadata=metadata or {}
             )
+            already_held = InventoryItem.objects.filter(user=user, item=item, quantity__gt=0).exclude(pk=inventory_item.pk).exists()
+            InventorySummaryService.apply(user, 1, 0 if already_held else 1)
             return inventory_item
 
     @staticmethod
     @transaction.atomic
-    def add_currency(user: User, amount: int, currency_code: str = 'GAME_COIN'):
+    def add_currency(user: User, amount: int, currency_code: str = 'GAME_COIN', source: str = 'dungeon'):
         """
-        Adds a specified amount of a currency to the user's account using the
-        correct UserCurrency model. This operation is atomic.
+        Adds a specified amount of a currency to the user's account as a single
+        ledger entry. This operation is atomic.
         """
         if amount <= 0:
             return
 
         try:
-            # Use get_or_create for robustness, especially in development.
-            currency, _ = Currency.objects.get_or_create(code=currency_code.upper())
-            
-            user_currency, created = UserCurrency.objects.get_or_create(
-                user=user,
-                currency=currency,
-                defaults={'balance': 0}
-            )
-            
-            user_currency.balance += amount
-            user_currency.save()
+            try:
+                currency = CurrencyRegistry.get().by_code(currency_code.upper())
+            except Currency.DoesNotExist:
+                # Created on first use for robustness, especially in development.
+                currency, _ = Currency.objects.get_or_create(code=currency_code.upper())
+            ledger.credit(user, currency, amount, 'reward', source)
 
         except Currency.DoesNotExist:
             # This case should ideally not be hit if currencies are pre-populated.
@@ -93,13 +98,68 @@ class LootService:
 
     RARITY_ORDER = ['common', 'uncommon', 'rare', 'epic', 'legendary', 'mythic', 'relic', 'masterwork', 'eternal']
 
+    @staticmethod
+    def rarity_sampler(rank, is_guardian=False):
+        samplers = GUARDIAN_RARITY_SAMPLERS if is_guardian else RARITY_SAMPLERS
+        return samplers.get(rank, samplers['E'])
+
     @staticmethod
     def generate_loot(entity: Entity):
-        is_guardian = entity.entity_type == 'final_boss'
+        tables = LootTables.get()
+        profile = tables.profile(entity.id)
+        if profile is None:
+            # Entity created after the current snapshot was built.
+            profile = LootProfile(
+                id=entity.id, rank=entity.rank, entity_type=entity.entity_type,
+                min_xp=entity.min_xp, max_xp=entity.max_xp,
+                min_coins=entity.min_coins, max_coins=entity.max_coins,
+                loot_categories=frozenset(entity.loot_categories.values_list('id', flat=True))
+            )
+        return LootService._roll_loot(profile, tables)
+
+    @staticmethod
+    def generate_squad_loot(entity_ids):
+        """
+        Rolls loot for every entity of a squad in one pass over the compiled loot tables
+        and returns the combined {'xp', 'coins', 'items'}. Entities are rolled once per
+        occurrence, so a squad of three goblins rolls three times.
+        """
+        tables = LootTables.get()
+        total_loot = {'xp': 0, 'coins': 0, 'items': []}
+        for entity_id in entity_ids:
+            profile = tables.profile(entity_id)
+            if profile is None:
+                continue
+            loot = LootService._roll_loot(profile, tables)
+            total_loot['xp'] += loot['xp']
+            total_loot['coins'] += loot['coins']
+            total_loot['items'].extend(loot['items'])
+        return total_loot
+
+    @staticmethod
+    def expected_squad_loot(entity_ids):
+        """The expected {'xp', 'coins', 'items'} of generate_squad_loot for a squad."""
+        tables = LootTables.get()
+        expected = {'xp': 0.0, 'coins': 0.0, 'items': 0.0}
+        for entity_id in entity_ids:
+            profile = tables.profile(entity_id)
+            if profile is None:
+                continue
+            is_guardian = profile.entity_type == 'final_boss'
+            multiplier = 2 if is_guardian else 1
+            expected['xp'] += (profile.min_xp + profile.max_xp) / 2 * multiplier
+            expected['coins'] += (profile.min_coins + profile.max_coins) / 2 * multiplier
+            if tables.buckets_for(profile.loot_categories):
+                expected['items'] += 1.5 if is_guardian else 1
+        return expected
+
+    @staticmethod
+    def _roll_loot(profile, tables):
+        is_guardian = profile.entity_type == 'final_boss'
         xp_multiplier = 2 if is_guardian else 1
         coin_multiplier = 2 if is_guardian else 1
-        xp = random.randint(entity.min_xp, entity.max_xp) * xp_multiplier
-        coins = random.randint(entity.min_coins, entity.max_coins) * coin_multiplier
+        xp = random.randint(profile.min_xp, profile.max_xp) * xp_multiplier
+        coins = random.randint(profile.min_coins, profile.max_coins) * coin_multiplier
 
         rewards = {
             'xp': xp,
@@ -107,47 +167,18 @@ class LootService:
             'items': []
         }
 
-        possible_items_pool = list(Item.objects.filter(categories__in=entity.loot_categories.all()).distinct())
-        if not possible_items_pool:
+        buckets = tables.buckets_for(profile.loot_categories)
+        if not buckets:
             return rewards
 
         num_drops = random.randint(1, 2) if is_guardian else 1
-        rarity_table = LootService.GUARDIAN_RARITY_CHANCES if is_guardian else LootService.RARITY_CHANCES
+        sampler = LootService.rarity_sampler(profile.rank, is_guardian)
 
         for _ in range(num_drops):
-            rank_chances = rarity_table.get(entity.rank, rarity_table['E'])
-            rarity_roll = random.random()
-            chosen_rarity = 'common'
-            cumulative_chance = 0
-            for rarity, chance in rank_chances.items():
-                cumulative_chance += chance
-                if rarity_roll < cumulative_chance:
-                    chosen_rarity = rarity
-                    break
-
-            # --- Intelligent Fallback Logic 2.0 ---
-            item_to_award = None
-            rarity_index = LootService.RARITY_ORDER.index(chosen_rarity)
-
-            # 1. Search down from the chosen rarity
-            for i in range(rarity_index, -1, -1):
-                fallback_rarity = LootService.RARITY_ORDER[i]
-                items_of_rarity = [item for item in possible_items_pool if item.rarity == fallback_rarity]
-                if items_of_rarity:
-                    item_to_award = random.choice(items_of_rarity)
-                    break
-            
-            # 2. If no item was found, search up from the chosen rarity
-            if not item_to_award:
-                for i in range(rarity_index + 1, len(LootService.RARITY_ORDER) - 1):
-                    fallback_rarity = LootService.RARITY_ORDER[i]
-                    items_of_rarity = [item for item in possible_items_pool if item.rarity == fallback_rarity]
-                    if items_of_rarity:
-                        item_to_award = random.choice(items_of_rarity)
-                        break
-
-            if item_to_award:
-                rewards['items'].append({'item_id': item_to_award.id, 'quantity': 1})
+            # Fallback to the nearest stocked rarity is precomputed in the buckets.
+            item_id = buckets.pick(sampler.sample())
+            if item_id:
+                rewards['items'].append({'item_id': item_id, 'quantity': 1})
 
         return rewards
 
@@ -170,3 +201,7 @@ class LootService:
             'coins': total_coins,
             'items': items_found
         }
+
+
+RARITY_SAMPLERS = {rank: rarity_sampler(chances) for rank, chances in LootService.RARITY_CHANCES.items()}
+GUARDIAN_RARITY_SAMPLERS = {rank: rarity_sampler(chances) for rank, chances in LootService.GUARDIAN_RARITY_CHANCES.items()}
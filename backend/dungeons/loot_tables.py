@@ -0,0 +1,138 @@
+import random
+from collections import namedtuple, defaultdict
+from items.models import Item
+from campus_rpg.snapshot import VersionedSnapshot
+from .models import Entity
+
+LootProfile = namedtuple('LootProfile', ['id', 'rank', 'entity_type', 'min_xp', 'max_xp', 'min_coins', 'max_coins', 'loot_categories'])
+
+
+class AliasSampler:
+    """Samples from a fixed discrete distribution in O(1) using Vose's alias method."""
+
+    def __init__(self, outcomes, weights):
+        pairs = [(outcome, weight) for outcome, weight in zip(outcomes, weights) if weight > 0]
+        if not pairs:
+            raise ValueError("AliasSampler needs at least one outcome with a positive weight.")
+        self.outcomes = [outcome for outcome, _ in pairs]
+        size = len(pairs)
+        total = sum(weight for _, weight in pairs)
+        scaled = [weight * size / total for _, weight in pairs]
+
+        self.prob = [1.0] * size
+        self.alias = list(range(size))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1
+            (small if scaled[more] < 1 else large).append(more)
+
+    def sample(self, rng=random):
+        index = rng.randrange(len(self.outcomes))
+        if rng.random() < self.prob[index]:
+            return self.outcomes[index]
+        return self.outcomes[self.alias[index]]
+
+
+def rarity_weights(rank_chances, default_rarity='common'):
+    """
+    The effective probability of each rarity when a rarity table is walked
+    cumulatively: any probability mass the table does not cover falls to
+    default_rarity, and mass past 1.0 is never reached.
+    """
+    weights = defaultdict(float)
+    cumulative = 0.0
+    for rarity, chance in rank_chances.items():
+        weights[rarity] += max(0.0, min(cumulative + chance, 1.0) - min(cumulative, 1.0))
+        cumulative += chance
+    weights[default_rarity] += max(0.0, 1.0 - cumulative)
+    return dict(weights)
+
+
+def rarity_sampler(rank_chances, default_rarity='common'):
+    """Compiles a rarity table into an AliasSampler with the same distribution as walking it."""
+    weights = rarity_weights(rank_chances, default_rarity)
+    return AliasSampler(list(weights), list(weights.values()))
+
+
+class ItemBuckets:
+    """
+    The droppable items for one set of loot categories, bucketed by rarity, with
+    the fallback rarity for every rolled rarity resolved up front.
+    """
+
+    def __init__(self, item_rarities, rarity_order):
+        self.buckets = defaultdict(list)
+        for item_id, rarity in sorted(item_rarities):
+            self.buckets[rarity].append(item_id)
+
+        # Search down from the rolled rarity first, then up (never up to the last rarity).
+        self.fallback = {}
+        for index, rarity in enumerate(rarity_order):
+            candidates = list(range(index, -1, -1)) + list(range(index + 1, len(rarity_order) - 1))
+            self.fallback[rarity] = next((rarity_order[i] for i in candidates if self.buckets.get(rarity_order[i])), None)
+
+    def __bool__(self):
+        return bool(self.buckets)
+
+    def pick(self, rarity, rng=random):
+        resolved = self.fallback.get(rarity)
+        if resolved is None:
+            return None
+        return rng.choice(self.buckets[resolved])
+
+
+class LootTables(VersionedSnapshot):
+    """
+    A process-local snapshot of everything a loot roll needs: each entity's XP,
+    coin and loot-category profile, and the items of every loot category.
+    Buckets are compiled lazily per distinct set of loot categories, so entities
+    sharing categories share one compiled table. Saving an Item, an Entity or
+    either category relation invalidates the snapshot in every process.
+    """
+    VERSION_CACHE_KEY = 'dungeons:loot_tables_version'
+
+    def __init__(self, version, rarity_order):
+        super().__init__(version)
+        self.rarity_order = rarity_order
+        self.profiles = {}
+        self.item_rarity = {}
+        self.category_items = defaultdict(list)
+        self._buckets = {}
+
+    @classmethod
+    def build(cls, version):
+        from .loot_services import LootService
+        tables = cls(version, LootService.RARITY_ORDER)
+
+        loot_categories = defaultdict(set)
+        for entity_id, category_id in Entity.loot_categories.through.objects.values_list('entity_id', 'itemcategory_id'):
+            loot_categories[entity_id].add(category_id)
+
+        for row in Entity.objects.values('id', 'rank', 'entity_type', 'min_xp', 'max_xp', 'min_coins', 'max_coins'):
+            tables.profiles[row['id']] = LootProfile(loot_categories=frozenset(loot_categories[row['id']]), **row)
+
+        for item_id, rarity in Item.objects.values_list('id', 'rarity'):
+            tables.item_rarity[item_id] = rarity
+
+        for item_id, category_id in Item.categories.through.objects.values_list('item_id', 'itemcategory_id'):
+            if item_id in tables.item_rarity:
+                tables.category_items[category_id].append(item_id)
+
+        return tables
+
+    def profile(self, entity_id):
+        return self.profiles.get(entity_id)
+
+    def buckets_for(self, loot_categories):
+        buckets = self._buckets.get(loot_categories)
+        if buckets is None:
+            item_ids = {item_id for category_id in loot_categories for item_id in self.category_items.get(category_id, ())}
+            buckets = self._buckets[loot_categories] = ItemBuckets(
+                [(item_id, self.item_rarity[item_id]) for item_id in item_ids],
+                self.rarity_order
+            )
+        return buckets
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from dungeons.run_archive_service import RunArchiveService
+
+class Command(BaseCommand):
+    help = 'Moves completed, failed and abandoned dungeon runs older than --days into the compressed archive table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=RunArchiveService.DEFAULT_ARCHIVE_AFTER_DAYS, help='Archive runs that started more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=RunArchiveService.BATCH_SIZE, help='Runs moved per transaction.')
+
+    def handle(self, *args, **options):
+        archived = RunArchiveService.archive_finished_runs(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} dungeon runs.'))
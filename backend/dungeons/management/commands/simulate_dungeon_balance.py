@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from dungeons.floor_generation_service import FloorGenerationService
+
+class Command(BaseCommand):
+    help = 'Monte Carlo simulation of expedition clear rates, loot and XP per hour for each rank, level and Anima count.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ranks', nargs='+', default=FloorGenerationService.RANK_HIERARCHY, help='Dungeon ranks to simulate.')
+        parser.add_argument('--levels', nargs='+', type=int, default=[1, 4, 8, 20, 40, 60], help='Player levels to simulate.')
+        parser.add_argument('--anima', nargs='+', type=int, default=[3], help='Starting Anima counts to simulate.')
+        parser.add_argument('--runs', type=int, default=100_000, help='Expeditions simulated per combination.')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible results.')
+
+    def handle(self, *args, **options):
+        try:
+            from dungeons.balance_simulator import LootModel, simulate_expeditions
+        except ImportError as e:
+            raise CommandError(f"The balance simulator requires numpy, an optional dependency (pip install numpy): {e}")
+
+        for rank in options['ranks']:
+            if rank not in FloorGenerationService.RANK_BUDGETS:
+                raise CommandError(f'Unknown rank "{rank}".')
+
+        self.stdout.write(f"{'rank':<9}{'level':>6}{'anima':>6}{'clear %':>9}{'floors':>8}{'xp/run':>9}{'coins/run':>10}{'loot value':>11}{'xp/hour':>10}")
+        started = time.monotonic()
+        for rank in options['ranks']:
+            loot_model = LootModel.from_database(rank)
+            for level in options['levels']:
+                for anima in options['anima']:
+                    result = simulate_expeditions(rank, level, anima, runs=options['runs'], loot_model=loot_model, seed=options['seed'])
+                    self.stdout.write(
+                        f"{rank:<9}{level:>6}{anima:>6}{result['clear_rate'] * 100:>9.1f}{result['floors_won_per_run']:>8.2f}"
+                        f"{result['xp_per_run']:>9.1f}{result['coins_per_run']:>10.1f}{result['item_value_per_run']:>11.1f}{result['xp_per_hour']:>10.0f}"
+                    )
+        self.stdout.write(self.style.SUCCESS(f"Simulation finished in {time.monotonic() - started:.1f}s."))
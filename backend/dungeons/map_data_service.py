@@ -1,39 +1,103 @@
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import WorldZone, PlayerGate
 
-import random
-from .models import WorldZone, PlayerGate, Dungeon
+MAP_CACHE_KEY = 'dungeons:map:{user_id}:{day}'
+MANIFEST_PENDING_KEY = 'dungeons:manifest_pending:{user_id}'
+MANIFEST_PENDING_TIMEOUT = 300
 
 class MapDataService:
+
     @staticmethod
-    def get_map_data(user):
-        zones = WorldZone.objects.all()
-        player_gates = PlayerGate.objects.filter(user=user).select_related('dungeon__zone')
-
-        if not player_gates.exists():
-            from .dungeon_manifest_service import DungeonManifestService
-            DungeonManifestService.generate_daily_manifest(user)
-            player_gates = PlayerGate.objects.filter(user=user).select_related('dungeon__zone')
-
-        zones_data = []
-        for zone in zones:
-            dungeons_in_zone = []
-            for gate in player_gates:
-                if gate.dungeon.zone == zone:
-                    dungeons_in_zone.append({
-                        'id': gate.id,
-                        'name': gate.dungeon.name,
-                        'rank': gate.dungeon.rank,
-                        'map_x': gate.map_x,
-                        'map_y': gate.map_y,
-                        'is_completed': gate.is_completed,
-                        'is_lost': gate.is_lost,
-                    })
-            
-            zones_data.append({
-                'id': zone.id,
-                'name': zone.name,
-                'world_map_x': zone.world_map_x,
-                'world_map_y': zone.world_map_y,
-                'dungeons': dungeons_in_zone,
+    def _cache_key(user_id, day=None):
+        return MAP_CACHE_KEY.format(user_id=user_id, day=(day or timezone.localdate()).isoformat())
+
+    @staticmethod
+    def _seconds_until_tomorrow():
+        now = timezone.localtime()
+        tomorrow = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), time.min), now.tzinfo)
+        return max(int((tomorrow - now).total_seconds()), 1)
+
+    @staticmethod
+    def build_map_data(user_id):
+        """
+        Builds the map payload with one query for zones and one for the user's gates.
+        Returns None if the user has no manifest yet.
+        """
+        gates_by_zone = defaultdict(list)
+        gates = PlayerGate.objects.filter(user_id=user_id).order_by('id').values(
+            'id', 'map_x', 'map_y', 'is_completed', 'is_lost', 'dungeon__name', 'dungeon__rank', 'dungeon__zone_id'
+        )
+        for gate in gates:
+            gates_by_zone[gate['dungeon__zone_id']].append({
+                'id': gate['id'],
+                'name': gate['dungeon__name'],
+                'rank': gate['dungeon__rank'],
+                'map_x': gate['map_x'],
+                'map_y': gate['map_y'],
+                'is_completed': gate['is_completed'],
+                'is_lost': gate['is_lost'],
             })
-        
-        return zones_data
+        if not gates_by_zone:
+            return None
+
+        return [
+            {
+                'id': zone['id'],
+                'name': zone['name'],
+                'world_map_x': zone['world_map_x'],
+                'world_map_y': zone['world_map_y'],
+                'dungeons': gates_by_zone.get(zone['id'], []),
+            }
+            for zone in WorldZone.objects.order_by('id').values('id', 'name', 'world_map_x', 'world_map_y')
+        ]
+
+    @staticmethod
+    def get_cached_map(user):
+        """
+        Returns {'zones': [...], 'etag': str, 'status': 'ready'|'generating'} for the user's
+        manifest of the day. Ready payloads are cached until the end of the day or until
+        the user's gates change. A user without a manifest gets the zones with no gates,
+        status 'generating', and their manifest is generated in the background.
+        """
+        key = MapDataService._cache_key(user.id)
+        payload = cache.get(key)
+        if payload is not None:
+            return payload
+
+        zones_data = MapDataService.build_map_data(user.id)
+        if zones_data is None:
+            MapDataService.request_manifest(user.id)
+            zones_data = [
+                dict(zone, dungeons=[])
+                for zone in WorldZone.objects.order_by('id').values('id', 'name', 'world_map_x', 'world_map_y')
+            ]
+            return {'zones': zones_data, 'etag': None, 'status': 'generating'}
+
+        etag = hashlib.md5(json.dumps(zones_data, sort_keys=True).encode()).hexdigest()
+        payload = {'zones': zones_data, 'etag': etag, 'status': 'ready'}
+        cache.set(key, payload, MapDataService._seconds_until_tomorrow())
+        return payload
+
+    @staticmethod
+    def get_map_data(user):
+        return MapDataService.get_cached_map(user)['zones']
+
+    @staticmethod
+    def request_manifest(user_id):
+        """Queues manifest generation for a user, at most once per MANIFEST_PENDING_TIMEOUT."""
+        if cache.add(MANIFEST_PENDING_KEY.format(user_id=user_id), True, MANIFEST_PENDING_TIMEOUT):
+            from .tasks import generate_manifest_for_user
+            transaction.on_commit(lambda: generate_manifest_for_user.delay(user_id))
+
+    @staticmethod
+    def invalidate(user_ids):
+        """Drops the cached map of the given users once the current transaction commits."""
+        keys = [MapDataService._cache_key(user_id) for user_id in user_ids]
+        keys += [MANIFEST_PENDING_KEY.format(user_id=user_id) for user_id in user_ids]
+        transaction.on_commit(lambda: cache.delete_many(keys))
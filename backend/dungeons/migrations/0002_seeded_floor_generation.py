@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dungeons', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playergate',
+            name='seed',
+            field=models.PositiveBigIntegerField(blank=True, help_text='RNG seed the floors of this gate are generated from.', null=True),
+        ),
+        migrations.AddField(
+            model_name='playergate',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, help_text='The floor generation version the seed was rolled for.'),
+        ),
+        migrations.AlterField(
+            model_name='playergate',
+            name='encounter_log',
+            field=models.JSONField(default=list, help_text='DEPRECATED: Pre-generated floors. New gates only store a seed.'),
+        ),
+        migrations.AddField(
+            model_name='dungeonrun',
+            name='seed',
+            field=models.PositiveBigIntegerField(blank=True, help_text='RNG seed the floors of this run are generated from.', null=True),
+        ),
+        migrations.AddField(
+            model_name='dungeonrun',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, help_text='The floor generation version the seed was rolled for.'),
+        ),
+        migrations.AlterField(
+            model_name='dungeonrun',
+            name='encounter_log',
+            field=models.JSONField(blank=True, default=list, help_text='A detailed log of each encounter. Floors are appended as they are reached.'),
+        ),
+    ]
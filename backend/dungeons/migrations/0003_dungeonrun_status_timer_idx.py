@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dungeons', '0002_seeded_floor_generation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dungeonrun',
+            index=models.Index(fields=['status', 'floor_completion_time'], name='dungeonrun_status_timer_idx'),
+        ),
+    ]
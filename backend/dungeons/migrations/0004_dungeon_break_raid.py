@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dungeons', '0003_dungeonrun_status_timer_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DungeonBreakDamageShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('damage', models.PositiveBigIntegerField(default=0)),
+                ('active_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='damage_shards', to='dungeons.activeworldevent')),
+            ],
+            options={
+                'unique_together': {('active_event', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DungeonBreakParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('damage', models.PositiveBigIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('last_attack_at', models.DateTimeField(blank=True, null=True)),
+                ('reward_granted', models.BooleanField(default=False)),
+                ('active_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='break_participants', to='dungeons.activeworldevent')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dungeon_break_participations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('active_event', 'user')},
+            },
+        ),
+    ]
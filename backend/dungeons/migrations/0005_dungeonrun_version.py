@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dungeons', '0004_dungeon_break_raid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dungeonrun',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every state transition; writers compare-and-swap on it.'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dungeons', '0005_dungeonrun_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDungeonRun',
+            fields=[
+                ('id', models.BigIntegerField(help_text='The ID the run had in DungeonRun.', primary_key=True, serialize=False)),
+                ('dungeon_name', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('not_started', 'Not Started'), ('in_progress', 'In Progress'), ('advancing', 'Advancing'), ('encounter_resolved', 'Encounter Resolved'), ('floor_completed', 'Floor Completed'), ('completed', 'Completed'), ('failed', 'Failed'), ('abandoned', 'Abandoned')], max_length=20)),
+                ('floors_reached', models.PositiveIntegerField(default=0)),
+                ('total_floors', models.PositiveIntegerField(default=1)),
+                ('total_xp', models.PositiveIntegerField(default=0)),
+                ('total_coins', models.PositiveIntegerField(default=0)),
+                ('items_found', models.PositiveIntegerField(default=0)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('payload', models.BinaryField(help_text='zlib-compressed JSON of the remaining DungeonRun fields.')),
+                ('dungeon', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_runs', to='dungeons.dungeon')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_dungeon_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-start_time'], name='archivedrun_user_start_idx')],
+            },
+        ),
+    ]
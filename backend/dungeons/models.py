@@ -50,7 +50,7 @@ class Dungeon(models.Model):
         from dungeons.services import WorldEventService  # Add absolute import
         context = {
             'dungeon': self,
-            'zone': self.zone
+            'zone_id': self.zone_id
         }
         return WorldEventService.apply_effects(context, 'combat')
 
@@ -111,7 +111,9 @@ class PlayerGate(models.Model):
     is_completed = models.BooleanField(default=False)
     is_lost = models.BooleanField(default=False)
     total_floors = models.PositiveIntegerField()
-    encounter_log = models.JSONField(default=list)
+    encounter_log = models.JSONField(default=list, help_text='DEPRECATED: Pre-generated floors. New gates only store a seed.')
+    seed = models.PositiveBigIntegerField(blank=True, null=True, help_text='RNG seed the floors of this gate are generated from.')
+    content_version = models.PositiveIntegerField(default=0, help_text='The floor generation version the seed was rolled for.')
 
     class Meta:
         unique_together = ('user', 'dungeon', 'day')
@@ -142,7 +144,9 @@ class DungeonRun(models.Model):
     end_time = models.DateTimeField(blank=True, null=True)
     rewards = models.JSONField(default=dict, help_text='All rewards for this run')
     tactical_approach_log = models.JSONField(default=list, blank=True, help_text='A log of the tactical choices made by the player.')
-    encounter_log = models.JSONField(default=list, blank=True, help_text='A detailed log of each encounter.')
+    encounter_log = models.JSONField(default=list, blank=True, help_text='A detailed log of each encounter. Floors are appended as they are reached.')
+    seed = models.PositiveBigIntegerField(blank=True, null=True, help_text='RNG seed the floors of this run are generated from.')
+    content_version = models.PositiveIntegerField(default=0, help_text='The floor generation version the seed was rolled for.')
     unclaimed_rewards = models.JSONField(default=list, blank=True, help_text='A list of rewards that have not yet been claimed by the player.')
     last_floor_results = models.JSONField(default=dict, blank=True, help_text='DEPRECATED: The results of the most recently completed floor.')
     last_encounter_result = models.JSONField(default=dict, blank=True, help_text='The result of the most recently resolved encounter.')
@@ -151,10 +155,45 @@ class DungeonRun(models.Model):
     provisions_used = models.JSONField(default=list, blank=True, help_text='List of provision item IDs used for this run')
     critical_events = models.JSONField(default=list, blank=True, help_text='List of critical events (with status/choices) for this run')
     anomaly_state = models.CharField(max_length=50, blank=True, help_text='e.g., "Swarm", "Elite", "Volatile"')
+    version = models.PositiveIntegerField(default=0, help_text='Bumped on every state transition; writers compare-and-swap on it.')
+
+    class Meta:
+        indexes = [
+            # Lets the expiry scheduler find runs whose encounter timer has run out.
+            models.Index(fields=['status', 'floor_completion_time'], name='dungeonrun_status_timer_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.dungeon.name} Run ({self.status})"
 
+class ArchivedDungeonRun(models.Model):
+    """
+    A finished DungeonRun moved out of the hot table. It keeps the original ID, a few
+    summary columns for history listings, and every other field as zlib-compressed JSON.
+    """
+    id = models.BigIntegerField(primary_key=True, help_text='The ID the run had in DungeonRun.')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_dungeon_runs')
+    dungeon = models.ForeignKey(Dungeon, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_runs')
+    dungeon_name = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=DungeonRun.STATUS_CHOICES)
+    floors_reached = models.PositiveIntegerField(default=0)
+    total_floors = models.PositiveIntegerField(default=1)
+    total_xp = models.PositiveIntegerField(default=0)
+    total_coins = models.PositiveIntegerField(default=0)
+    items_found = models.PositiveIntegerField(default=0)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    payload = models.BinaryField(help_text='zlib-compressed JSON of the remaining DungeonRun fields.')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-start_time'], name='archivedrun_user_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.dungeon_name} Run ({self.status}, archived)"
+
 
 # --- New Models for Phase 1 ---
 class WorldZone(models.Model):
@@ -312,6 +351,35 @@ class ActiveWorldEvent(models.Model):
     def __str__(self):
         return f"{self.event.name} in {self.zone.name}"
 
+class DungeonBreakDamageShard(models.Model):
+    """
+    One of several counters a Dungeon Break boss's damage is spread over, so that
+    concurrent attacks do not all update a single row. Summed by DungeonBreakService.
+    """
+    active_event = models.ForeignKey(ActiveWorldEvent, on_delete=models.CASCADE, related_name='damage_shards')
+    shard = models.PositiveSmallIntegerField()
+    damage = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('active_event', 'shard')
+
+    def __str__(self):
+        return f"{self.active_event} shard {self.shard}: {self.damage}"
+
+class DungeonBreakParticipant(models.Model):
+    active_event = models.ForeignKey(ActiveWorldEvent, on_delete=models.CASCADE, related_name='break_participants')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='dungeon_break_participations')
+    damage = models.PositiveBigIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    last_attack_at = models.DateTimeField(blank=True, null=True)
+    reward_granted = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('active_event', 'user')
+
+    def __str__(self):
+        return f"{self.user.email} in {self.active_event}: {self.damage} damage"
+
 class EventTriggerHistory(models.Model):
     event = models.ForeignKey(WorldEvent, on_delete=models.CASCADE)
     zone = models.ForeignKey(WorldZone, on_delete=models.CASCADE)
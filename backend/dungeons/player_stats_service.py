@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.db import transaction
+from items.models import InventoryItem
+from .models import UserTalent, UserLegacyTrait
+from .talent_services import TalentService
+
+BASE_PLAYER_POWER_MULTIPLIER = 18
+STAT_SHEET_CACHE_KEY = 'dungeons:stat_sheet:{user_id}'
+STAT_SHEET_VERSION_KEY = 'dungeons:stat_sheet_version'
+STAT_SHEET_TIMEOUT = 60 * 60 * 24
+
+
+def apply_power_modifiers(power, effects):
+    """Applies PLAYER_MODIFIER effects on PlayerPower (ADD or MULTIPLY), in order."""
+    for effect in effects:
+        if isinstance(effect, dict) and effect.get('type') == 'PLAYER_MODIFIER' and effect.get('stat') == 'PlayerPower':
+            operation = effect.get('operation')
+            value = effect.get('value')
+            if operation == 'ADD':
+                power += value
+            elif operation == 'MULTIPLY':
+                power *= value
+    return power
+
+
+class PlayerStatService:
+    """
+    A player's combat stat sheet: level power, equipped gear power, talent rank bonuses
+    and legacy trait effects, computed once and cached.
+
+    A sheet is stamped with the user's level and a global version. Changing a user's
+    talents, legacy traits or inventory drops their sheet; changing a Talent, LegacyTrait
+    or Item bumps the global version and so retires every sheet.
+    """
+
+    @staticmethod
+    def get_stat_sheet(user):
+        key = STAT_SHEET_CACHE_KEY.format(user_id=user.id)
+        cached = cache.get_many([STAT_SHEET_VERSION_KEY, key])
+        version = cached.get(STAT_SHEET_VERSION_KEY, 0)
+        entry = cached.get(key)
+        if entry and entry['stamp'] == [version, user.level]:
+            return entry['sheet']
+
+        sheet = PlayerStatService.build_stat_sheet(user)
+        cache.set(key, {'stamp': [version, user.level], 'sheet': sheet}, STAT_SHEET_TIMEOUT)
+        return sheet
+
+    @staticmethod
+    def build_stat_sheet(user):
+        base_power = user.level * BASE_PLAYER_POWER_MULTIPLIER
+        gear_power = sum(
+            InventoryItem.objects.filter(user=user, is_equipped=True).values_list('item__power', flat=True)
+        )
+        user_talents = UserTalent.objects.filter(user=user).select_related('talent')
+        talent_bonuses = TalentService.apply_talent_effects(user, {}, user_talents=user_talents)
+
+        legacy_effects = []
+        for effect in UserLegacyTrait.objects.filter(user=user).order_by('id').values_list('trait__effect', flat=True):
+            if isinstance(effect, dict):
+                legacy_effects.extend(effect.get('effects', [effect]))
+
+        power = base_power + gear_power + talent_bonuses.get('power', 0)
+        return {
+            'level': user.level,
+            'base_power': base_power,
+            'gear_power': gear_power,
+            'talent_bonuses': talent_bonuses,
+            'legacy_effects': legacy_effects,
+            'power': apply_power_modifiers(power, legacy_effects),
+        }
+
+    @staticmethod
+    def invalidate(user_id):
+        """Drops one user's sheet once the current transaction commits."""
+        transaction.on_commit(lambda: cache.delete(STAT_SHEET_CACHE_KEY.format(user_id=user_id)))
+
+    @staticmethod
+    def invalidate_all():
+        """Retires every sheet once the current transaction commits."""
+        def bump():
+            try:
+                cache.incr(STAT_SHEET_VERSION_KEY)
+            except ValueError:
+                cache.set(STAT_SHEET_VERSION_KEY, 1, timeout=None)
+        transaction.on_commit(bump)
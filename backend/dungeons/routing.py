@@ -0,0 +1,7 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/dungeon-run/(?P<run_id>\d+)/$', consumers.DungeonRunConsumer.as_asgi()),
+    re_path(r'ws/world/$', consumers.WorldUpdatesConsumer.as_asgi()),
+]
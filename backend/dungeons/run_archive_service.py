@@ -0,0 +1,177 @@
+import json
+import zlib
+from datetime import timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from .models import DungeonRun, ArchivedDungeonRun
+from .loot_services import LootService
+
+# Columns copied onto the archive row; everything else goes into the compressed payload.
+SUMMARY_FIELDS = ('user_id', 'dungeon_id', 'status', 'total_floors', 'start_time', 'end_time')
+
+
+class RunArchiveService:
+    """
+    Moves finished expeditions out of DungeonRun into ArchivedDungeonRun, and reads a
+    user's run history from both tables so callers never need to know where a run lives.
+    """
+
+    TERMINAL_STATUSES = ('completed', 'failed', 'abandoned')
+    DEFAULT_ARCHIVE_AFTER_DAYS = 30
+    BATCH_SIZE = 500
+    COMPRESSION_LEVEL = 6
+
+    @staticmethod
+    def compress(data):
+        return zlib.compress(json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8'), RunArchiveService.COMPRESSION_LEVEL)
+
+    @staticmethod
+    def decompress(payload):
+        return json.loads(zlib.decompress(bytes(payload)).decode('utf-8'))
+
+    @staticmethod
+    def summarize(encounter_log):
+        """Totals the loot of every won encounter in a run's encounter log."""
+        totals = {'xp': 0, 'coins': 0, 'items': 0}
+        for floor_log in encounter_log or []:
+            rewards = LootService.calculate_floor_rewards(floor_log)
+            totals['xp'] += rewards['xp']
+            totals['coins'] += rewards['coins']
+            totals['items'] += len(rewards['items'])
+        return totals
+
+    @staticmethod
+    def build_archive(dungeon_run):
+        """Returns an unsaved ArchivedDungeonRun holding everything in dungeon_run."""
+        fields = {
+            field.attname: field.value_from_object(dungeon_run)
+            for field in DungeonRun._meta.concrete_fields
+            if not field.primary_key
+        }
+        totals = RunArchiveService.summarize(dungeon_run.encounter_log)
+        return ArchivedDungeonRun(
+            id=dungeon_run.id,
+            dungeon_name=dungeon_run.dungeon.name,
+            floors_reached=dungeon_run.current_floor,
+            total_xp=totals['xp'],
+            total_coins=totals['coins'],
+            items_found=totals['items'],
+            payload=RunArchiveService.compress({
+                name: value for name, value in fields.items() if name not in SUMMARY_FIELDS
+            }),
+            **{name: fields[name] for name in SUMMARY_FIELDS},
+        )
+
+    @staticmethod
+    def archive_finished_runs(older_than_days=DEFAULT_ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE, now=None):
+        """
+        Archives terminal runs that started more than older_than_days ago, batch_size
+        at a time. Runs still holding unclaimed rewards stay in DungeonRun so the player
+        can claim them. Returns the number of runs archived.
+        """
+        cutoff = (now or timezone.now()) - timedelta(days=older_than_days)
+        candidates = DungeonRun.objects.filter(
+            status__in=RunArchiveService.TERMINAL_STATUSES,
+            start_time__lt=cutoff,
+            unclaimed_rewards=[],
+        )
+
+        archived = 0
+        while True:
+            with transaction.atomic():
+                runs = list(
+                    candidates.select_related('dungeon').select_for_update(skip_locked=True, of=('self',))
+                    .order_by('id')[:batch_size]
+                )
+                if not runs:
+                    break
+                ArchivedDungeonRun.objects.bulk_create(
+                    [RunArchiveService.build_archive(run) for run in runs], ignore_conflicts=True
+                )
+                DungeonRun.objects.filter(id__in=[run.id for run in runs]).delete()
+            archived += len(runs)
+            if len(runs) < batch_size:
+                break
+        return archived
+
+    @staticmethod
+    def _live_entry(dungeon_run):
+        totals = RunArchiveService.summarize(dungeon_run.encounter_log)
+        return {
+            'id': dungeon_run.id,
+            'dungeon_id': dungeon_run.dungeon_id,
+            'dungeon_name': dungeon_run.dungeon.name,
+            'status': dungeon_run.status,
+            'floors_reached': dungeon_run.current_floor,
+            'total_floors': dungeon_run.total_floors,
+            'total_xp': totals['xp'],
+            'total_coins': totals['coins'],
+            'items_found': totals['items'],
+            'start_time': dungeon_run.start_time,
+            'end_time': dungeon_run.end_time,
+            'archived': False,
+        }
+
+    @staticmethod
+    def _archived_entry(archived_run):
+        return {
+            'id': archived_run.id,
+            'dungeon_id': archived_run.dungeon_id,
+            'dungeon_name': archived_run.dungeon_name,
+            'status': archived_run.status,
+            'floors_reached': archived_run.floors_reached,
+            'total_floors': archived_run.total_floors,
+            'total_xp': archived_run.total_xp,
+            'total_coins': archived_run.total_coins,
+            'items_found': archived_run.items_found,
+            'start_time': archived_run.start_time,
+            'end_time': archived_run.end_time,
+            'archived': True,
+        }
+
+    @staticmethod
+    def get_history(user, limit=20, offset=0):
+        """
+        A page of the user's runs, newest first, merged from both tables. Each table
+        is asked for at most offset + limit rows, so deep pages stay bounded.
+        """
+        window = offset + limit
+        live = DungeonRun.objects.filter(user=user).select_related('dungeon').defer(
+            'tactical_approach_log', 'last_floor_results', 'last_encounter_result', 'critical_events'
+        ).order_by('-start_time')[:window]
+        archived = ArchivedDungeonRun.objects.filter(user=user).defer('payload').order_by('-start_time')[:window]
+
+        entries = [RunArchiveService._live_entry(run) for run in live]
+        entries += [RunArchiveService._archived_entry(run) for run in archived]
+        entries.sort(key=lambda entry: entry['start_time'], reverse=True)
+
+        total = DungeonRun.objects.filter(user=user).count() + ArchivedDungeonRun.objects.filter(user=user).count()
+        return {'count': total, 'results': entries[offset:window]}
+
+    @staticmethod
+    def get_run(user, run_id):
+        """A single run with its full encounter log, wherever it is stored, or None."""
+        dungeon_run = DungeonRun.objects.select_related('dungeon').filter(id=run_id, user=user).first()
+        if dungeon_run:
+            entry = RunArchiveService._live_entry(dungeon_run)
+            entry.update(
+                anima=dungeon_run.anima,
+                rewards=dungeon_run.rewards,
+                encounter_log=dungeon_run.encounter_log,
+                tactical_approach_log=dungeon_run.tactical_approach_log,
+            )
+            return entry
+
+        archived_run = ArchivedDungeonRun.objects.filter(id=run_id, user=user).first()
+        if archived_run:
+            entry = RunArchiveService._archived_entry(archived_run)
+            payload = RunArchiveService.decompress(archived_run.payload)
+            entry.update(
+                anima=payload.get('anima'),
+                rewards=payload.get('rewards', {}),
+                encounter_log=payload.get('encounter_log', []),
+                tactical_approach_log=payload.get('tactical_approach_log', []),
+            )
+            return entry
+        return None
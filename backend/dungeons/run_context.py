@@ -0,0 +1,67 @@
+import copy
+from django.db.models import F
+from .models import DungeonRun
+
+
+class RunConflict(Exception):
+    """Another request changed the run between this transition's read and its write."""
+
+
+class RunContext:
+    """
+    A unit of work for a single DungeonRun transition.
+
+    The run is loaded once together with its dungeon, without a row lock. On a clean
+    exit only the fields that actually changed are written back, with a compare-and-swap
+    on the status and version that were read:
+
+        UPDATE ... SET <changed>, version = version + 1 WHERE id = ... AND status = ... AND version = ...
+
+    If another request got there first no row matches and RunConflict is raised, so a
+    double click or a second tab cannot resolve an encounter or pay a floor twice. JSON
+    fields are compared against a deep copy taken at load time, which catches in-place
+    list/dict mutation.
+
+        with RunContext(user, run_id) as dungeon_run:
+            dungeon_run.status = 'advancing'
+    """
+
+    def __init__(self, user, dungeon_run_id):
+        self.user = user
+        self.dungeon_run_id = dungeon_run_id
+        self.dungeon_run = None
+        self._snapshot = {}
+
+    def __enter__(self):
+        self.dungeon_run = DungeonRun.objects.select_related('dungeon').get(id=self.dungeon_run_id, user=self.user)
+        self._take_snapshot()
+        return self.dungeon_run
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.save()
+        return False
+
+    def _take_snapshot(self):
+        self._snapshot = {
+            field.attname: copy.deepcopy(field.value_from_object(self.dungeon_run))
+            for field in DungeonRun._meta.concrete_fields
+            if not field.primary_key
+        }
+
+    def changed_fields(self):
+        return [name for name, value in self._snapshot.items() if getattr(self.dungeon_run, name) != value]
+
+    def save(self):
+        changed = [name for name in self.changed_fields() if name != 'version']
+        if changed:
+            updated = DungeonRun.objects.filter(
+                pk=self.dungeon_run.pk,
+                status=self._snapshot['status'],
+                version=self._snapshot['version'],
+            ).update(version=F('version') + 1, **{name: getattr(self.dungeon_run, name) for name in changed})
+            if not updated:
+                raise RunConflict("This expedition was updated by another request. Refresh and try again.")
+            self.dungeon_run.version = self._snapshot['version'] + 1
+            self._take_snapshot()
+        return changed
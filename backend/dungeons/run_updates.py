@@ -0,0 +1,42 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def run_group_name(dungeon_run_id):
+    return f'dungeon_run_{dungeon_run_id}'
+
+def publish_run_state(dungeon_run_id, event, state):
+    """Pushes a run's new state to its WebSocket subscribers once the current transaction commits."""
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            run_group_name(dungeon_run_id),
+            {
+                'type': 'run_update',
+                'event': event,
+                'state': state
+            }
+        )
+
+    transaction.on_commit(send)
+
+WORLD_GROUP_NAME = 'world_updates'
+
+def publish_world_changes(changes):
+    """Pushes the dungeons and zones changed by a world tick to every map subscriber once the transaction commits."""
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            WORLD_GROUP_NAME,
+            {
+                'type': 'world_update',
+                'changes': changes
+            }
+        )
+
+    transaction.on_commit(send)
@@ -0,0 +1 @@
+from .world_event import WorldEventService
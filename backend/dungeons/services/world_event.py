@@ -8,8 +8,9 @@ from items.models import Item
 from accounts.models import UserCurrency
 from dungeons.models import (
     WorldEvent, WorldEventEffect, ActiveWorldEvent, 
-    WorldZone, Dungeon, EventEffectApplication
+    WorldZone, Dungeon, EventEffectApplication, EventTriggerHistory
 )
+from dungeons.world_event_modifiers import WorldEventModifiers
 
 class WorldEventService:
     @staticmethod
@@ -26,39 +27,14 @@ class WorldEventService:
     
     @staticmethod
     def apply_effects(context, target_type):
-        modifiers = {}
-        zone = context.get('zone')
-        active_events = WorldEventService.get_active_events(zone=zone)
-        
-        for active_event in active_events:
-            for effect_app in active_event.event.eventeffectapplication_set.all():
-                effect = effect_app.effect
-                params = {**effect.parameters, **effect_app.parameters}
-                
-                # Apply effect based on type
-                if effect.effect_type == 'DAMAGE_MOD' and target_type == 'combat':
-                    if params.get('target') == 'player':
-                        modifiers.setdefault('player_damage_mod', 0)
-                        modifiers['player_damage_mod'] += params['value']
-                    elif params.get('target') == 'enemy':
-                        modifiers.setdefault('enemy_damage_mod', 0)
-                        modifiers['enemy_damage_mod'] += params['value']
-                
-                elif effect.effect_type == 'LOOT_MOD' and target_type == 'loot':
-                    modifiers.setdefault('drop_rate_mod', {})
-                    for rarity, value in params['rarity_rates'].items():
-                        modifiers['drop_rate_mod'].setdefault(rarity, 0)
-                        modifiers['drop_rate_mod'][rarity] += value
-                
-                elif effect.effect_type == 'ENVIRONMENT' and target_type == 'environment':
-                    modifiers.setdefault('environmental_effects', [])
-                    modifiers['environmental_effects'].append({
-                        'name': effect.name,
-                        'key': effect.identifier,
-                        **params
-                    })
-        
-        return modifiers
+        """
+        The merged modifiers of the active events in the context's zone for a target type.
+        Read from the compiled per-zone cache; the returned dict must not be mutated.
+        """
+        zone_id = context.get('zone_id')
+        if zone_id is None and context.get('zone'):
+            zone_id = context['zone'].id
+        return WorldEventModifiers.get().for_zone(zone_id, target_type)
 
     @staticmethod
     def trigger_event(event_identifier, zone, triggered_by='system', details=None):
@@ -72,6 +48,13 @@ class WorldEventService:
                 zone=zone,
                 end_time=end_time
             )
+            # Recorded so the scheduler's cooldowns also cover manual triggers.
+            EventTriggerHistory.objects.create(
+                event=event,
+                zone=zone,
+                triggered_by=triggered_by,
+                details=details or {}
+            )
             
             return active_event
         except WorldEvent.DoesNotExist:
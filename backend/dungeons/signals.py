@@ -0,0 +1,58 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from items.models import Item, InventoryItem
+from .models import (
+    Entity, EntityCategory, Dungeon, TacticalApproach, ActiveWorldEvent, EventEffectApplication, WorldEventEffect,
+    Talent, UserTalent, LegacyTrait, UserLegacyTrait,
+)
+from .entity_catalog import EntityCatalog
+from .loot_tables import LootTables
+from .world_event_modifiers import WorldEventModifiers
+from .player_stats_service import PlayerStatService
+
+
+@receiver([post_save, post_delete], sender=Entity)
+@receiver([post_save, post_delete], sender=EntityCategory)
+@receiver([post_save, post_delete], sender=TacticalApproach)
+def invalidate_entity_catalog(sender, **kwargs):
+    EntityCatalog.invalidate()
+
+@receiver(m2m_changed, sender=Entity.categories.through)
+@receiver(m2m_changed, sender=Dungeon.entity_categories.through)
+def invalidate_entity_catalog_on_categories_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        EntityCatalog.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Entity)
+@receiver([post_save, post_delete], sender=Item)
+def invalidate_loot_tables(sender, **kwargs):
+    LootTables.invalidate()
+
+@receiver(m2m_changed, sender=Entity.loot_categories.through)
+@receiver(m2m_changed, sender=Item.categories.through)
+def invalidate_loot_tables_on_categories_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        LootTables.invalidate()
+
+
+
+@receiver([post_save, post_delete], sender=ActiveWorldEvent)
+@receiver([post_save, post_delete], sender=EventEffectApplication)
+@receiver([post_save, post_delete], sender=WorldEventEffect)
+def invalidate_world_event_modifiers(sender, **kwargs):
+    WorldEventModifiers.invalidate()
+
+
+
+@receiver([post_save, post_delete], sender=UserTalent)
+@receiver([post_save, post_delete], sender=UserLegacyTrait)
+@receiver([post_save, post_delete], sender=InventoryItem)
+def invalidate_player_stat_sheet(sender, instance, **kwargs):
+    PlayerStatService.invalidate(instance.user_id)
+
+@receiver([post_save, post_delete], sender=Talent)
+@receiver([post_save, post_delete], sender=LegacyTrait)
+@receiver([post_save, post_delete], sender=Item)
+def invalidate_all_player_stat_sheets(sender, **kwargs):
+    PlayerStatService.invalidate_all()
@@ -6,8 +6,8 @@ class TalentService:
         return UserTalent.objects.filter(user=user)
 
     @staticmethod
-    def apply_talent_effects(user, base_stats):
-        talents = TalentService.get_user_talents(user)
+    def apply_talent_effects(user, base_stats, user_talents=None):
+        talents = user_talents if user_talents is not None else TalentService.get_user_talents(user).select_related('talent')
         modified_stats = base_stats.copy()
 
         for user_talent in talents:
@@ -1,14 +1,115 @@
-
-from celery import shared_task
+import logging
+import time
+from celery import shared_task, group
 from .dungeon_manifest_service import DungeonManifestService
+from .encounter_expiry_service import EncounterExpiryService
+from .dungeon_break_service import DungeonBreakService
+from .run_archive_service import RunArchiveService
+from .world_tick_service import WorldTickService
+from .world_event_scheduler import WorldEventScheduler
 from accounts.models import User
 
+logger = logging.getLogger(__name__)
+
+MANIFEST_CHUNK_SIZE = 250
+
 @shared_task
 def generate_daily_manifests_for_all_users():
-    """A daily task to generate a new gate manifest for every user."""
-    print("--- Running Daily Manifest Generation Task ---")
-    users = User.objects.filter(is_active=True)
-    for user in users:
-        print(f"Generating manifest for {user.email}...")
+    """
+    A daily task to generate a new gate manifest for every user.
+    The active user ID range is split into shards of MANIFEST_CHUNK_SIZE users,
+    and each shard is generated by its own subtask so the work spreads across workers.
+    """
+    user_ids = list(User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    shards = [
+        (chunk[0], chunk[-1])
+        for chunk in (user_ids[i:i + MANIFEST_CHUNK_SIZE] for i in range(0, len(user_ids), MANIFEST_CHUNK_SIZE))
+    ]
+    group(generate_manifest_shard.s(first_id, last_id) for first_id, last_id in shards).apply_async()
+    logger.info("Dispatched daily manifest generation for %d users in %d shards.", len(user_ids), len(shards))
+    return {'users': len(user_ids), 'shards': len(shards)}
+
+@shared_task
+def generate_manifest_shard(first_user_id, last_user_id):
+    """Generates manifests for every active user whose ID falls in [first_user_id, last_user_id]."""
+    started = time.monotonic()
+    user_ids = list(
+        User.objects.filter(is_active=True, id__gte=first_user_id, id__lte=last_user_id).values_list('id', flat=True)
+    )
+    gates_created = DungeonManifestService.generate_manifests_for_users(user_ids)
+    elapsed = time.monotonic() - started
+
+    metrics = {
+        'first_user_id': first_user_id,
+        'last_user_id': last_user_id,
+        'users': len(user_ids),
+        'gates': gates_created,
+        'seconds': round(elapsed, 3),
+        'users_per_second': round(len(user_ids) / elapsed, 1) if elapsed else None,
+        'gates_per_second': round(gates_created / elapsed, 1) if elapsed else None,
+    }
+    logger.info(
+        "Manifest shard %d-%d: %d users, %d gates in %.2fs (%s users/s).",
+        first_user_id, last_user_id, metrics['users'], gates_created, elapsed, metrics['users_per_second'],
+    )
+    return metrics
+
+@shared_task
+def generate_manifest_for_user(user_id):
+    """Generates one user's manifest in the background, for users who opened the map without one."""
+    user = User.objects.filter(id=user_id).first()
+    if user:
         DungeonManifestService.generate_daily_manifest(user)
-    print("--- Daily Manifest Generation Complete ---")
+
+
+@shared_task
+def resolve_expired_encounters():
+    """Periodic task that resolves every encounter whose timer has expired."""
+    resolved_runs = EncounterExpiryService.resolve_expired_encounters()
+    if resolved_runs:
+        logger.info("Resolved %d expired encounters.", len(resolved_runs))
+    return len(resolved_runs)
+
+
+@shared_task
+def aggregate_dungeon_breaks():
+    """Periodic task that folds Dungeon Break damage shards into each boss's HP."""
+    readouts = DungeonBreakService.aggregate_active_breaks()
+    return len(readouts)
+
+
+@shared_task
+def distribute_dungeon_break_rewards(active_event_id):
+    """Pays the participants of a defeated Dungeon Break boss."""
+    paid = DungeonBreakService.distribute_rewards(active_event_id)
+    logger.info("Paid Dungeon Break %d rewards to %d participants.", active_event_id, paid)
+    return paid
+
+
+@shared_task
+def archive_finished_runs(older_than_days=RunArchiveService.DEFAULT_ARCHIVE_AFTER_DAYS):
+    """Daily task that moves old finished runs into the compressed archive table."""
+    archived = RunArchiveService.archive_finished_runs(older_than_days)
+    logger.info("Archived %d finished dungeon runs older than %d days.", archived, older_than_days)
+    return archived
+
+
+@shared_task
+def world_tick():
+    """Periodic task that advances dungeon instability, anomalies and zone saturation."""
+    changes = WorldTickService.tick()
+    if changes['dungeons'] or changes['zones']:
+        logger.info(
+            "World tick changed %d dungeons and %d zones (%d Dungeon Breaks).",
+            len(changes['dungeons']), len(changes['zones']), len(changes['dungeon_breaks']),
+        )
+    return {key: len(value) for key, value in changes.items()}
+
+
+@shared_task
+def schedule_world_events():
+    """Periodic task that triggers every world event whose activation conditions hold."""
+    triggered = WorldEventScheduler.run()
+    if triggered:
+        logger.info("Triggered %d world events.", len(triggered))
+    return len(triggered)
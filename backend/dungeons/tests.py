@@ -0,0 +1,546 @@
+import random
+from io import StringIO
+from unittest import skipUnless
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from accounts.models import User
+from datetime import timedelta
+from django.utils import timezone
+from .models import Dungeon, Entity, EntityCategory, TacticalApproach, WorldZone, PlayerGate, DungeonRun, WorldEvent, WorldEventEffect, EventEffectApplication
+from .services import WorldEventService
+from .world_event_modifiers import WorldEventModifiers
+from .player_stats_service import PlayerStatService
+from .dungeon_break_service import DungeonBreakService
+from .models import ActiveWorldEvent, DungeonBreakDamageShard, DungeonBreakParticipant, EventTriggerHistory
+from accounts.currency_registry import CurrencyRegistry
+from accounts.models import Currency
+from transactions.models import CurrencyTransaction
+from .models import Talent, UserTalent, LegacyTrait, UserLegacyTrait
+from items.models import Item, InventoryItem
+from .entity_catalog import EntityCatalog, EntityPool, CatalogEntity
+from .floor_generation_service import FloorGenerationService
+from .dungeon_manifest_service import DungeonManifestService
+from .run_context import RunContext, RunConflict
+from .run_archive_service import RunArchiveService
+from .encounter_expiry_service import EncounterExpiryService
+from .world_tick_service import WorldTickService
+from .world_event_scheduler import WorldEventScheduler, compile_conditions, ZoneFacts
+from .models import ArchivedDungeonRun
+from .engine import DungeonEngine
+from .expedition_forecast import forecast_expedition
+from .map_data_service import MapDataService
+from .loot_tables import AliasSampler, ItemBuckets, rarity_sampler
+from .loot_services import LootService
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class EntityPoolTests(TestCase):
+    def setUp(self):
+        self.pool = EntityPool([
+            CatalogEntity(id=i, name=f'Minion {i}', rank='E', entity_type='minion', power=power)
+            for i, power in enumerate([8, 2, 5, 5, 12])
+        ])
+
+    def test_strongest_within_budget(self):
+        self.assertEqual(self.pool.strongest_within(7).power, 5)
+        self.assertEqual(self.pool.strongest_within(12).power, 12)
+        self.assertIsNone(self.pool.strongest_within(1))
+
+    def test_random_within_respects_budget(self):
+        for _ in range(50):
+            self.assertLessEqual(self.pool.random_within(6).power, 6)
+        self.assertIsNone(self.pool.random_within(1))
+
+
+class LootTableTests(TestCase):
+    def test_alias_sampler_only_returns_weighted_outcomes(self):
+        sampler = AliasSampler(['common', 'rare', 'epic'], [0.75, 0.25, 0])
+        outcomes = {sampler.sample() for _ in range(500)}
+        self.assertEqual(outcomes, {'common', 'rare'})
+
+    def test_rarity_sampler_gives_uncovered_mass_to_common(self):
+        sampler = rarity_sampler({'common': 0.0, 'rare': 0.5})
+        self.assertEqual(set(sampler.outcomes), {'common', 'rare'})
+
+    def test_item_buckets_fall_back_down_then_up(self):
+        buckets = ItemBuckets([(1, 'uncommon'), (2, 'epic')], LootService.RARITY_ORDER)
+        self.assertEqual(buckets.fallback['rare'], 'uncommon')
+        self.assertEqual(buckets.fallback['common'], 'uncommon')
+        self.assertEqual(buckets.fallback['eternal'], 'epic')
+        self.assertEqual(buckets.pick('legendary'), 2)
+
+
+class DungeonTestDataMixin:
+    def create_dungeon_data(self):
+        self.category = EntityCategory.objects.create(name='Goblins')
+        self.zone = WorldZone.objects.create(name='Greenwood', rank_pool=['E'])
+        self.dungeons = []
+        for i in range(3):
+            dungeon = Dungeon.objects.create(name=f'Goblin Den {i}', rank='E', zone=self.zone)
+            dungeon.entity_categories.add(self.category)
+            self.dungeons.append(dungeon)
+        self.dungeon = self.dungeons[0]
+        for name, entity_type, power in [('Goblin', 'minion', 4), ('Goblin Chief', 'boss', 15), ('Goblin King', 'final_boss', 30)]:
+            entity = Entity.objects.create(name=name, rank='E', entity_type=entity_type, power=power)
+            entity.categories.add(self.category)
+        TacticalApproach.objects.create(name='Charge', category='Brute Force', description='Charge in.')
+        EntityCatalog._bump_version()
+
+
+class FloorGenerationCatalogTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_dungeon_data()
+
+    def test_generate_floor_uses_catalog(self):
+        EntityCatalog.get()
+        with self.assertNumQueries(0):
+            floor = FloorGenerationService.generate_floor(self.dungeon, 4, 4)
+        self.assertEqual(floor['encounters'][0]['entities'][0]['name'], 'Goblin King')
+
+    def test_seeded_floor_is_reproducible(self):
+        first = FloorGenerationService.generate_seeded_floor(self.dungeon, 6, 2, seed=1234)
+        second = FloorGenerationService.generate_seeded_floor(self.dungeon, 6, 2, seed=1234)
+        self.assertEqual(first, second)
+
+    def test_catalog_rebuilds_after_entity_save(self):
+        version = EntityCatalog.get().version
+        with self.captureOnCommitCallbacks(execute=True):
+            Entity.objects.create(name='Hobgoblin', rank='E', entity_type='minion', power=6)
+        self.assertNotEqual(EntityCatalog.get().version, version)
+
+    def test_catalog_change_retires_old_seeds(self):
+        user = User.objects.create_user(email='delver@example.com', username='delver', password='testpassword')
+        content_version = FloorGenerationService.content_version()
+        run = DungeonRun.objects.create(user=user, dungeon=self.dungeon, total_floors=4, seed=1234, content_version=content_version)
+        king = Entity.objects.get(name='Goblin King')
+        king.power = 40
+        with self.captureOnCommitCallbacks(execute=True):
+            king.save()
+
+        self.assertNotEqual(FloorGenerationService.content_version(), content_version)
+        engine = DungeonEngine(user)
+        self.assertIsNone(engine.forecast_floors(self.dungeon, 4, 1234, content_version, [], 1, 3))
+        engine._ensure_floor_generated(run, 1)
+        self.assertEqual(run.content_version, FloorGenerationService.content_version())
+
+    def test_new_approach_retires_old_seeds(self):
+        content_version = FloorGenerationService.content_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            TacticalApproach.objects.create(name='Ambush', category='Brute Force', description='Wait for them.')
+        self.assertNotEqual(FloorGenerationService.content_version(), content_version)
+
+
+class DungeonManifestTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        # Map payloads are cached per user ID, which the next test's users reuse.
+        cache.clear()
+        self.create_dungeon_data()
+        self.users = [
+            User.objects.create_user(email=f'hunter{i}@example.com', username=f'hunter{i}', password='testpassword')
+            for i in range(3)
+        ]
+
+    def test_generate_manifests_for_users_replaces_gates(self):
+        user_ids = [user.id for user in self.users]
+        DungeonManifestService.generate_manifests_for_users(user_ids)
+        created = DungeonManifestService.generate_manifests_for_users(user_ids)
+        self.assertEqual(PlayerGate.objects.filter(user_id__in=user_ids).count(), created)
+        self.assertEqual(PlayerGate.objects.filter(user=self.users[0]).count(), 3)
+
+    def test_gates_store_seed_instead_of_floors(self):
+        DungeonManifestService.generate_daily_manifest(self.users[0])
+        gate = PlayerGate.objects.filter(user=self.users[0]).first()
+        self.assertIsNotNone(gate.seed)
+        self.assertEqual(gate.content_version, FloorGenerationService.content_version())
+        self.assertEqual(gate.encounter_log, [])
+
+    def test_map_payload_is_grouped_cached_and_invalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            DungeonManifestService.generate_daily_manifest(self.users[0])
+        with self.assertNumQueries(2):
+            first = MapDataService.get_cached_map(self.users[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(MapDataService.get_cached_map(self.users[0])['etag'], first['etag'])
+        self.assertEqual(len(first['zones'][0]['dungeons']), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PlayerGate.objects.filter(user=self.users[0]).update(is_completed=True)
+            MapDataService.invalidate([self.users[0].id])
+        self.assertNotEqual(MapDataService.get_cached_map(self.users[0])['etag'], first['etag'])
+
+
+class RunContextTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_dungeon_data()
+        self.user = User.objects.create_user(email='runner@example.com', username='runner', password='testpassword')
+        self.run = DungeonRun.objects.create(user=self.user, dungeon=self.dungeon, total_floors=4)
+
+    def test_only_changed_fields_are_saved(self):
+        with RunContext(self.user, self.run.id) as dungeon_run:
+            dungeon_run.status = 'in_progress'
+            dungeon_run.unclaimed_rewards.append({'xp': 10})
+        context = RunContext(self.user, self.run.id)
+        with context as dungeon_run:
+            dungeon_run.anima -= 1
+            context_changes = context.changed_fields()
+        self.assertEqual(context_changes, ['anima'])
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, 'in_progress')
+        self.assertEqual(self.run.unclaimed_rewards, [{'xp': 10}])
+        self.assertEqual(self.run.anima, 2)
+        self.assertEqual(self.run.version, 2)
+
+    def test_stale_transition_conflicts(self):
+        first, second = RunContext(self.user, self.run.id), RunContext(self.user, self.run.id)
+        with first as run:
+            with self.assertRaises(RunConflict):
+                with second as stale_run:
+                    run.status = 'in_progress'
+                    first.save()
+                    stale_run.status = 'abandoned'
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, 'in_progress')
+        self.assertEqual(self.run.version, 1)
+
+
+class EncounterExpiryTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.create_dungeon_data()
+
+    def start_run(self, name):
+        user = User.objects.create_user(email=f'{name}@example.com', username=name, password='testpassword')
+        run = DungeonRun.objects.create(user=user, dungeon=self.dungeon, total_floors=4)
+        DungeonEngine(user).start_expedition(run.id)
+        run.refresh_from_db()
+        return run
+
+    def test_expired_encounter_is_resolved(self):
+        run = self.start_run('sleeper')
+        resolved = EncounterExpiryService.resolve_expired_encounters(now=run.floor_completion_time + timedelta(seconds=1))
+        self.assertEqual([r.id for r in resolved], [run.id])
+        version = run.version
+        run.refresh_from_db()
+        self.assertIn(run.status, ['encounter_resolved', 'failed'])
+        self.assertIsNone(run.floor_completion_time)
+        self.assertEqual(run.version, version + 1)
+
+    def test_running_encounter_is_left_alone(self):
+        run = self.start_run('patient')
+        self.assertEqual(EncounterExpiryService.resolve_expired_encounters(now=run.floor_completion_time - timedelta(seconds=1)), [])
+        version = run.version
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.version), ('advancing', version))
+
+    def test_one_broken_run_does_not_roll_back_the_batch(self):
+        broken = self.start_run('broken')
+        run = self.start_run('healthy')
+        # A log without total_power makes resolving the encounter raise.
+        DungeonRun.objects.filter(id=broken.id).update(encounter_log=[{'encounters': [{'entities': []}]}])
+        now = max(broken.floor_completion_time, run.floor_completion_time) + timedelta(seconds=1)
+
+        resolved = EncounterExpiryService.resolve_expired_encounters(now=now)
+        self.assertEqual([r.id for r in resolved], [run.id])
+        run.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertIn(run.status, ['encounter_resolved', 'failed'])
+        self.assertEqual(broken.status, 'advancing')
+
+
+class RunArchiveTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_dungeon_data()
+        self.user = User.objects.create_user(email='archivist@example.com', username='archivist', password='testpassword')
+        encounter_log = [{'floor': 1, 'encounters': [{'result': {'outcome': 'success', 'loot': {'xp': 40, 'coins': 15, 'items': [1, 2]}}}]}]
+        self.old_run = DungeonRun.objects.create(user=self.user, dungeon=self.dungeon, total_floors=4, status='completed', encounter_log=encounter_log)
+        self.unclaimed_run = DungeonRun.objects.create(user=self.user, dungeon=self.dungeon, total_floors=4, status='failed', unclaimed_rewards=[{'xp': 5}])
+        self.recent_run = DungeonRun.objects.create(user=self.user, dungeon=self.dungeon, total_floors=4, status='completed')
+        DungeonRun.objects.filter(id__in=[self.old_run.id, self.unclaimed_run.id]).update(start_time=timezone.now() - timedelta(days=45))
+
+    def test_old_finished_runs_are_archived(self):
+        self.assertEqual(RunArchiveService.archive_finished_runs(older_than_days=30), 1)
+        self.assertFalse(DungeonRun.objects.filter(id=self.old_run.id).exists())
+        self.assertTrue(DungeonRun.objects.filter(id=self.unclaimed_run.id).exists())
+
+        archived = ArchivedDungeonRun.objects.get(id=self.old_run.id)
+        self.assertEqual((archived.total_xp, archived.total_coins, archived.items_found), (40, 15, 2))
+        self.assertEqual(RunArchiveService.decompress(archived.payload)['encounter_log'], self.old_run.encounter_log)
+
+    def test_history_reads_both_tables(self):
+        RunArchiveService.archive_finished_runs(older_than_days=30)
+        history = RunArchiveService.get_history(self.user)
+        self.assertEqual(history['count'], 3)
+        self.assertEqual([entry['id'] for entry in history['results']][0], self.recent_run.id)
+        self.assertEqual({entry['id']: entry['archived'] for entry in history['results']}[self.old_run.id], True)
+
+        detail = RunArchiveService.get_run(self.user, self.old_run.id)
+        self.assertEqual(detail['encounter_log'], self.old_run.encounter_log)
+        self.assertEqual(detail['dungeon_name'], self.dungeon.name)
+
+class WorldTickTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.create_dungeon_data()
+        self.user = User.objects.create_user(email='ticker@example.com', username='ticker', password='testpassword')
+
+    def growing_tick_before(self, now):
+        """The start of the latest tick window before now that adds a point of instability."""
+        now -= WorldTickService.TICK_INTERVAL
+        while WorldTickService.instability_growth(now) != 1:
+            now -= WorldTickService.TICK_INTERVAL
+        return now
+
+    def test_tick_uses_a_fixed_number_of_queries(self):
+        DungeonRun.objects.create(user=self.user, dungeon=self.dungeon, status='completed')
+        Dungeon.objects.filter(id=self.dungeon.id).update(instability_level=20)
+        now = self.growing_tick_before(timezone.now())
+        with CaptureQueriesContext(connection) as small_world:
+            changes = WorldTickService.tick(now=now)
+        self.assertEqual(len(changes['dungeons']), 3)
+        levels = dict(Dungeon.objects.values_list('id', 'instability_level'))
+        self.assertEqual(levels[self.dungeon.id], 15)
+        self.assertEqual(levels[self.dungeons[1].id], 1)
+
+        for i in range(10):
+            Dungeon.objects.create(name=f'Goblin Warren {i}', rank='E', zone=self.zone)
+        with CaptureQueriesContext(connection) as large_world:
+            WorldTickService.tick(now=self.growing_tick_before(now))
+        self.assertEqual(len(large_world), len(small_world))
+
+    def test_growth_keeps_a_daily_pace(self):
+        now = timezone.now()
+        DungeonRun.objects.create(user=self.user, dungeon=self.dungeon, status='completed')
+        Dungeon.objects.filter(id=self.dungeon.id).update(instability_level=20)
+        for hour in range(24):
+            WorldTickService.tick(now=now + hour * WorldTickService.TICK_INTERVAL)
+        WorldTickService.tick(now=now)
+        levels = dict(Dungeon.objects.values_list('id', 'instability_level'))
+        self.assertEqual(levels[self.dungeon.id], 15)
+        self.assertEqual(levels[self.dungeons[1].id], WorldTickService.INSTABILITY_GROWTH_PER_DAY)
+
+    def test_anomalies_trigger_and_expire(self):
+        now = timezone.now()
+        DungeonRun.objects.create(user=self.user, dungeon=self.dungeon, status='failed')
+        Dungeon.objects.update(instability_level=WorldTickService.MAX_INSTABILITY)
+        changes = WorldTickService.tick(now=now)
+        self.dungeon.refresh_from_db()
+        self.assertIn(self.dungeon.anomaly_state, WorldTickService.ANOMALY_TYPES)
+        self.assertNotIn(self.dungeon.id, changes['dungeon_breaks'])
+        self.assertEqual(len(changes['dungeon_breaks']), 2)
+        self.zone.refresh_from_db()
+        self.assertTrue(self.zone.is_infested)
+
+        WorldTickService.tick(now=now + timedelta(days=2))
+        self.dungeon.refresh_from_db()
+        self.zone.refresh_from_db()
+        self.assertEqual((self.dungeon.anomaly_state, self.dungeon.instability_level), ("", 0))
+        self.assertFalse(self.zone.is_saturated)
+
+class ExpeditionForecastTests(DungeonTestDataMixin, TestCase):
+    def test_clear_probability_is_exact(self):
+        no_loot = [{}, {}]
+        self.assertEqual(forecast_expedition([0.5, 0.5], no_loot, 1)['clear_probability'], 0.25)
+        self.assertEqual(forecast_expedition([0.5, 0.5], no_loot, 2)['clear_probability'], 0.75)
+        self.assertEqual(forecast_expedition([0.5, 0.5], no_loot, 0)['clear_probability'], 0.0)
+
+    def test_expected_loot_only_counts_floors_reached_alive(self):
+        forecast = forecast_expedition([0.5, 1.0], [{'xp': 10}, {'xp': 100}], 1)
+        self.assertEqual(forecast['expected_loot']['xp'], 55.0)
+
+    def test_run_state_includes_forecast(self):
+        self.create_dungeon_data()
+        user = User.objects.create_user(email='scout@example.com', username='scout', password='testpassword')
+        run = DungeonRun.objects.create(user=user, dungeon=self.dungeon, total_floors=4, seed=99)
+        forecast = DungeonEngine(user).get_run_state(run.id)['forecast']
+        self.assertTrue(0 <= forecast['clear_probability'] <= 1)
+
+
+class AutoExpeditionTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.create_dungeon_data()
+        self.user = User.objects.create_user(email='farmer@example.com', username='farmer', password='testpassword', level=100)
+        self.run = DungeonRun.objects.create(user=self.user, dungeon=self.dungeon, total_floors=4)
+
+    def test_outlevelled_run_resolves_in_one_pass(self):
+        summary = DungeonEngine(self.user).auto_expedition(self.run.id)
+        self.assertEqual(summary['status'], 'completed')
+        self.assertEqual(len(summary['floors']), 4)
+        self.run.refresh_from_db()
+        self.assertEqual(len(self.run.unclaimed_rewards), 4)
+        self.assertEqual(self.run.current_floor, 5)
+
+    def test_weak_players_cannot_auto_resolve(self):
+        weakling = User.objects.create_user(email='weak@example.com', username='weak', password='testpassword')
+        run = DungeonRun.objects.create(user=weakling, dungeon=self.dungeon, total_floors=4)
+        with self.assertRaises(Exception):
+            DungeonEngine(weakling).auto_expedition(run.id)
+
+    def test_gate_checks_the_final_boss_not_the_budget(self):
+        Entity.objects.filter(name='Goblin King').update(power=500)
+        EntityCatalog._bump_version()
+        user = User.objects.create_user(email='middling@example.com', username='middling', password='testpassword', level=5)
+        run = DungeonRun.objects.create(user=user, dungeon=self.dungeon, total_floors=4, seed=1234)
+        self.assertFalse(DungeonEngine(user).can_auto_resolve(run))
+
+
+@skipUnless(numpy, 'The balance simulator needs numpy.')
+class BalanceSimulatorTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_dungeon_data()
+
+    def test_tables_cover_every_floor_and_power(self):
+        from .balance_simulator import _budget_table, _success_chance_table
+        max_floors = DungeonManifestService.MAX_FLOORS
+        budgets = _budget_table('E', DungeonManifestService.MIN_FLOORS, max_floors)
+        self.assertEqual(budgets.shape, (max_floors + 1, max_floors + 1))
+        self.assertEqual(budgets[max_floors, max_floors], FloorGenerationService._calculate_budget('E', max_floors, max_floors))
+        chances = _success_chance_table(90, 50)
+        self.assertEqual(chances.shape, (51,))
+        self.assertTrue(((chances > 0) & (chances < 1)).all())
+
+    def test_seeded_simulation_is_reproducible_and_bounded(self):
+        from .balance_simulator import simulate_expeditions
+        result = simulate_expeditions('E', 5, 3, runs=500, seed=7)
+        self.assertEqual(result, simulate_expeditions('E', 5, 3, runs=500, seed=7))
+        self.assertTrue(0 <= result['clear_rate'] <= 1)
+        self.assertTrue(0 <= result['floors_won_per_run'] <= DungeonManifestService.MAX_FLOORS)
+
+        weak_boss = simulate_expeditions('E', 5, 3, runs=500, seed=7, final_boss_power=1)
+        strong_boss = simulate_expeditions('E', 5, 3, runs=500, seed=7, final_boss_power=500)
+        self.assertGreater(weak_boss['clear_rate'], strong_boss['clear_rate'])
+
+    def test_command_prints_a_row_per_combination(self):
+        out = StringIO()
+        call_command('simulate_dungeon_balance', ranks=['E'], levels=[1, 5], runs=200, seed=7, stdout=out)
+        rows = [line for line in out.getvalue().splitlines() if line.startswith('E ')]
+        self.assertEqual(len(rows), 2)
+
+
+class WorldEventModifierTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_dungeon_data()
+        effect = WorldEventEffect.objects.create(identifier='frenzy', name='Frenzy', effect_type='DAMAGE_MOD', parameters={'target': 'enemy', 'value': 10})
+        self.event = WorldEvent.objects.create(identifier='blood_moon', name='Blood Moon', event_type='ENVIRONMENTAL', duration_hours=2)
+        EventEffectApplication.objects.create(event=self.event, effect=effect, parameters={'value': 25})
+        WorldEventModifiers._bump_version()
+
+    def test_trigger_event_invalidates_and_modifiers_are_cached(self):
+        self.assertEqual(self.dungeon.get_active_modifiers(), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            WorldEventService.trigger_event('blood_moon', self.zone)
+
+        self.assertEqual(self.dungeon.get_active_modifiers(), {'enemy_damage_mod': 25})
+        with self.assertNumQueries(0):
+            self.dungeon.get_active_modifiers()
+
+    def test_zone_expires_at_earliest_end_time(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            WorldEventService.trigger_event('blood_moon', self.zone)
+        modifiers = WorldEventModifiers.get()
+        self.assertEqual(modifiers.for_zone(self.zone.id, 'combat'), {'enemy_damage_mod': 25})
+        self.assertEqual(modifiers.for_zone(self.zone.id, 'combat', now=timezone.now() + timedelta(hours=3)), {})
+
+
+class WorldEventSchedulerTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_dungeon_data()
+        self.other_zone = WorldZone.objects.create(name='Ashen Waste', rank_pool=['C'])
+        self.event = WorldEvent.objects.create(
+            identifier='goblin_tide', name='Goblin Tide', event_type='ENVIRONMENTAL', cooldown_hours=12,
+            activation_conditions={'zone_ranks': ['E'], 'any': [{'min_instability': 50}, {'is_saturated': True}]},
+        )
+        WorldEvent.objects.create(identifier='manual_only', name='Manual Only', event_type='SPECIAL')
+
+    def test_compiled_conditions(self):
+        facts = ZoneFacts(1, 'Greenwood', ['E'], False, False, 60, 0, 0, 0, timezone.now())
+        self.assertTrue(compile_conditions(self.event.activation_conditions)(facts, random))
+        self.assertFalse(compile_conditions({'not': {'zones': ['Greenwood']}})(facts, random))
+        self.assertFalse(compile_conditions({'min_instability': 20, 'chance': 0})(facts, random))
+        with self.assertRaises(ValueError):
+            compile_conditions({'min_instabilty': 20})
+
+    def test_events_trigger_once_per_cooldown(self):
+        Dungeon.objects.filter(id=self.dungeon.id).update(instability_level=70)
+        triggered = WorldEventScheduler.run()
+        self.assertEqual([(active.event_id, active.zone_id) for active in triggered], [(self.event.id, self.zone.id)])
+        self.assertEqual(EventTriggerHistory.objects.filter(event=self.event, zone=self.zone).count(), 1)
+
+        ActiveWorldEvent.objects.update(is_active=False)
+        self.assertEqual(WorldEventScheduler.run(), [])
+        self.assertEqual(len(WorldEventScheduler.run(now=timezone.now() + timedelta(hours=13))), 1)
+
+class PlayerStatSheetTests(TestCase):
+    def setUp(self):
+        # Stat sheets are cached per user ID, which outlives the test's rollback.
+        cache.clear()
+        self.user = User.objects.create_user(email='sheet@example.com', username='sheet', password='testpassword', level=2)
+        talent = Talent.objects.create(name='Might', description='', tree='Strength', rank_bonuses=[{'stat': 'power', 'value': 3}])
+        UserTalent.objects.create(user=self.user, talent=talent, rank=2)
+        trait = LegacyTrait.objects.create(name='Veteran', effect={'type': 'PLAYER_MODIFIER', 'stat': 'PlayerPower', 'operation': 'MULTIPLY', 'value': 2})
+        UserLegacyTrait.objects.create(user=self.user, trait=trait)
+        self.sword = InventoryItem.objects.create(user=self.user, item=Item.objects.create(name='Sword', power=10))
+
+    def test_sheet_combines_inputs_and_is_cached(self):
+        sheet = PlayerStatService.get_stat_sheet(self.user)
+        self.assertEqual(sheet['power'], (2 * 18 + 2 * 3) * 2)
+        with self.assertNumQueries(0):
+            PlayerStatService.get_stat_sheet(self.user)
+
+    def test_equipping_gear_invalidates_the_sheet(self):
+        PlayerStatService.get_stat_sheet(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sword.is_equipped = True
+            self.sword.save()
+        self.assertEqual(PlayerStatService.get_stat_sheet(self.user)['gear_power'], 10)
+
+
+class DungeonBreakTests(DungeonTestDataMixin, TestCase):
+    def setUp(self):
+        # Attack cooldowns and readouts are cached per event and user ID, which the next test reuses.
+        cache.clear()
+        self.create_dungeon_data()
+        WorldEvent.objects.create(identifier='dungeon_break', name='Dungeon Break', event_type='DUNGEON_BREAK', duration_hours=6)
+        Currency.objects.create(name='Coins', code='GAME_COIN')
+        CurrencyRegistry._bump_version()
+        self.hunters = [
+            User.objects.create_user(email=f'raider{i}@example.com', username=f'raider{i}', password='testpassword')
+            for i in range(3)
+        ]
+        self.active_event = DungeonBreakService.start_break(self.dungeon)
+
+    def test_attacks_are_sharded_and_cooled_down(self):
+        for hunter in self.hunters:
+            DungeonBreakService.attack(hunter, self.active_event.id)
+        with self.assertRaises(ValueError):
+            DungeonBreakService.attack(self.hunters[0], self.active_event.id)
+
+        total = sum(DungeonBreakDamageShard.objects.filter(active_event=self.active_event).values_list('damage', flat=True))
+        self.assertEqual(total, sum(DungeonBreakParticipant.objects.values_list('damage', flat=True)))
+        self.assertEqual(DungeonBreakService.aggregate(ActiveWorldEvent.objects.get(pk=self.active_event.pk))['participants'], 3)
+
+    def test_hits_after_the_kill_are_rejected(self):
+        DungeonBreakService.get_readout(self.active_event.id)
+        ActiveWorldEvent.objects.filter(pk=self.active_event.pk).update(is_active=False)
+        with self.assertRaisesMessage(ValueError, "This Dungeon Break is over."):
+            DungeonBreakService.attack(self.hunters[0], self.active_event.id)
+        self.assertFalse(DungeonBreakParticipant.objects.filter(active_event=self.active_event).exists())
+
+    def test_defeated_boss_pays_every_participant(self):
+        for hunter in self.hunters:
+            DungeonBreakService.attack(hunter, self.active_event.id)
+        DungeonBreakDamageShard.objects.filter(active_event=self.active_event, shard=0).update(damage=10 ** 9)
+        with self.captureOnCommitCallbacks(execute=False):
+            readout = DungeonBreakService.aggregate(ActiveWorldEvent.objects.get(pk=self.active_event.pk))
+        self.assertEqual(readout['status'], 'defeated')
+
+        self.assertEqual(DungeonBreakService.distribute_rewards(self.active_event.id), 3)
+        self.assertEqual(DungeonBreakService.distribute_rewards(self.active_event.id), 0)
+        self.assertEqual(CurrencyTransaction.objects.filter(currency__code='GAME_COIN', amount__gt=0).values('user').distinct().count(), 3)
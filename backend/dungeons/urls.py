@@ -4,6 +4,7 @@ from .api import (
     HunterDashboardView,
     DungeonScoutingView,
     DungeonRunView,
+    DungeonRunHistoryView,
     DungeonBreakActiveView,
     DungeonBreakParticipateView,
     RedGateDetailView,
@@ -21,6 +22,7 @@ from .api import (
     PurchaseListingView,
     WorldZonesView,
     StartExpeditionView,
+    AutoExpeditionView,
     AdvanceFloorView,
     DungeonRunStateView,
     ClaimRewardsView,
@@ -57,9 +59,11 @@ urlpatterns = [
     path('api/world-zones/', WorldZonesView.as_view(), name='world_zones'),
     # Interactive Expedition Endpoints
     path('api/expedition/start/', StartExpeditionView.as_view(), name='start_expedition'),
+    path('api/expedition/auto/', AutoExpeditionView.as_view(), name='auto_expedition'),
     path('api/expedition/advance/', AdvanceFloorView.as_view(), name='advance_floor'),
     path('api/expedition/advance-encounter/', AdvanceEncounterView.as_view(), name='advance_encounter'),
     path('api/expedition/state/<int:run_id>/', DungeonRunStateView.as_view(), name='dungeon_run_state'),
     path('api/expedition/proceed/', ProceedToNextEncounterView.as_view(), name='proceed_to_next_encounter'),
     path('api/expedition/abandon/', AbandonExpeditionView.as_view(), name='abandon_expedition'),
+    path('api/expedition/history/', DungeonRunHistoryView.as_view(), name='dungeon_run_history'),
 ]
@@ -0,0 +1,92 @@
+from collections import namedtuple
+from django.db.models import Min
+from django.utils import timezone
+from campus_rpg.snapshot import VersionedSnapshot
+from .models import ActiveWorldEvent, EventEffectApplication
+
+TARGET_TYPES = ('combat', 'loot', 'environment')
+
+CompiledZone = namedtuple('CompiledZone', ['expires_at', 'modifiers'])
+
+
+def compile_modifiers(effects, target_type):
+    """
+    Merges (effect, parameters) pairs into the modifier dict for one target type.
+    parameters are the application's overrides of the effect's own parameters.
+    """
+    modifiers = {}
+    for effect, parameters in effects:
+        params = {**effect.parameters, **parameters}
+
+        if effect.effect_type == 'DAMAGE_MOD' and target_type == 'combat':
+            if params.get('target') == 'player':
+                modifiers.setdefault('player_damage_mod', 0)
+                modifiers['player_damage_mod'] += params['value']
+            elif params.get('target') == 'enemy':
+                modifiers.setdefault('enemy_damage_mod', 0)
+                modifiers['enemy_damage_mod'] += params['value']
+
+        elif effect.effect_type == 'LOOT_MOD' and target_type == 'loot':
+            modifiers.setdefault('drop_rate_mod', {})
+            for rarity, value in params['rarity_rates'].items():
+                modifiers['drop_rate_mod'].setdefault(rarity, 0)
+                modifiers['drop_rate_mod'][rarity] += value
+
+        elif effect.effect_type == 'ENVIRONMENT' and target_type == 'environment':
+            modifiers.setdefault('environmental_effects', [])
+            modifiers['environmental_effects'].append({
+                'name': effect.name,
+                'key': effect.identifier,
+                **params
+            })
+
+    return modifiers
+
+
+class WorldEventModifiers(VersionedSnapshot):
+    """
+    Process-local compiled world event modifiers, one entry per zone (None for all zones).
+
+    A zone's entry holds the merged modifiers of every target type and expires at the
+    earliest end_time of its contributing events, or when a pending event starts.
+    Creating or changing an ActiveWorldEvent or an event effect invalidates every zone
+    in every process. The returned dicts are shared and must not be mutated.
+    """
+    VERSION_CACHE_KEY = 'dungeons:world_event_modifiers_version'
+
+    def __init__(self, version):
+        super().__init__(version)
+        self._zones = {}
+
+    @classmethod
+    def build(cls, version):
+        return cls(version)
+
+    def for_zone(self, zone_id, target_type, now=None):
+        now = now or timezone.now()
+        compiled = self._zones.get(zone_id)
+        if compiled is None or (compiled.expires_at is not None and now > compiled.expires_at):
+            compiled = self._zones[zone_id] = self._compile(zone_id, now)
+        return compiled.modifiers.get(target_type, {})
+
+    @staticmethod
+    def _compile(zone_id, now):
+        events = ActiveWorldEvent.objects.filter(is_active=True)
+        if zone_id is not None:
+            events = events.filter(zone_id=zone_id)
+
+        active = list(events.filter(start_time__lte=now, end_time__gte=now).order_by('id').values('event_id', 'end_time'))
+        next_start = events.filter(start_time__gt=now).aggregate(next_start=Min('start_time'))['next_start']
+        expiries = [event['end_time'] for event in active] + ([next_start] if next_start else [])
+
+        applications = {}
+        for application in EventEffectApplication.objects.filter(
+            event_id__in={event['event_id'] for event in active}
+        ).select_related('effect').order_by('id'):
+            applications.setdefault(application.event_id, []).append((application.effect, application.parameters))
+        effects = [effect for event in active for effect in applications.get(event['event_id'], [])]
+
+        return CompiledZone(
+            expires_at=min(expiries) if expiries else None,
+            modifiers={target_type: compile_modifiers(effects, target_type) for target_type in TARGET_TYPES},
+        )
@@ -0,0 +1,189 @@
+import logging
+import random
+from collections import namedtuple
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from .models import WorldEvent, WorldZone, Dungeon, DungeonRun, ActiveWorldEvent, EventTriggerHistory
+from .world_event_modifiers import WorldEventModifiers
+
+# Everything a condition can look at, gathered for every zone at the start of a pass.
+ZoneFacts = namedtuple('ZoneFacts', [
+    'zone_id', 'name', 'rank_pool', 'is_saturated', 'is_infested',
+    'max_instability', 'anomalies', 'recent_runs', 'recent_clears', 'now',
+])
+
+logger = logging.getLogger(__name__)
+
+RECENT_ACTIVITY_WINDOW = timedelta(hours=24)
+
+
+def _at_least(attribute):
+    return lambda value: lambda facts, rng: getattr(facts, attribute) >= value
+
+
+def _at_most(attribute):
+    return lambda value: lambda facts, rng: getattr(facts, attribute) <= value
+
+
+def _hour_window(value):
+    start, end = value
+    if start <= end:
+        return lambda facts, rng: start <= facts.now.hour < end
+    return lambda facts, rng: facts.now.hour >= start or facts.now.hour < end
+
+
+CONDITION_BUILDERS = {
+    'zones': lambda value: lambda facts, rng: facts.name in value,
+    'zone_ranks': lambda value: lambda facts, rng: bool(set(value) & set(facts.rank_pool)),
+    'is_saturated': lambda value: lambda facts, rng: facts.is_saturated == value,
+    'is_infested': lambda value: lambda facts, rng: facts.is_infested == value,
+    'min_instability': _at_least('max_instability'),
+    'max_instability': _at_most('max_instability'),
+    'min_anomalies': _at_least('anomalies'),
+    'min_recent_runs': _at_least('recent_runs'),
+    'max_recent_runs': _at_most('recent_runs'),
+    'min_recent_clears': _at_least('recent_clears'),
+    'hours': _hour_window,
+    'weekdays': lambda value: lambda facts, rng: facts.now.weekday() in value,
+    'chance': lambda value: lambda facts, rng: rng.random() < value,
+}
+
+
+def compile_conditions(conditions):
+    """
+    Compiles an event's activation_conditions into a predicate(facts, rng).
+
+    A dict is the AND of its keys. "all", "any" and "not" combine nested conditions;
+    every other key names a CONDITION_BUILDERS test, e.g.
+
+        {"zone_ranks": ["C", "B"], "any": [{"min_instability": 80}, {"is_saturated": true}], "chance": 0.1}
+
+    Unknown keys raise ValueError so a typo cannot silently make an event fire everywhere.
+    """
+    if isinstance(conditions, list):
+        return compile_conditions({'all': conditions})
+
+    predicates = []
+    # "chance" is compiled last so the random roll only happens when everything else holds.
+    for key, value in sorted(conditions.items(), key=lambda item: item[0] == 'chance'):
+        if key == 'all':
+            parts = [compile_conditions(part) for part in value]
+            predicates.append(lambda facts, rng, parts=parts: all(part(facts, rng) for part in parts))
+        elif key == 'any':
+            parts = [compile_conditions(part) for part in value]
+            predicates.append(lambda facts, rng, parts=parts: any(part(facts, rng) for part in parts))
+        elif key == 'not':
+            part = compile_conditions(value)
+            predicates.append(lambda facts, rng, part=part: not part(facts, rng))
+        elif key in CONDITION_BUILDERS:
+            predicates.append(CONDITION_BUILDERS[key](value))
+        else:
+            raise ValueError(f'Unknown world event condition "{key}".')
+
+    return lambda facts, rng: all(predicate(facts, rng) for predicate in predicates)
+
+
+class WorldEventScheduler:
+    """
+    Evaluates every automatic world event against every zone in one pass.
+
+    Events with empty activation_conditions are manual-only, and Dungeon Breaks are
+    started by DungeonBreakService. Zone facts, running events and the last trigger
+    of every (event, zone) pair are each loaded with a single query, so a pass costs
+    the same few queries however many events and zones there are.
+    """
+
+    @staticmethod
+    def load_zone_facts(now):
+        dungeon_stats = {
+            row['zone_id']: row
+            for row in Dungeon.objects.filter(is_active=True, zone__isnull=False).values('zone_id').annotate(
+                max_instability=Max('instability_level'),
+                anomalies=Count('id', filter=~Q(anomaly_state='')),
+            )
+        }
+        run_stats = {
+            row['dungeon__zone_id']: row
+            for row in DungeonRun.objects.filter(start_time__gte=now - RECENT_ACTIVITY_WINDOW, dungeon__zone__isnull=False)
+            .values('dungeon__zone_id').annotate(runs=Count('id'), clears=Count('id', filter=Q(status='completed')))
+        }
+        facts = []
+        for zone in WorldZone.objects.only('id', 'name', 'rank_pool', 'is_saturated', 'is_infested'):
+            dungeons = dungeon_stats.get(zone.id, {})
+            runs = run_stats.get(zone.id, {})
+            facts.append(ZoneFacts(
+                zone_id=zone.id,
+                name=zone.name,
+                rank_pool=zone.rank_pool or [],
+                is_saturated=zone.is_saturated,
+                is_infested=zone.is_infested,
+                max_instability=dungeons.get('max_instability') or 0,
+                anomalies=dungeons.get('anomalies', 0),
+                recent_runs=runs.get('runs', 0),
+                recent_clears=runs.get('clears', 0),
+                now=now,
+            ))
+        return facts
+
+    @staticmethod
+    def load_cooldowns(since):
+        """{(event_id, zone_id): last triggered_at} for every pair that fired after since."""
+        rows = EventTriggerHistory.objects.filter(triggered_at__gte=since).values('event_id', 'zone_id').annotate(
+            last_triggered=Max('triggered_at')
+        )
+        return {(row['event_id'], row['zone_id']): row['last_triggered'] for row in rows}
+
+    @staticmethod
+    def run(now=None, rng=random):
+        """Triggers every event whose conditions hold in a zone it is not active or cooling down in."""
+        now = now or timezone.now()
+        events = []
+        for event in WorldEvent.objects.exclude(event_type='DUNGEON_BREAK'):
+            if not event.activation_conditions:
+                continue
+            try:
+                events.append((event, compile_conditions(event.activation_conditions)))
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning("Skipping world event %s with invalid activation conditions: %s", event.identifier, e)
+        if not events:
+            return []
+
+        zone_facts = WorldEventScheduler.load_zone_facts(now)
+        cooldowns = WorldEventScheduler.load_cooldowns(now - timedelta(hours=max(event.cooldown_hours for event, _ in events)))
+        running = set(
+            ActiveWorldEvent.objects.filter(is_active=True, end_time__gt=now).values_list('event_id', 'zone_id')
+        )
+
+        to_trigger = []
+        for event, predicate in events:
+            cooldown = timedelta(hours=event.cooldown_hours)
+            for facts in zone_facts:
+                key = (event.id, facts.zone_id)
+                if key in running:
+                    continue
+                last_triggered = cooldowns.get(key)
+                if last_triggered and now - last_triggered < cooldown:
+                    continue
+                if predicate(facts, rng):
+                    to_trigger.append((event, facts))
+
+        if not to_trigger:
+            return []
+
+        with transaction.atomic():
+            active_events = ActiveWorldEvent.objects.bulk_create([
+                ActiveWorldEvent(event=event, zone_id=facts.zone_id, end_time=now + timedelta(hours=event.duration_hours))
+                for event, facts in to_trigger
+            ])
+            EventTriggerHistory.objects.bulk_create([
+                EventTriggerHistory(
+                    event=event, zone_id=facts.zone_id, triggered_by='system',
+                    details={'conditions': event.activation_conditions},
+                )
+                for event, facts in to_trigger
+            ])
+            # bulk_create skips the post_save signal that normally does this.
+            WorldEventModifiers.invalidate()
+        return active_events
@@ -0,0 +1,163 @@
+import random
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import Dungeon, DungeonRun, WorldZone
+from .dungeon_break_service import DungeonBreakService
+from .run_updates import publish_world_changes
+from campus_rpg.celery import WORLD_TICK_INTERVAL
+
+GROWTH_APPLIED_CACHE_KEY = 'dungeons:world_tick_growth:{window}'
+
+
+class WorldTickService:
+    """
+    Advances dungeon instability, anomalies and zone saturation for the whole world at once.
+
+    Recent expedition activity comes from a single aggregate query over DungeonRun, and
+    every changed dungeon and zone is written back with bulk_update, so a tick costs the
+    same handful of queries however many dungeons and zones exist.
+
+    Instability grows by INSTABILITY_GROWTH_PER_DAY a day in dungeons nobody cleared in
+    the last day, spread in whole points over the day's ticks. Growth is applied once
+    per tick window, so an extra manual tick does not speed the world up.
+    """
+
+    ANOMALY_TYPES = ["Swarm", "Elite", "Volatile"]
+    MAX_INSTABILITY = 100
+    INSTABILITY_GROWTH_PER_DAY = 10
+    INSTABILITY_RELIEF_PER_CLEAR = 5
+    # Each tick looks at the runs started since the previous one.
+    TICK_INTERVAL = WORLD_TICK_INTERVAL
+    # Instability only grows in dungeons nobody has cleared for this long.
+    GROWTH_AFTER = timedelta(days=1)
+    ANOMALY_DURATION = timedelta(hours=24)
+    # An anomaly in a dungeon nobody has entered for this long breaks out into its zone.
+    DUNGEON_BREAK_AFTER = timedelta(days=7)
+    INFESTATION_DURATION = timedelta(days=1)
+
+    DUNGEON_FIELDS = ['instability_level', 'anomaly_state', 'anomaly_active_until']
+    ZONE_FIELDS = ['is_saturated', 'is_infested', 'saturation_expires_at']
+
+    @staticmethod
+    def recent_activity(now):
+        """
+        {dungeon_id: {'runs': ..., 'clears': ..., 'day_clears': ...}} for every dungeon entered
+        within DUNGEON_BREAK_AFTER. runs and clears count the last tick, day_clears GROWTH_AFTER.
+        """
+        recent = Q(start_time__gte=now - WorldTickService.TICK_INTERVAL)
+        completed = Q(status='completed')
+        rows = DungeonRun.objects.filter(start_time__gte=now - WorldTickService.DUNGEON_BREAK_AFTER).values('dungeon_id').annotate(
+            runs=Count('id', filter=recent),
+            clears=Count('id', filter=recent & completed),
+            day_clears=Count('id', filter=Q(start_time__gte=now - WorldTickService.GROWTH_AFTER) & completed),
+        )
+        return {row['dungeon_id']: row for row in rows}
+
+    @staticmethod
+    def instability_growth(now):
+        """
+        The growth for the tick window containing now. Windows are counted from the epoch and
+        each gets the whole points its share of INSTABILITY_GROWTH_PER_DAY adds up to, so any
+        day of ticks adds exactly INSTABILITY_GROWTH_PER_DAY.
+        """
+        ticks_per_day = timedelta(days=1) / WorldTickService.TICK_INTERVAL
+        window = int(now.timestamp() // WorldTickService.TICK_INTERVAL.total_seconds())
+        growth = WorldTickService.INSTABILITY_GROWTH_PER_DAY
+        return int(growth * (window + 1) // ticks_per_day) - int(growth * window // ticks_per_day)
+
+    @staticmethod
+    def next_instability(level, activity, growth):
+        """Instability falls with every clear since the last tick and grows by growth if nobody cleared it for a day."""
+        clears = activity['clears'] if activity else 0
+        if clears:
+            return max(0, level - clears * WorldTickService.INSTABILITY_RELIEF_PER_CLEAR)
+        if activity and activity['day_clears']:
+            return level
+        return min(WorldTickService.MAX_INSTABILITY, level + growth)
+
+    @staticmethod
+    def tick(now=None, rng=random):
+        """
+        Runs one world tick and returns the changed set:
+        {'dungeons': [...], 'zones': [...], 'dungeon_breaks': [dungeon IDs]}.
+        """
+        now = now or timezone.now()
+        activity = WorldTickService.recent_activity(now)
+        window = int(now.timestamp() // WorldTickService.TICK_INTERVAL.total_seconds())
+        first_tick_of_window = cache.add(
+            GROWTH_APPLIED_CACHE_KEY.format(window=window), True, timeout=int(2 * WorldTickService.TICK_INTERVAL.total_seconds())
+        )
+        growth = WorldTickService.instability_growth(now) if first_tick_of_window else 0
+
+        changed_dungeons = []
+        breaking_dungeons = []
+        for dungeon in Dungeon.objects.filter(is_active=True).only('id', 'name', 'rank', 'zone_id', *WorldTickService.DUNGEON_FIELDS):
+            before = (dungeon.instability_level, dungeon.anomaly_state, dungeon.anomaly_active_until)
+
+            if dungeon.anomaly_state:
+                if dungeon.anomaly_active_until and now >= dungeon.anomaly_active_until:
+                    dungeon.anomaly_state = ""
+                    dungeon.instability_level = 0
+                    dungeon.anomaly_active_until = None
+            else:
+                dungeon_activity = activity.get(dungeon.id)
+                dungeon.instability_level = WorldTickService.next_instability(dungeon.instability_level, dungeon_activity, growth)
+                if dungeon.instability_level >= WorldTickService.MAX_INSTABILITY:
+                    dungeon.anomaly_state = rng.choice(WorldTickService.ANOMALY_TYPES)
+                    dungeon.anomaly_active_until = now + WorldTickService.ANOMALY_DURATION
+                    if dungeon_activity is None and dungeon.zone_id:
+                        breaking_dungeons.append(dungeon)
+
+            if (dungeon.instability_level, dungeon.anomaly_state, dungeon.anomaly_active_until) != before:
+                changed_dungeons.append(dungeon)
+
+        zones = {
+            zone.id: zone
+            for zone in WorldZone.objects.filter(
+                Q(is_saturated=True, saturation_expires_at__lte=now) | Q(id__in={d.zone_id for d in breaking_dungeons})
+            ).only('id', 'name', *WorldTickService.ZONE_FIELDS)
+        }
+        for zone in zones.values():
+            if zone.is_saturated and zone.saturation_expires_at and zone.saturation_expires_at <= now:
+                zone.is_saturated = False
+                zone.is_infested = False
+                zone.saturation_expires_at = None
+        for dungeon in breaking_dungeons:
+            zone = zones[dungeon.zone_id]
+            zone.is_saturated = True
+            zone.is_infested = True
+            zone.saturation_expires_at = now + WorldTickService.INFESTATION_DURATION
+
+        with transaction.atomic():
+            Dungeon.objects.bulk_update(changed_dungeons, WorldTickService.DUNGEON_FIELDS)
+            WorldZone.objects.bulk_update(list(zones.values()), WorldTickService.ZONE_FIELDS)
+            changes = {
+                'dungeons': [
+                    {
+                        'id': dungeon.id,
+                        'instability_level': dungeon.instability_level,
+                        'anomaly_state': dungeon.anomaly_state,
+                        'anomaly_active_until': dungeon.anomaly_active_until.isoformat() if dungeon.anomaly_active_until else None,
+                    }
+                    for dungeon in changed_dungeons
+                ],
+                'zones': [
+                    {
+                        'id': zone.id,
+                        'is_saturated': zone.is_saturated,
+                        'is_infested': zone.is_infested,
+                        'saturation_expires_at': zone.saturation_expires_at.isoformat() if zone.saturation_expires_at else None,
+                    }
+                    for zone in zones.values()
+                ],
+                'dungeon_breaks': [dungeon.id for dungeon in breaking_dungeons],
+            }
+            if changes['dungeons'] or changes['zones']:
+                publish_world_changes(changes)
+
+        for dungeon in breaking_dungeons:
+            DungeonBreakService.start_break(dungeon)
+        return changes
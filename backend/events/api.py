@@ -320,16 +320,18 @@ class MatchViewSet(viewsets.ModelViewSet):
             tournament.save(update_fields=['winner_id', 'status'])
 
             # Grant rewards to the winning team
+            from teams.models import Team
+            from accounts.currency_registry import CurrencyRegistry
+            from transactions.services import atomic_batch_transfer
             winning_team = Team.objects.get(id=winner_id)
-            primary_currency = Currency.objects.first()
+            primary_currency = CurrencyRegistry.get().primary()
             if primary_currency:
-                for member in winning_team.members.all():
-                    user_currency, created = UserCurrency.objects.get_or_create(
-                        user=member,
-                        currency=primary_currency
-                    )
-                    user_currency.balance += tournament.reward_currency
-                    user_currency.save()
+                members = list(winning_team.members.all())
+                atomic_batch_transfer([
+                    (member, primary_currency, tournament.reward_currency, 'reward', f"Tournament: {tournament.id}", {'tournament_id': tournament.id})
+                    for member in members
+                ])
+                for member in members:
                     message = f"Your team, {winning_team.name}, has won the tournament '{tournament.name}' and you have been awarded {tournament.reward_currency} {primary_currency.name}!"
                     send_user_notification(member, message)
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Item, ItemCategory, InventoryItem
+from .models import Item, ItemCategory, InventoryItem, InventorySummary
 
 @admin.register(InventoryItem)
 class InventoryItemAdmin(admin.ModelAdmin):
@@ -9,6 +9,13 @@ class InventoryItemAdmin(admin.ModelAdmin):
     list_select_related = ('user', 'item')
     raw_id_fields = ('user', 'item')
 
+@admin.register(InventorySummary)
+class InventorySummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_quantity', 'distinct_items', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('updated_at',)
+    raw_id_fields = ('user',)
+
 @admin.register(ItemCategory)
 class ItemCategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'description')
@@ -2,8 +2,11 @@
 from rest_framework import serializers, generics, permissions, filters
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Item, ItemCategory, InventoryItem
+from .inventory_summary_service import InventorySummaryService
+from django.db import transaction
 from transactions.models import CurrencyTransaction, InventoryTransaction
-from accounts.models import UserCurrency
+from transactions import ledger
+from accounts.currency_registry import CurrencyRegistry
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -40,40 +43,32 @@ class PurchaseItemView(APIView):
         user = request.user
         item = get_object_or_404(Item, id=item_id)
         total_price = item.base_price * quantity
-        # Assume default currency for now
-        user_currency = UserCurrency.objects.filter(user=user).first()
-        if not user_currency or user_currency.balance < total_price:
+        currency = CurrencyRegistry.get().primary()
+        if currency is None:
             return Response({'error': 'Insufficient balance.'}, status=status.HTTP_400_BAD_REQUEST)
-        # Deduct currency
-        before_balance = user_currency.balance
-        user_currency.balance -= Decimal(total_price)
-        user_currency.save()
-        # Add to inventory
-        inv_item, created = InventoryItem.objects.get_or_create(user=user, item=item, defaults={'quantity': 0})
-        before_quantity = inv_item.quantity
-        inv_item.quantity += quantity
-        inv_item.save()
-        # Log transactions
-        CurrencyTransaction.objects.create(
-            user=user,
-            currency=user_currency.currency,
-            amount=Decimal(total_price),
-            action='purchase',
-            source='shop',
-            before_balance=before_balance,
-            after_balance=user_currency.balance,
-        )
-        InventoryTransaction.objects.create(
-            user=user,
-            item=item,
-            quantity=quantity,
-            action='gain',
-            source='shop',
-            before_quantity=before_quantity,
-            after_quantity=inv_item.quantity,
-        )
+        with transaction.atomic():
+            # Deduct currency
+            try:
+                ledger.debit(user, currency, Decimal(total_price), 'purchase', 'shop', {'item_id': item.id, 'quantity': quantity})
+            except ValueError:
+                return Response({'error': 'Insufficient balance.'}, status=status.HTTP_400_BAD_REQUEST)
+            # Add to inventory
+            inv_item, created = InventoryItem.objects.get_or_create(user=user, item=item, defaults={'quantity': 0})
+            before_quantity = inv_item.quantity
+            inv_item.quantity += quantity
+            inv_item.save()
+            InventorySummaryService.apply_stack_change(user, before_quantity, inv_item.quantity)
+            InventoryTransaction.objects.create(
+                user=user,
+                item=item,
+                quantity=quantity,
+                action='gain',
+                source='shop',
+                before_quantity=before_quantity,
+                after_quantity=inv_item.quantity,
+            )
         # Send notification to user
-        message = f"You purchased {quantity}x {item.name} from the shop for {total_price} {user_currency.currency.name}."
+        message = f"You purchased {quantity}x {item.name} from the shop for {total_price} {currency.name}."
         send_user_notification(user, message)
         return Response({'status': 'success', 'item': item.name, 'quantity': quantity})
 
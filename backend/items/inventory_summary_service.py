@@ -0,0 +1,106 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+from .models import InventoryItem, InventorySummary
+
+
+class InventorySummaryService:
+
+    @staticmethod
+    def compute(user_ids=None):
+        """Computes {user_id: (total_quantity, distinct_items)} from the inventory itself."""
+        rows = InventoryItem.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        totals = rows.values('user_id').annotate(
+            total=Sum('quantity'),
+            distinct=Count('item', filter=Q(quantity__gt=0), distinct=True),
+        )
+        return {row['user_id']: (row['total'] or 0, row['distinct']) for row in totals}
+
+    @staticmethod
+    def lock(user):
+        """
+        Returns the user's summary row locked for update. Must be called inside a transaction.
+        A user without a summary yet gets one built from their inventory, once.
+        """
+        try:
+            return InventorySummary.objects.select_for_update().get(user=user)
+        except InventorySummary.DoesNotExist:
+            total, distinct = InventorySummaryService.compute([user.id]).get(user.id, (0, 0))
+            try:
+                with transaction.atomic():
+                    InventorySummary.objects.create(user=user, total_quantity=total, distinct_items=distinct)
+            except IntegrityError:
+                pass  # Another transaction created it first.
+            return InventorySummary.objects.select_for_update().get(user=user)
+
+    @staticmethod
+    def lock_many(user_ids):
+        """
+        Returns {user_id: summary} for several users, locked in user ID order so
+        concurrent batches cannot deadlock. Missing summaries are built first.
+        """
+        user_ids = sorted(set(user_ids))
+        existing = set(InventorySummary.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        if missing:
+            computed = InventorySummaryService.compute(missing)
+            InventorySummary.objects.bulk_create([
+                InventorySummary(user_id=user_id, total_quantity=computed.get(user_id, (0, 0))[0], distinct_items=computed.get(user_id, (0, 0))[1])
+                for user_id in missing
+            ], ignore_conflicts=True)
+        return {
+            summary.user_id: summary
+            for summary in InventorySummary.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')
+        }
+
+    @staticmethod
+    def apply(user, quantity_delta=0, distinct_delta=0):
+        """
+        Shifts the user's totals with F() expressions. A user without a summary row is
+        left alone; their row is built from the real inventory the first time it is locked.
+        """
+        if not quantity_delta and not distinct_delta:
+            return
+        InventorySummary.objects.filter(user=user).update(
+            total_quantity=Greatest(F('total_quantity') + quantity_delta, 0),
+            distinct_items=Greatest(F('distinct_items') + distinct_delta, 0),
+        )
+
+    @staticmethod
+    def apply_stack_change(user, before_quantity, after_quantity):
+        """Applies the change of one stack going from before_quantity to after_quantity."""
+        distinct_delta = 0
+        if before_quantity <= 0 < after_quantity:
+            distinct_delta = 1
+        elif after_quantity <= 0 < before_quantity:
+            distinct_delta = -1
+        InventorySummaryService.apply(user, after_quantity - before_quantity, distinct_delta)
+
+    @staticmethod
+    def reconcile(user_ids=None):
+        """
+        Rewrites summary rows that disagree with the inventory. Users with no inventory
+        get a zeroed row only if they already have one. Returns the number of rows fixed.
+        """
+        actual = InventorySummaryService.compute(user_ids)
+        summaries = InventorySummary.objects.all()
+        if user_ids is not None:
+            summaries = summaries.filter(user_id__in=user_ids)
+
+        to_update = []
+        with transaction.atomic():
+            existing = {summary.user_id: summary for summary in summaries.select_for_update()}
+            for user_id, summary in existing.items():
+                total, distinct = actual.get(user_id, (0, 0))
+                if (summary.total_quantity, summary.distinct_items) != (total, distinct):
+                    summary.total_quantity, summary.distinct_items = total, distinct
+                    to_update.append(summary)
+            to_create = [
+                InventorySummary(user_id=user_id, total_quantity=total, distinct_items=distinct)
+                for user_id, (total, distinct) in actual.items() if user_id not in existing
+            ]
+            InventorySummary.objects.bulk_update(to_update, ['total_quantity', 'distinct_items'], batch_size=1000)
+            InventorySummary.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+        return len(to_update) + len(to_create)
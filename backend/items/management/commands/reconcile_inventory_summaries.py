@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from items.inventory_summary_service import InventorySummaryService
+
+class Command(BaseCommand):
+    help = 'Rebuilds per-user inventory summaries that have drifted from the real inventory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', nargs='+', type=int, help='Only reconcile these user IDs.')
+
+    def handle(self, *args, **options):
+        fixed = InventorySummaryService.reconcile(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled inventory summaries: {fixed} rows corrected.'))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inventory_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_quantity', models.PositiveIntegerField(default=0, help_text="Sum of quantity over all of the user's inventory rows.")),
+                ('distinct_items', models.PositiveIntegerField(default=0, help_text='Number of different items the user holds at least one of.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0002_inventorysummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['-quantity'], name='inventoryitem_quantity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorysummary',
+            index=models.Index(fields=['-total_quantity'], name='invsummary_total_idx'),
+        ),
+    ]
@@ -50,7 +50,30 @@ class InventoryItem(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'item'], condition=models.Q(is_equipped=True), name='unique_equipped_item')
         ]
+        indexes = [
+            models.Index(fields=['-quantity'], name='inventoryitem_quantity_idx'),
+        ]
 
     def __str__(self):
         equipped_status = "[Equipped]" if self.is_equipped else ""
         return f"{self.user.username} - {self.item.name} (x{self.quantity}) {equipped_status}"
+
+
+class InventorySummary(models.Model):
+    """
+    Maintained per-user inventory totals, so capacity checks read one row instead of
+    scanning the inventory. Kept in step by InventorySummaryService inside the same
+    transaction as the inventory write; reconcile_inventory_summaries repairs drift.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='inventory_summary')
+    total_quantity = models.PositiveIntegerField(default=0, help_text="Sum of quantity over all of the user's inventory rows.")
+    distinct_items = models.PositiveIntegerField(default=0, help_text="Number of different items the user holds at least one of.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_quantity'], name='invsummary_total_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.total_quantity} items ({self.distinct_items} distinct)"
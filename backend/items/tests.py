@@ -3,6 +3,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from .models import Item
+from accounts.currency_registry import CurrencyRegistry
 from accounts.models import User, UserCurrency, Currency
 
 class ShopPurchaseNotificationTests(TestCase):
@@ -11,6 +12,7 @@ class ShopPurchaseNotificationTests(TestCase):
         self.user = User.objects.create_user(email='shopper@example.com', username='shopper', password='testpassword')
         self.currency = Currency.objects.create(name='Gold', code='G')
         self.user_currency = UserCurrency.objects.create(user=self.user, currency=self.currency, balance=1000)
+        CurrencyRegistry._bump_version()
         self.item = Item.objects.create(name='Sword', base_price=100)
         self.client.force_authenticate(user=self.user)
 
@@ -22,3 +24,71 @@ class ShopPurchaseNotificationTests(TestCase):
         # Check that the user received a notification
         notifications = self.user.notifications.filter(message__icontains='purchased')
         self.assertTrue(notifications.exists())
+
+
+from .models import InventoryItem, InventorySummary
+from .inventory_summary_service import InventorySummaryService
+from transactions.models import CurrencyTransaction, InventoryTransaction
+from transactions import ledger
+from transactions.services import atomic_batch_item_grant, atomic_batch_transfer, atomic_item_currency_transfer, atomic_use_item
+
+class InventorySummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='hoarder@example.com', username='hoarder', password='testpassword')
+        self.sword = Item.objects.create(name='Sword')
+        self.shield = Item.objects.create(name='Shield')
+
+    def test_summary_is_built_once_then_maintained(self):
+        InventoryItem.objects.create(user=self.user, item=self.sword, quantity=3)
+        atomic_item_currency_transfer(self.user, self.sword, 2, None, 0, 'gain', 'test')
+        atomic_batch_item_grant(self.user, {self.sword.id: 1, self.shield.id: 4}, 'gain', 'test')
+
+        summary = InventorySummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_quantity, 10)
+        self.assertEqual(summary.distinct_items, 2)
+
+    def test_using_one_of_several_rows_keeps_the_item_held(self):
+        first = InventoryItem.objects.create(user=self.user, item=self.sword, quantity=1)
+        InventoryItem.objects.create(user=self.user, item=self.sword, quantity=1)
+        InventorySummaryService.lock(self.user)
+
+        atomic_use_item(first, 'use', 'test')
+        summary = InventorySummary.objects.get(user=self.user)
+        self.assertEqual((summary.total_quantity, summary.distinct_items), (1, 1))
+        self.assertEqual(InventoryTransaction.objects.get(user=self.user).quantity, -1)
+
+        atomic_use_item(InventoryItem.objects.get(user=self.user), 'use', 'test')
+        summary.refresh_from_db()
+        self.assertEqual((summary.total_quantity, summary.distinct_items), (0, 0))
+
+    def test_batch_grant_rejects_grants_over_capacity(self):
+        atomic_batch_item_grant(self.user, {self.sword.id: 99, self.shield.id: 99}, 'gain', 'test')
+        with self.assertRaises(ValueError):
+            atomic_batch_item_grant(self.user, {self.shield.id: 1, Item.objects.create(name='Bow').id: 2}, 'gain', 'test')
+        self.assertEqual(InventorySummary.objects.get(user=self.user).total_quantity, 198)
+
+    def test_reconcile_repairs_drift(self):
+        atomic_batch_item_grant(self.user, {self.sword.id: 5}, 'gain', 'test')
+        InventoryItem.objects.filter(user=self.user).update(quantity=2)
+
+        self.assertEqual(InventorySummaryService.reconcile([self.user.id]), 1)
+        self.assertEqual(InventorySummary.objects.get(user=self.user).total_quantity, 2)
+        self.assertEqual(InventorySummaryService.reconcile([self.user.id]), 0)
+
+    def test_batch_transfer_spans_users_items_and_currencies(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='testpassword')
+        Currency.objects.create(name='Gold', code='G')
+        CurrencyRegistry._bump_version()
+        atomic_batch_transfer([
+            (self.user, self.sword, 2, 'gain', 'payout'),
+            (other, self.sword, 1, 'gain', 'payout'),
+            (self.user, self.sword, -1, 'use', 'payout'),
+            (self.user, 'G', 50, 'reward', 'payout'),
+            (other, 'G', 25, 'reward', 'payout'),
+        ])
+
+        self.assertEqual(InventoryItem.objects.get(user=self.user, item=self.sword).quantity, 1)
+        self.assertEqual(InventorySummary.objects.get(user=other).total_quantity, 1)
+        self.assertEqual(ledger.balance(self.user, Currency.objects.get(code='G')), 50)
+        self.assertEqual(InventoryTransaction.objects.filter(source='payout').count(), 3)
+        self.assertEqual(CurrencyTransaction.objects.filter(source='payout').count(), 2)
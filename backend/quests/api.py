@@ -6,7 +6,8 @@ from .models import Quest, UserQuest
 from .serializers import QuestSerializer, UserQuestSerializer
 
 from notifications.utils import send_user_notification
-from accounts.models import Currency, UserCurrency
+from accounts.currency_registry import CurrencyRegistry
+from transactions import ledger
 
 class QuestViewSet(viewsets.ModelViewSet):
     queryset = Quest.objects.all().order_by('id')
@@ -47,15 +48,9 @@ class UserQuestViewSet(viewsets.ModelViewSet):
         user.xp += user_quest.quest.reward_xp
         user.save()
 
-        # Assume first currency is the primary one
-        primary_currency = Currency.objects.first()
-        if primary_currency:
-            user_currency, created = UserCurrency.objects.get_or_create(
-                user=user,
-                currency=primary_currency
-            )
-            user_currency.balance += user_quest.quest.reward_currency
-            user_currency.save()
+        primary_currency = CurrencyRegistry.get().primary()
+        if primary_currency and user_quest.quest.reward_currency > 0:
+            ledger.credit(user, primary_currency, user_quest.quest.reward_currency, 'reward', 'quest', {'quest_id': user_quest.quest.id})
 
         message = f"You have completed the quest '{user_quest.quest.title}' and earned {user_quest.quest.reward_xp} XP and {user_quest.quest.reward_currency} {primary_currency.name}!"
         send_user_notification(user, message)
@@ -3,7 +3,9 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from .models import Quest, UserQuest
-from accounts.models import User, Currency, UserCurrency
+from accounts.currency_registry import CurrencyRegistry
+from accounts.models import User, Currency
+from transactions import ledger
 
 class QuestAPITests(TestCase):
     def setUp(self):
@@ -11,6 +13,7 @@ class QuestAPITests(TestCase):
         self.user = User.objects.create_user(username='testuser', email='testuser@example.com', password='testpassword')
         self.client.force_authenticate(user=self.user)
         self.currency = Currency.objects.create(name='Gold')
+        CurrencyRegistry._bump_version()
         self.quest = Quest.objects.create(title='Test Quest', description='Test Description', reward_xp=100, reward_currency=50)
         self.user_quest = UserQuest.objects.create(user=self.user, quest=self.quest)
 
@@ -22,5 +25,4 @@ class QuestAPITests(TestCase):
         self.user_quest.refresh_from_db()
         self.assertEqual(self.user.xp, 100)
         self.assertEqual(self.user_quest.is_completed, True)
-        user_currency = UserCurrency.objects.get(user=self.user, currency=self.currency)
-        self.assertEqual(user_currency.balance, 50)
+        self.assertEqual(ledger.balance(self.user, self.currency), 50)
@@ -8,6 +8,7 @@ from .serializers import TeamSerializer, TeamMemberSerializer, ChangeTeamNameSer
 from notifications.utils import send_user_notification
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from items.models import InventoryItem
+from transactions.services import atomic_use_item
 from accounts.models import ActivityLog, User
 from .utils import get_suggested_teams
 from .filters import TeamFilter
@@ -124,7 +125,9 @@ class ChangeTeamNameView(views.APIView):
             user = request.user
             try:
                 team = Team.objects.get(id=team_id, created_by=user)
-                item_to_use = InventoryItem.objects.get(user=user, item__name="Team Name Change")
+                item_to_use = InventoryItem.objects.filter(user=user, item__name="Team Name Change", quantity__gt=0).first()
+                if item_to_use is None:
+                    raise InventoryItem.DoesNotExist
 
                 if Team.objects.filter(name=new_name).exclude(pk=team.pk).exists() or \
                    Team.objects.filter(tag=new_tag).exclude(pk=team.pk).exists():
@@ -133,7 +136,7 @@ class ChangeTeamNameView(views.APIView):
                 team.name = new_name
                 team.tag = new_tag
                 team.save()
-                item_to_use.delete()
+                atomic_use_item(item_to_use, 'use', 'team_name_change', {'team_id': team.id})
                 ActivityLog.objects.create(user=user, action="Team Name Changed", details={'team_id': team.id, 'new_name': new_name, 'new_tag': new_tag})
 
                 return Response({'status': 'Team name and tag changed successfully!'})
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import ShopItem, Trade
+from .models import ShopItem, Trade, FlashSaleReservation
+from .flash_sale_service import FlashSaleService
 
 @admin.register(ShopItem)
 class ShopItemAdmin(admin.ModelAdmin):
@@ -7,6 +8,12 @@ class ShopItemAdmin(admin.ModelAdmin):
     list_filter = ('currency', 'is_flash_sale', 'is_limited_time')
     search_fields = ('item__name',)
     ordering = ('-sale_start',)
+    actions = ['open_flash_sale']
+
+    def open_flash_sale(self, request, queryset):
+        opened = sum(FlashSaleService.open_sale(shop_item) for shop_item in queryset.filter(is_flash_sale=True))
+        self.message_user(request, f"Opened {opened} flash sale(s).")
+    open_flash_sale.short_description = "Open flash sale stock now"
 
 @admin.register(Trade)
 class TradeAdmin(admin.ModelAdmin):
@@ -14,3 +21,10 @@ class TradeAdmin(admin.ModelAdmin):
     list_filter = ('currency', 'status', 'admin_approval')
     search_fields = ('from_user__email', 'to_user__email', 'item__name')
     ordering = ('-created_at',)
+
+@admin.register(FlashSaleReservation)
+class FlashSaleReservationAdmin(admin.ModelAdmin):
+    list_display = ('shop_item', 'user', 'quantity', 'allocations', 'status', 'created_at', 'expires_at')
+    list_filter = ('status',)
+    search_fields = ('user__email', 'shop_item__item__name')
+    ordering = ('-created_at',)
@@ -1,6 +1,10 @@
-from rest_framework import viewsets
-from .models import Trade, Auction, Bid
-from .serializers import TradeSerializer, AuctionSerializer, BidSerializer
+from django.shortcuts import get_object_or_404
+from rest_framework import viewsets, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import Trade, Auction, Bid, ShopItem, FlashSaleReservation
+from .serializers import TradeSerializer, AuctionSerializer, BidSerializer, FlashSaleReservationSerializer
+from .flash_sale_service import FlashSaleService
 from notifications.utils import send_group_notification, send_user_notification
 from accounts.models import User
 
@@ -39,3 +43,27 @@ class BidViewSet(viewsets.ModelViewSet):
         previous_high_bid = bid.auction.bid_set.order_by('-amount').first()
         if previous_high_bid and previous_high_bid.bidder != bid.bidder:
             send_user_notification(previous_high_bid.bidder, f"You have been outbid on the auction for {bid.auction.item.name}")
+
+class FlashSaleReserveView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, shop_item_id):
+        shop_item = get_object_or_404(ShopItem, id=shop_item_id, is_flash_sale=True)
+        try:
+            reservation = FlashSaleService.reserve(request.user, shop_item, int(request.data.get('quantity', 1)))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(FlashSaleReservationSerializer(reservation).data, status=status.HTTP_201_CREATED)
+
+class FlashSaleSettleView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, reservation_id):
+        reservation = get_object_or_404(
+            FlashSaleReservation.objects.select_related('shop_item__item'), id=reservation_id, user=request.user
+        )
+        try:
+            FlashSaleService.settle(reservation)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(FlashSaleReservationSerializer(reservation).data)
@@ -0,0 +1,219 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from transactions.services import atomic_item_currency_transfer
+from .models import ShopItem, FlashSaleStockShard, FlashSaleReservation
+
+
+class FlashSaleService:
+    """
+    Stock, reservations and settlement for flash-sale ShopItems.
+
+    While a sale is open its stock lives in SHARD_COUNT counter rows. A reservation
+    takes its quantity from one shard picked at random with a conditional F()
+    decrement, so concurrent buyers rarely touch the same row and the stock can
+    never go negative. When that shard runs short the quantity is split across the
+    others, and the reservation records what it took from each. Settling a
+    reservation charges the buyer and delivers the items through the ledger;
+    reservations left unsettled for RESERVATION_TTL are released back into their
+    shards by sweep(), which also opens sales as they start and folds the shards
+    back into ShopItem.stock once they end.
+    """
+    SHARD_COUNT = 16
+    RESERVATION_TTL = timedelta(minutes=5)
+    SWEEP_BATCH_SIZE = 500
+
+    @staticmethod
+    def is_live(shop_item, now=None):
+        now = now or timezone.now()
+        return (
+            shop_item.is_flash_sale
+            and (shop_item.sale_start is None or shop_item.sale_start <= now)
+            and (shop_item.sale_end is None or now < shop_item.sale_end)
+        )
+
+    @staticmethod
+    def open_sale(shop_item):
+        """Moves the item's stock into the shards. Returns False if the sale was already open."""
+        with transaction.atomic():
+            shop_item = ShopItem.objects.select_for_update().get(pk=shop_item.pk)
+            if FlashSaleStockShard.objects.filter(shop_item=shop_item).exists():
+                return False
+            per_shard, extra = divmod(shop_item.stock, FlashSaleService.SHARD_COUNT)
+            FlashSaleStockShard.objects.bulk_create([
+                FlashSaleStockShard(shop_item=shop_item, shard=shard, remaining=per_shard + (1 if shard < extra else 0))
+                for shard in range(FlashSaleService.SHARD_COUNT)
+            ])
+            ShopItem.objects.filter(pk=shop_item.pk).update(stock=0)
+        return True
+
+    @staticmethod
+    def stock_remaining(shop_item):
+        """Unreserved stock: the sum of the shards while the sale is open, ShopItem.stock otherwise."""
+        remaining = FlashSaleStockShard.objects.filter(shop_item=shop_item).aggregate(remaining=Sum('remaining'))['remaining']
+        return shop_item.stock if remaining is None else remaining
+
+    @staticmethod
+    def _take(shop_item, quantity):
+        """
+        Takes up to quantity from the shards. Returns {shard: taken}, which adds up to
+        less than quantity if the sale has run short; the caller must then roll back.
+        """
+        shards = FlashSaleStockShard.objects.filter(shop_item=shop_item)
+        shard = random.randrange(FlashSaleService.SHARD_COUNT)
+        if shards.filter(shard=shard, remaining__gte=quantity).update(remaining=F('remaining') - quantity):
+            return {shard: quantity}
+        # The random pick ran short; split the quantity over the shards that have stock,
+        # in shard order so concurrent buyers cannot deadlock.
+        taken = {}
+        needed = quantity
+        for shard, remaining in shards.filter(remaining__gt=0).order_by('shard').values_list('shard', 'remaining'):
+            while needed and remaining:
+                amount = min(remaining, needed)
+                if shards.filter(shard=shard, remaining__gte=amount).update(remaining=F('remaining') - amount):
+                    taken[shard] = amount
+                    needed -= amount
+                    break
+                remaining = shards.filter(shard=shard).values_list('remaining', flat=True).first() or 0
+            if not needed:
+                break
+        return taken
+
+    @staticmethod
+    def reserve(user, shop_item, quantity, now=None):
+        """
+        Holds quantity units for the user until RESERVATION_TTL passes. Opens the sale's
+        shards if the sweeper has not yet. Raises ValueError if the sale is not running
+        or fewer than quantity units are left.
+        """
+        now = now or timezone.now()
+        if quantity <= 0:
+            raise ValueError("Invalid quantity.")
+        if not FlashSaleService.is_live(shop_item, now):
+            raise ValueError("This flash sale is not running.")
+
+        with transaction.atomic():
+            allocations = FlashSaleService._take(shop_item, quantity)
+            if not allocations and not FlashSaleStockShard.objects.filter(shop_item=shop_item).exists():
+                FlashSaleService.open_sale(shop_item)
+                allocations = FlashSaleService._take(shop_item, quantity)
+            if sum(allocations.values()) < quantity:
+                # Rolls back whatever was taken.
+                raise ValueError("Not enough stock left in this sale.")
+            return FlashSaleReservation.objects.create(
+                shop_item=shop_item, user=user, allocations=allocations, quantity=quantity,
+                expires_at=now + FlashSaleService.RESERVATION_TTL,
+            )
+
+    @staticmethod
+    def settle(reservation, now=None):
+        """
+        Charges the buyer and adds the items to their inventory. Raises ValueError if the
+        reservation is no longer pending or has expired, or if the buyer cannot pay, in
+        which case the reserved stock is released straight away.
+        """
+        now = now or timezone.now()
+        shop_item = reservation.shop_item
+        try:
+            with transaction.atomic():
+                claimed = FlashSaleReservation.objects.filter(
+                    pk=reservation.pk, status='pending', expires_at__gt=now
+                ).update(status='settled')
+                if not claimed:
+                    raise ValueError("This reservation has expired.")
+                inv_tx, cur_tx = atomic_item_currency_transfer(
+                    user=reservation.user,
+                    item=shop_item.item,
+                    item_delta=reservation.quantity,
+                    currency=shop_item.currency,
+                    currency_delta=-shop_item.price * Decimal(reservation.quantity),
+                    action="purchase",
+                    source="flash_sale",
+                    metadata={"shop_item_id": shop_item.id, "reservation_id": reservation.pk, "quantity": reservation.quantity},
+                )
+        except ValueError:
+            FlashSaleService.release(reservation)
+            raise
+        reservation.status = 'settled'
+        return inv_tx
+
+    @staticmethod
+    def purchase(user, shop_item, quantity, now=None):
+        """Reserves and immediately settles, for buyers that do not need a checkout step."""
+        reservation = FlashSaleService.reserve(user, shop_item, quantity, now)
+        return FlashSaleService.settle(reservation, now)
+
+    @staticmethod
+    def _return_stock(reservations):
+        """Marks locked pending reservations released and adds what they took back to their shards."""
+        returned = defaultdict(int)
+        for reservation in reservations:
+            reservation.status = 'released'
+            # JSON object keys come back from the database as strings.
+            for shard, quantity in reservation.allocations.items():
+                returned[(reservation.shop_item_id, int(shard))] += quantity
+        FlashSaleReservation.objects.bulk_update(reservations, ['status'])
+        # Shards are updated in a fixed order so concurrent sweeps cannot deadlock.
+        for (shop_item_id, shard), quantity in sorted(returned.items()):
+            FlashSaleStockShard.objects.filter(shop_item_id=shop_item_id, shard=shard).update(remaining=F('remaining') + quantity)
+
+    @staticmethod
+    def release(reservation):
+        """Releases a pending reservation early. Returns False if it was settled or released already."""
+        with transaction.atomic():
+            reservations = list(
+                FlashSaleReservation.objects.select_for_update(skip_locked=True).filter(pk=reservation.pk, status='pending')
+            )
+            FlashSaleService._return_stock(reservations)
+        return bool(reservations)
+
+    @staticmethod
+    def release_expired(now=None, batch_size=SWEEP_BATCH_SIZE):
+        """Releases every pending reservation past its expiry, batch_size at a time. Returns the number released."""
+        now = now or timezone.now()
+        released = 0
+        while True:
+            with transaction.atomic():
+                reservations = list(
+                    FlashSaleReservation.objects.select_for_update(skip_locked=True)
+                    .filter(status='pending', expires_at__lte=now).order_by('id')[:batch_size]
+                )
+                FlashSaleService._return_stock(reservations)
+            released += len(reservations)
+            if len(reservations) < batch_size:
+                break
+        return released
+
+    @staticmethod
+    def close_ended_sales(now=None):
+        """Folds the shards of every ended sale with no pending reservations back into ShopItem.stock."""
+        now = now or timezone.now()
+        closed = 0
+        for shop_item in ShopItem.objects.filter(sale_end__lte=now, stock_shards__isnull=False).distinct():
+            with transaction.atomic():
+                shards = list(FlashSaleStockShard.objects.select_for_update().filter(shop_item=shop_item).order_by('shard'))
+                if not shards or FlashSaleReservation.objects.filter(shop_item=shop_item, status='pending').exists():
+                    continue
+                ShopItem.objects.filter(pk=shop_item.pk).update(stock=F('stock') + sum(shard.remaining for shard in shards))
+                FlashSaleStockShard.objects.filter(shop_item=shop_item).delete()
+            closed += 1
+        return closed
+
+    @staticmethod
+    def sweep(now=None):
+        """Opens started sales, releases expired reservations and closes ended sales."""
+        now = now or timezone.now()
+        starting = ShopItem.objects.filter(
+            Q(sale_start__isnull=True) | Q(sale_start__lte=now),
+            Q(sale_end__isnull=True) | Q(sale_end__gt=now),
+            is_flash_sale=True, stock__gt=0, stock_shards__isnull=True,
+        )
+        return {
+            'opened': sum(FlashSaleService.open_sale(shop_item) for shop_item in starting),
+            'released': FlashSaleService.release_expired(now),
+            'closed': FlashSaleService.close_ended_sales(now),
+        }
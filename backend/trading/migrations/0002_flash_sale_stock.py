@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlashSaleStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('remaining', models.PositiveIntegerField(default=0)),
+                ('shop_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='trading.shopitem')),
+            ],
+            options={
+                'unique_together': {('shop_item', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='FlashSaleReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('settled', 'Settled'), ('released', 'Released')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('shop_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='trading.shopitem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flash_sale_reservations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='flashsale_res_expiry_idx')],
+            },
+        ),
+    ]
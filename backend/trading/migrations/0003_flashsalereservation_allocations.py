@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0002_flash_sale_stock'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='flashsalereservation',
+            name='shard',
+        ),
+        migrations.AddField(
+            model_name='flashsalereservation',
+            name='allocations',
+            field=models.JSONField(default=dict, help_text='{shard: quantity} taken from each stock shard.'),
+        ),
+    ]
@@ -15,6 +15,39 @@ class ShopItem(models.Model):
     def __str__(self):
         return f"{self.item.name} - {self.price} {self.currency}"
 
+class FlashSaleStockShard(models.Model):
+    """
+    One of several counters a flash sale's stock is split over while the sale is open,
+    so concurrent buyers decrement different rows instead of queueing on the ShopItem.
+    """
+    shop_item = models.ForeignKey(ShopItem, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    remaining = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('shop_item', 'shard')
+
+    def __str__(self):
+        return f"{self.shop_item} shard {self.shard}: {self.remaining}"
+
+# Stock held for a buyer between reservation and settlement
+class FlashSaleReservation(models.Model):
+    STATUS_CHOICES = [('pending', 'Pending'), ('settled', 'Settled'), ('released', 'Released')]
+
+    shop_item = models.ForeignKey(ShopItem, on_delete=models.CASCADE, related_name='reservations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='flash_sale_reservations')
+    allocations = models.JSONField(default=dict, help_text='{shard: quantity} taken from each stock shard.')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'expires_at'], name='flashsale_res_expiry_idx')]
+
+    def __str__(self):
+        return f"{self.user.email} reserved {self.shop_item.item.name} x{self.quantity} ({self.status})"
+
 # Trade model for player-to-player trades (player sets price)
 class Trade(models.Model):
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trades_offered')
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Trade, Auction, Bid
+from .models import Trade, Auction, Bid, FlashSaleReservation
 
 class TradeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,3 +15,8 @@ class BidSerializer(serializers.ModelSerializer):
     class Meta:
         model = Bid
         fields = '__all__'
+
+class FlashSaleReservationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FlashSaleReservation
+        fields = ['id', 'shop_item', 'quantity', 'status', 'created_at', 'expires_at']
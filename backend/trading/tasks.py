@@ -0,0 +1,14 @@
+import logging
+from celery import shared_task
+from .flash_sale_service import FlashSaleService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def sweep_flash_sales():
+    """Periodic task that opens started flash sales, releases expired reservations and closes ended sales."""
+    result = FlashSaleService.sweep()
+    if any(result.values()):
+        logger.info("Flash sale sweep: %s", result)
+    return result
@@ -0,0 +1,129 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from accounts.currency_registry import CurrencyRegistry
+from accounts.models import User, Currency
+from items.models import Item, InventoryItem, InventorySummary
+from transactions import ledger
+from .flash_sale_service import FlashSaleService
+from .models import ShopItem, FlashSaleStockShard, FlashSaleReservation, Trade
+from .services import purchase_item, atomic_trade
+
+
+class FlashSaleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='bargain@example.com', username='bargain', password='testpassword')
+        self.coins = Currency.objects.create(name='Game Coin', code='game')
+        CurrencyRegistry._bump_version()
+        ledger.credit(self.user, self.coins, 1000, 'reward', 'test')
+        self.now = timezone.now()
+        self.sword = Item.objects.create(name='Sword', base_price=10)
+        self.shop_item = ShopItem.objects.create(
+            item=self.sword, price=10, currency='game', stock=20, is_flash_sale=True,
+            sale_start=self.now - timedelta(minutes=1), sale_end=self.now + timedelta(hours=1),
+        )
+
+    def test_reserve_and_settle(self):
+        reservation = FlashSaleService.reserve(self.user, self.shop_item, 3)
+        self.assertEqual(FlashSaleStockShard.objects.filter(shop_item=self.shop_item).count(), FlashSaleService.SHARD_COUNT)
+        self.assertEqual(FlashSaleService.stock_remaining(self.shop_item), 17)
+
+        FlashSaleService.settle(reservation)
+        self.assertEqual(InventoryItem.objects.get(user=self.user, item=self.sword).quantity, 3)
+        self.assertEqual(ledger.balance(self.user, self.coins), 970)
+        with self.assertRaises(ValueError):
+            FlashSaleService.settle(reservation)
+        self.assertEqual(FlashSaleService.stock_remaining(self.shop_item), 17)
+
+    def test_reservation_spanning_shards_returns_all_its_stock(self):
+        reservation = FlashSaleService.reserve(self.user, self.shop_item, 20)
+        self.assertEqual(sum(reservation.allocations.values()), 20)
+        self.assertEqual(len(reservation.allocations), FlashSaleService.SHARD_COUNT)
+        self.assertEqual(FlashSaleService.stock_remaining(self.shop_item), 0)
+
+        self.assertTrue(FlashSaleService.release(reservation))
+        self.assertEqual(FlashSaleService.stock_remaining(self.shop_item), 20)
+        self.assertEqual(set(FlashSaleStockShard.objects.filter(shop_item=self.shop_item).values_list('remaining', flat=True)), {1, 2})
+
+    def test_never_oversells(self):
+        for _ in range(20):
+            FlashSaleService.reserve(self.user, self.shop_item, 1)
+        with self.assertRaises(ValueError):
+            FlashSaleService.reserve(self.user, self.shop_item, 1)
+        self.assertEqual(FlashSaleService.stock_remaining(self.shop_item), 0)
+
+    def test_sweep_releases_expired_reservations(self):
+        reservation = FlashSaleService.reserve(self.user, self.shop_item, 5)
+        later = self.now + FlashSaleService.RESERVATION_TTL + timedelta(seconds=1)
+
+        self.assertEqual(FlashSaleService.sweep(now=later)['released'], 1)
+        self.assertEqual(FlashSaleService.stock_remaining(self.shop_item), 20)
+        with self.assertRaises(ValueError):
+            FlashSaleService.settle(reservation, now=later)
+        self.assertFalse(InventoryItem.objects.filter(user=self.user, item=self.sword).exists())
+
+    def test_failed_payment_releases_stock(self):
+        ShopItem.objects.filter(pk=self.shop_item.pk).update(price=500)
+        self.shop_item.refresh_from_db()
+        with self.assertRaises(ValueError):
+            purchase_item(self.user, self.shop_item, 3)
+        self.assertEqual(FlashSaleReservation.objects.get().status, 'released')
+        self.assertEqual(FlashSaleService.stock_remaining(self.shop_item), 20)
+        self.assertEqual(ledger.balance(self.user, self.coins), 1000)
+
+    def test_ended_sale_folds_back_into_stock(self):
+        FlashSaleService.purchase(self.user, self.shop_item, 4)
+        self.assertEqual(FlashSaleService.sweep(now=self.shop_item.sale_end)['closed'], 1)
+        self.shop_item.refresh_from_db()
+        self.assertEqual(self.shop_item.stock, 16)
+        self.assertFalse(FlashSaleStockShard.objects.filter(shop_item=self.shop_item).exists())
+
+    def test_regular_purchase_decrements_stock_conditionally(self):
+        ShopItem.objects.filter(pk=self.shop_item.pk).update(is_flash_sale=False)
+        self.shop_item.refresh_from_db()
+        purchase_item(self.user, self.shop_item, 15)
+        with self.assertRaises(ValueError):
+            purchase_item(self.user, self.shop_item, 6)
+        self.shop_item.refresh_from_db()
+        self.assertEqual(self.shop_item.stock, 5)
+
+
+class TradeTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller', password='testpassword')
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer', password='testpassword')
+        self.coins = Currency.objects.create(name='Game Coin', code='game')
+        CurrencyRegistry._bump_version()
+        ledger.credit(self.buyer, self.coins, 100, 'reward', 'test')
+        self.sword = Item.objects.create(name='Sword', base_price=10)
+        InventoryItem.objects.create(user=self.seller, item=self.sword, quantity=2)
+
+    def trade(self, price):
+        return Trade.objects.create(
+            from_user=self.seller, to_user=self.buyer, item=self.sword, quantity=2, price=price, currency='game', fee=3, status='approved'
+        )
+
+    def test_trade_debits_the_buyer_and_credits_the_seller(self):
+        trade = self.trade(30)
+        atomic_trade(trade)
+        self.assertEqual(ledger.balance(self.buyer, self.coins), 70)
+        self.assertEqual(ledger.balance(self.seller, self.coins), 27)
+        self.assertEqual(InventoryItem.objects.get(user=self.buyer, item=self.sword).quantity, 2)
+        self.assertEqual(InventoryItem.objects.get(user=self.seller, item=self.sword).quantity, 0)
+        trade.refresh_from_db()
+        self.assertEqual(trade.status, 'completed')
+
+    def test_trade_keeps_both_inventory_summaries_in_step(self):
+        atomic_trade(self.trade(30))
+        seller = InventorySummary.objects.get(user=self.seller)
+        buyer = InventorySummary.objects.get(user=self.buyer)
+        self.assertEqual((seller.total_quantity, seller.distinct_items), (0, 0))
+        self.assertEqual((buyer.total_quantity, buyer.distinct_items), (2, 1))
+
+    def test_buyer_who_cannot_pay_gets_nothing(self):
+        with self.assertRaises(ValueError):
+            atomic_trade(self.trade(500))
+        self.assertEqual(ledger.balance(self.buyer, self.coins), 100)
+        self.assertEqual(ledger.balance(self.seller, self.coins), 0)
+        self.assertEqual(InventoryItem.objects.get(user=self.seller, item=self.sword).quantity, 2)
+        self.assertFalse(InventoryItem.objects.filter(user=self.buyer, item=self.sword).exists())
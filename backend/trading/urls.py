@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api import TradeViewSet, AuctionViewSet, BidViewSet
+from .api import TradeViewSet, AuctionViewSet, BidViewSet, FlashSaleReserveView, FlashSaleSettleView
 
 router = DefaultRouter()
 router.register(r'trades', TradeViewSet)
@@ -9,4 +9,6 @@ router.register(r'bids', BidViewSet)
 
 urlpatterns = [
     path('api/', include(router.urls)),
+    path('api/flash-sales/<int:shop_item_id>/reserve/', FlashSaleReserveView.as_view(), name='flash_sale_reserve'),
+    path('api/flash-sales/reservations/<int:reservation_id>/settle/', FlashSaleSettleView.as_view(), name='flash_sale_settle'),
 ]
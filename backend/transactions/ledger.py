@@ -0,0 +1,230 @@
+"""
+The currency ledger.
+
+Every balance change is an appended CurrencyTransaction. UserCurrency.balance is a
+snapshot of the sum of an account's entries up to snapshot_transaction_id, refreshed
+by take_snapshots(); the live balance is that snapshot plus the entries after it.
+
+Credits are a single insert. Debits lock the account's UserCurrency row so two
+spends cannot both pass the funds check, then insert.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+from accounts.models import UserCurrency
+from .models import CurrencyTransaction
+
+LedgerEntry = namedtuple('LedgerEntry', ['user', 'currency', 'amount', 'action', 'source', 'metadata'], defaults=(None,))
+
+# IDs are handed out before their transaction commits, so a snapshot pass stops at
+# the first missing ID until the entries after it are this old; by then the missing
+# entry is taken to have rolled back.
+SNAPSHOT_GAP_TIMEOUT = timedelta(minutes=10)
+SNAPSHOT_CHUNK_SIZE = 1000
+VERIFY_CHUNK_SIZE = 5000
+
+
+def _amount(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _new_entry(entry):
+    return CurrencyTransaction(
+        user=entry.user, currency=entry.currency, amount=_amount(entry.amount), action=entry.action,
+        source=entry.source, metadata=entry.metadata or {},
+    )
+
+
+def credit(user, currency, amount, action, source, metadata=None):
+    """Appends a positive entry. One INSERT; nothing is read or locked."""
+    if _amount(amount) <= 0:
+        raise ValueError("Amount must be positive.")
+    entry = _new_entry(LedgerEntry(user, currency, amount, action, source, metadata))
+    entry.save()
+    return entry
+
+
+def debit(user, currency, amount, action, source, metadata=None):
+    """Appends a negative entry for amount. Raises ValueError if the account cannot cover it."""
+    if _amount(amount) <= 0:
+        raise ValueError("Amount must be positive.")
+    return post([LedgerEntry(user, currency, -_amount(amount), action, source, metadata)])[0]
+
+
+def post(entries):
+    """
+    Appends a batch of entries with one bulk insert. Accounts that are debited are
+    locked in (user, currency) order and must end the batch with a non-negative
+    balance; otherwise ValueError is raised and nothing is written.
+    """
+    entries = [entry._replace(amount=_amount(entry.amount)) for entry in map(LedgerEntry._make, entries) if entry.amount]
+    if not entries:
+        return []
+
+    with transaction.atomic():
+        debited = {(entry.user.id, entry.currency.id) for entry in entries if entry.amount < 0}
+        if debited:
+            current = _locked_balances(debited)
+            for entry in entries:
+                key = (entry.user.id, entry.currency.id)
+                if key in current:
+                    current[key] += entry.amount
+            if any(value < 0 for value in current.values()):
+                raise ValueError("Insufficient funds.")
+        return CurrencyTransaction.objects.bulk_create([_new_entry(entry) for entry in entries])
+
+
+def _account_filter(keys):
+    query = Q()
+    for user_id, currency_id in keys:
+        query |= Q(user_id=user_id, currency_id=currency_id)
+    return query
+
+
+def _lock_accounts(keys):
+    """Locks (creating where missing) the UserCurrency rows for keys, in a fixed order."""
+    UserCurrency.objects.bulk_create(
+        [UserCurrency(user_id=user_id, currency_id=currency_id) for user_id, currency_id in keys],
+        ignore_conflicts=True,
+    )
+    return {
+        (uc.user_id, uc.currency_id): uc
+        for uc in UserCurrency.objects.select_for_update().filter(_account_filter(keys)).order_by('user_id', 'currency_id')
+    }
+
+
+def _pending(accounts, up_to=None):
+    """{(user_id, currency_id): total} of the entries after each account's snapshot, up to up_to if given."""
+    pending = Q()
+    for key, uc in accounts.items():
+        pending |= Q(user_id=key[0], currency_id=key[1], id__gt=uc.snapshot_transaction_id)
+    entries = CurrencyTransaction.objects.filter(pending)
+    if up_to is not None:
+        entries = entries.filter(id__lte=up_to)
+    return {
+        (row['user_id'], row['currency_id']): row['total']
+        for row in entries.values('user_id', 'currency_id').annotate(total=Sum('amount'))
+    }
+
+
+def _locked_balances(keys):
+    accounts = _lock_accounts(keys)
+    balances = {key: uc.balance for key, uc in accounts.items()}
+    for key, total in _pending(accounts).items():
+        balances[key] += total
+    return balances
+
+
+def balance(user, currency):
+    """An account's live balance: its snapshot plus every entry after it."""
+    snapshot = UserCurrency.objects.filter(user=user, currency=currency).values('balance', 'snapshot_transaction_id').first()
+    base, after = (snapshot['balance'], snapshot['snapshot_transaction_id']) if snapshot else (Decimal('0'), 0)
+    pending = CurrencyTransaction.objects.filter(user=user, currency=currency, id__gt=after).aggregate(total=Sum('amount'))['total']
+    return base + (pending or Decimal('0'))
+
+
+def balances(user):
+    """{currency_id: live balance} for every currency the user has a snapshot or entries in."""
+    snapshots = {
+        row['currency_id']: row
+        for row in UserCurrency.objects.filter(user=user).values('currency_id', 'balance', 'snapshot_transaction_id')
+    }
+    result = {currency_id: row['balance'] for currency_id, row in snapshots.items()}
+    pending = Q(user=user)
+    for currency_id, row in snapshots.items():
+        pending &= ~Q(currency_id=currency_id, id__lte=row['snapshot_transaction_id'])
+    for row in CurrencyTransaction.objects.filter(pending).values('currency_id').annotate(total=Sum('amount')):
+        result[row['currency_id']] = result.get(row['currency_id'], Decimal('0')) + row['total']
+    return result
+
+
+def _committed_horizon(watermark, now):
+    """
+    The highest ID up to which every entry after watermark has committed. A missing
+    ID holds the horizon back until the entry after it is SNAPSHOT_GAP_TIMEOUT old.
+    With no watermark yet, the oldest visible entry starts the count.
+    """
+    horizon = watermark
+    for row_id, timestamp in CurrencyTransaction.objects.filter(id__gt=watermark).order_by('id').values_list(
+        'id', 'timestamp'
+    ).iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+        if horizon and row_id != horizon + 1 and now - timestamp < SNAPSHOT_GAP_TIMEOUT:
+            break
+        horizon = row_id
+    return horizon
+
+
+def take_snapshots(chunk_size=SNAPSHOT_CHUNK_SIZE, now=None):
+    """
+    Folds every committed entry since the last pass into UserCurrency.balance and
+    advances every touched account to the same watermark, the committed horizon.
+    Accounts are locked and folded chunk_size at a time, one transaction per chunk,
+    each from its own snapshot, so an account a failed pass left behind catches up
+    on the next pass that touches it. Returns the number of accounts updated.
+    """
+    now = now or timezone.now()
+    watermark = UserCurrency.objects.aggregate(last=Max('snapshot_transaction_id'))['last'] or 0
+    high = _committed_horizon(watermark, now)
+    if high == watermark:
+        return 0
+
+    touched = CurrencyTransaction.objects.filter(id__gt=watermark, id__lte=high).values_list(
+        'user_id', 'currency_id'
+    ).distinct().order_by('user_id', 'currency_id')
+
+    updated = 0
+    for chunk in _chunks(touched.iterator(chunk_size=chunk_size), chunk_size):
+        with transaction.atomic():
+            accounts = _lock_accounts(chunk)
+            pending = _pending(accounts, up_to=high)
+            for key, uc in accounts.items():
+                uc.balance += pending.get(key, 0)
+                uc.snapshot_transaction_id = high
+                uc.snapshot_at = now
+            UserCurrency.objects.bulk_update(list(accounts.values()), ['balance', 'snapshot_transaction_id', 'snapshot_at'])
+        updated += len(chunk)
+    return updated
+
+
+def verify_balances(chunk_size=VERIFY_CHUNK_SIZE, repair=False):
+    """
+    Rebuilds every snapshot from the raw entries and returns the accounts that disagree,
+    as (user_id, currency_id, snapshot balance, rebuilt balance). Entries and snapshots
+    are streamed side by side in (user, currency) order, so memory stays flat however
+    large the ledger is. With repair=True mismatched snapshots are overwritten, unless a
+    snapshot pass moved them on in the meantime.
+    """
+    entries = CurrencyTransaction.objects.order_by('user_id', 'currency_id', 'id').values_list(
+        'user_id', 'currency_id', 'id', 'amount'
+    ).iterator(chunk_size=chunk_size)
+    snapshots = UserCurrency.objects.order_by('user_id', 'currency_id').values_list(
+        'id', 'user_id', 'currency_id', 'balance', 'snapshot_transaction_id'
+    ).iterator(chunk_size=chunk_size)
+
+    mismatches = []
+    entry = next(entries, None)
+    for pk, user_id, currency_id, snapshot_balance, snapshot_id in snapshots:
+        key = (user_id, currency_id)
+        # Entries of accounts without a snapshot row are all still pending; skip them.
+        while entry is not None and entry[:2] < key:
+            entry = next(entries, None)
+        rebuilt = Decimal('0')
+        while entry is not None and entry[:2] == key:
+            if entry[2] <= snapshot_id:
+                rebuilt += entry[3]
+            entry = next(entries, None)
+        if rebuilt != snapshot_balance:
+            mismatches.append((user_id, currency_id, snapshot_balance, rebuilt))
+            if repair:
+                UserCurrency.objects.filter(pk=pk, snapshot_transaction_id=snapshot_id).update(balance=rebuilt)
+    return mismatches
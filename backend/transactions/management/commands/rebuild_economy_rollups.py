@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from transactions import rollups
+
+class Command(BaseCommand):
+    help = 'Recomputes the economy dashboard rollups from the transaction and inventory tables. Run once after deploying them.'
+
+    def handle(self, *args, **options):
+        rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the economy dashboard rollups.'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from transactions import ledger
+
+class Command(BaseCommand):
+    help = 'Rebuilds every UserCurrency balance snapshot from the currency ledger and reports (or repairs) mismatches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Overwrite mismatched snapshots with the rebuilt balance.')
+        parser.add_argument('--chunk-size', type=int, default=ledger.VERIFY_CHUNK_SIZE, help='Rows fetched per database round trip.')
+        parser.add_argument('--snapshot', action='store_true', help='Take a snapshot pass before verifying.')
+
+    def handle(self, *args, **options):
+        if options['snapshot']:
+            self.stdout.write(f"Snapshotted {ledger.take_snapshots()} accounts.")
+        mismatches = ledger.verify_balances(chunk_size=options['chunk_size'], repair=options['repair'])
+        for user_id, currency_id, snapshot_balance, rebuilt in mismatches:
+            self.stdout.write(self.style.WARNING(
+                f"user {user_id} currency {currency_id}: snapshot {snapshot_balance}, ledger {rebuilt}"
+            ))
+        verb = 'Repaired' if options['repair'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(mismatches)} mismatched balances."))
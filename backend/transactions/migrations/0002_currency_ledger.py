@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:12
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+
+def open_ledger(apps, schema_editor):
+    """
+    Makes the ledger agree with the existing balances. Some code paths changed balances
+    without logging, so every account gets an opening entry for the difference, and
+    every balance becomes a snapshot as of the newest entry.
+    """
+    UserCurrency = apps.get_model('accounts', 'UserCurrency')
+    CurrencyTransaction = apps.get_model('transactions', 'CurrencyTransaction')
+
+    logged = {
+        (row['user_id'], row['currency_id']): row['total']
+        for row in CurrencyTransaction.objects.values('user_id', 'currency_id').annotate(total=Sum('amount'))
+    }
+    balances = {(uc.user_id, uc.currency_id): uc.balance for uc in UserCurrency.objects.all()}
+    openings = []
+    for key in set(logged) | set(balances):
+        difference = balances.get(key, Decimal('0')) - (logged.get(key) or Decimal('0'))
+        if difference:
+            openings.append(CurrencyTransaction(
+                user_id=key[0], currency_id=key[1], amount=difference, action='admin',
+                source='ledger_opening_balance', metadata={},
+            ))
+    CurrencyTransaction.objects.bulk_create(openings, batch_size=1000)
+
+    watermark = CurrencyTransaction.objects.aggregate(last=Max('id'))['last'] or 0
+    UserCurrency.objects.update(snapshot_transaction_id=watermark, snapshot_at=timezone.now())
+    for user_id, currency_id in set(logged) - set(balances):
+        UserCurrency.objects.create(
+            user_id=user_id, currency_id=currency_id, balance=Decimal('0'),
+            snapshot_transaction_id=watermark, snapshot_at=timezone.now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_usercurrency_snapshot'),
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='currencytransaction',
+            name='before_balance',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AlterField(
+            model_name='currencytransaction',
+            name='after_balance',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='currencytransaction',
+            index=models.Index(fields=['user', 'currency', 'id'], name='currencytx_account_idx'),
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
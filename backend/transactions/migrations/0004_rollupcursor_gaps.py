@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_economy_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupcursor',
+            name='gaps',
+            field=models.JSONField(blank=True, default=dict, help_text='{id: first seen} for missing IDs at or below last_id.'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_rollupcursor_gaps'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['action', '-id'], name='inventorytx_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='currencytransaction',
+            index=models.Index(condition=models.Q(('amount__gte', 1000)), fields=['-id'], name='currencytx_large_idx'),
+        ),
+    ]
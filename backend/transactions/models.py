@@ -2,6 +2,9 @@ from django.db import models
 from accounts.models import User
 from items.models import Item
 
+# The economy dashboard lists currency entries of at least this amount.
+LARGE_TRANSACTION_THRESHOLD = 1000
+
 class InventoryTransaction(models.Model):
     ACTION_CHOICES = [
         ("gain", "Gain"),
@@ -21,6 +24,12 @@ class InventoryTransaction(models.Model):
     after_quantity = models.IntegerField()
     related_transaction = models.ForeignKey('self', on_delete=models.SET_NULL, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # The dashboard lists the newest entries of one action, such as admin adjustments.
+            models.Index(fields=['action', '-id'], name='inventorytx_action_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.item.name} {self.action} {self.quantity} ({self.timestamp})"
 
@@ -44,9 +53,68 @@ class CurrencyTransaction(models.Model):
     source = models.CharField(max_length=100, blank=True)  # e.g., 'shop', 'trade', 'quest', etc.
     timestamp = models.DateTimeField(auto_now_add=True)
     metadata = models.JSONField(default=dict, blank=True)
-    before_balance = models.DecimalField(max_digits=12, decimal_places=2)
-    after_balance = models.DecimalField(max_digits=12, decimal_places=2)
+    # Only set by entries written before the ledger; balances are derived from amounts.
+    before_balance = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    after_balance = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     related_transaction = models.ForeignKey('self', on_delete=models.SET_NULL, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Balance reads sum one account's entries after its snapshot.
+            models.Index(fields=['user', 'currency', 'id'], name='currencytx_account_idx'),
+            # The dashboard lists the newest large entries.
+            models.Index(fields=['-id'], condition=models.Q(amount__gte=LARGE_TRANSACTION_THRESHOLD), name='currencytx_large_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.currency} {self.action} {self.amount} ({self.timestamp})"
+
+
+# --- Economy dashboard rollups, folded in by transactions.rollups ---
+
+class RollupCursor(models.Model):
+    """The last log row each rollup has folded in, and the IDs below it still being waited on."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    gaps = models.JSONField(default=dict, blank=True, help_text='{id: first seen} for missing IDs at or below last_id.')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+class CurrencyCirculation(models.Model):
+    from accounts.models import Currency
+    currency = models.OneToOneField(Currency, on_delete=models.CASCADE, primary_key=True, related_name='circulation')
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.currency}: {self.total}"
+
+class ItemCirculation(models.Model):
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, primary_key=True, related_name='circulation')
+    quantity = models.BigIntegerField(default=0, help_text='Units of the item held across all inventories.')
+    transactions = models.PositiveBigIntegerField(default=0, help_text='Inventory transactions logged for the item.')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-transactions'], name='itemcirculation_tx_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item.name}: {self.quantity} held"
+
+class UserTransactionHour(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transaction_hours')
+    hour = models.DateTimeField()
+    currency_transactions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'hour')
+        indexes = [
+            models.Index(fields=['hour'], name='usertxhour_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} {self.hour}: {self.currency_transactions}"
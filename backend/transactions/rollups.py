@@ -0,0 +1,212 @@
+"""
+Rollups behind the admin economy dashboard.
+
+Each fold reads only the log rows written since its cursor, aggregates them per
+currency, item or user-hour, and adds the result onto the rollup rows, so its cost
+follows the write rate rather than the size of the log tables. IDs are handed out
+before their transaction commits, so a fold remembers the IDs it found missing below
+its cursor and folds them in once they appear. rebuild() recomputes everything from
+the source tables for a first backfill or after a repair.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from items.models import InventoryItem
+from .models import (
+    CurrencyTransaction, InventoryTransaction, RollupCursor, CurrencyCirculation, ItemCirculation, UserTransactionHour,
+)
+
+# A missing ID that has not appeared for this long is taken for a rolled-back insert.
+GAP_TIMEOUT = timedelta(hours=1)
+FOLD_CHUNK_SIZE = 1000
+CURRENCY_CURSOR = 'currency_transactions'
+INVENTORY_CURSOR = 'inventory_transactions'
+# Hourly counts are only read for the last day; keep a second day as slack.
+HOURLY_RETENTION = timedelta(days=2)
+
+
+def _lock_cursor(name):
+    RollupCursor.objects.get_or_create(name=name)
+    return RollupCursor.objects.select_for_update().get(name=name)
+
+
+def _unfolded(cursor):
+    """The log rows a cursor has not folded in yet: those past it and its gaps."""
+    return Q(id__gt=cursor.last_id) | Q(id__in=[int(row_id) for row_id in cursor.gaps])
+
+
+def _fold_window(model, cursor, now):
+    """
+    The sorted IDs of the committed log rows the cursor has not folded in. Moves the
+    cursor past them and records the IDs still missing below it as gaps; a gap is
+    waited on for GAP_TIMEOUT. A cursor's first fold only looks for gaps above the
+    oldest row it finds. Folds must read exactly these IDs: a row that commits after
+    this query is one of the gaps, and is folded by a later pass.
+    """
+    waiting = {int(row_id): seen for row_id, seen in cursor.gaps.items() if now - datetime.fromisoformat(seen) < GAP_TIMEOUT}
+    after = cursor.last_id
+    ids = set(model.objects.filter(Q(id__gt=after) | Q(id__in=list(waiting))).values_list('id', flat=True))
+    up_to = max(ids | {after})
+    start = after + 1 if after else min(ids, default=1)
+    cursor.last_id = up_to
+    cursor.gaps = {
+        str(row_id): waiting.get(row_id, now.isoformat())
+        for row_id in set(waiting) | set(range(start, up_to))
+        if row_id not in ids
+    }
+    return sorted(ids)
+
+
+def _chunked_rows(model, ids):
+    """Querysets over ids, FOLD_CHUNK_SIZE IDs at a time."""
+    for start in range(0, len(ids), FOLD_CHUNK_SIZE):
+        yield model.objects.filter(id__in=ids[start:start + FOLD_CHUNK_SIZE])
+
+
+def _save_cursor(cursor):
+    cursor.save(update_fields=['last_id', 'gaps', 'updated_at'])
+
+
+def _add_to(model, increments, fields):
+    """Adds increments ({pk: {field: delta}}) onto model rows, creating the missing ones."""
+    existing = model.objects.in_bulk(list(increments))
+    to_create = []
+    for key, deltas in increments.items():
+        row = existing.get(key)
+        if row is None:
+            to_create.append(model(pk=key, **deltas))
+            continue
+        for field, delta in deltas.items():
+            setattr(row, field, getattr(row, field) + delta)
+    model.objects.bulk_update(list(existing.values()), fields)
+    model.objects.bulk_create(to_create)
+
+
+def fold_currency_transactions(now=None):
+    """Folds new CurrencyTransaction rows into CurrencyCirculation and UserTransactionHour."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        cursor = _lock_cursor(CURRENCY_CURSOR)
+        ids = _fold_window(CurrencyTransaction, cursor, now)
+        totals = defaultdict(lambda: {'total': 0})
+        hours = defaultdict(lambda: defaultdict(int))
+        for rows in _chunked_rows(CurrencyTransaction, ids):
+            for row in rows.values('currency_id').annotate(total=Sum('amount')):
+                totals[row['currency_id']]['total'] += row['total']
+            for row in rows.annotate(hour=TruncHour('timestamp')).values('user_id', 'hour').annotate(count=Count('id')):
+                hours[row['user_id']][row['hour']] += row['count']
+        _add_to(CurrencyCirculation, totals, ['total'])
+
+        existing = {
+            (row.user_id, row.hour): row
+            for row in UserTransactionHour.objects.filter(user_id__in=list(hours), hour__in={h for by_hour in hours.values() for h in by_hour})
+        }
+        to_create = []
+        for user_id, by_hour in hours.items():
+            for hour, count in by_hour.items():
+                row = existing.get((user_id, hour))
+                if row is None:
+                    to_create.append(UserTransactionHour(user_id=user_id, hour=hour, currency_transactions=count))
+                else:
+                    row.currency_transactions += count
+        UserTransactionHour.objects.bulk_update(list(existing.values()), ['currency_transactions'])
+        UserTransactionHour.objects.bulk_create(to_create)
+        UserTransactionHour.objects.filter(hour__lt=now - HOURLY_RETENTION).delete()
+
+        _save_cursor(cursor)
+        return len(ids)
+
+
+def fold_inventory_transactions(now=None):
+    """Folds new InventoryTransaction rows into ItemCirculation."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        cursor = _lock_cursor(INVENTORY_CURSOR)
+        ids = _fold_window(InventoryTransaction, cursor, now)
+        increments = defaultdict(lambda: {'quantity': 0, 'transactions': 0})
+        for rows in _chunked_rows(InventoryTransaction, ids):
+            for row in rows.values('item_id').annotate(quantity=Sum('quantity'), count=Count('id')):
+                increments[row['item_id']]['quantity'] += row['quantity']
+                increments[row['item_id']]['transactions'] += row['count']
+        _add_to(ItemCirculation, increments, ['quantity', 'transactions'])
+
+        _save_cursor(cursor)
+        return len(ids)
+
+
+def fold_all(now=None):
+    return {
+        'currency_transactions': fold_currency_transactions(now),
+        'inventory_transactions': fold_inventory_transactions(now),
+    }
+
+
+def _held_quantities():
+    return {row['item_id']: row['quantity'] for row in InventoryItem.objects.values('item_id').annotate(quantity=Sum('quantity'))}
+
+
+def reconcile_item_circulation():
+    """
+    Resets ItemCirculation.quantity to what inventories hold, less the logged changes
+    not folded in yet. Some inventory changes, such as loot grants, are not logged, so
+    folding alone drifts. Returns the number of items corrected.
+    """
+    with transaction.atomic():
+        cursor = _lock_cursor(INVENTORY_CURSOR)
+        expected = _held_quantities()
+        for row in InventoryTransaction.objects.filter(_unfolded(cursor)).values('item_id').annotate(quantity=Sum('quantity')):
+            expected[row['item_id']] = expected.get(row['item_id'], 0) - row['quantity']
+        existing = ItemCirculation.objects.in_bulk()
+        to_update = [row for item_id, row in existing.items() if row.quantity != expected.get(item_id, 0)]
+        for row in to_update:
+            row.quantity = expected.get(row.item_id, 0)
+        to_create = [
+            ItemCirculation(item_id=item_id, quantity=quantity, transactions=0)
+            for item_id, quantity in expected.items() if quantity and item_id not in existing
+        ]
+        ItemCirculation.objects.bulk_update(to_update, ['quantity'])
+        ItemCirculation.objects.bulk_create(to_create)
+    return len(to_update) + len(to_create)
+
+
+def rebuild(now=None):
+    """Recomputes every rollup from the source tables and moves both cursors to the newest rows."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        currency_cursor = _lock_cursor(CURRENCY_CURSOR)
+        inventory_cursor = _lock_cursor(INVENTORY_CURSOR)
+        for cursor, model in ((currency_cursor, CurrencyTransaction), (inventory_cursor, InventoryTransaction)):
+            cursor.last_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+            cursor.gaps = {}
+
+        CurrencyCirculation.objects.all().delete()
+        CurrencyCirculation.objects.bulk_create([
+            CurrencyCirculation(currency_id=row['currency_id'], total=row['total'])
+            for row in CurrencyTransaction.objects.filter(id__lte=currency_cursor.last_id).values('currency_id').annotate(total=Sum('amount'))
+        ])
+
+        UserTransactionHour.objects.all().delete()
+        UserTransactionHour.objects.bulk_create([
+            UserTransactionHour(user_id=row['user_id'], hour=row['hour'], currency_transactions=row['count'])
+            for row in CurrencyTransaction.objects.filter(id__lte=currency_cursor.last_id, timestamp__gte=now - HOURLY_RETENTION)
+            .annotate(hour=TruncHour('timestamp')).values('user_id', 'hour').annotate(count=Count('id'))
+        ], batch_size=1000)
+
+        # Circulation is what inventories hold now; the transaction count comes from the log.
+        held = _held_quantities()
+        logged = {
+            row['item_id']: row['count']
+            for row in InventoryTransaction.objects.filter(id__lte=inventory_cursor.last_id).values('item_id').annotate(count=Count('id'))
+        }
+        ItemCirculation.objects.all().delete()
+        ItemCirculation.objects.bulk_create([
+            ItemCirculation(item_id=item_id, quantity=held.get(item_id, 0), transactions=logged.get(item_id, 0))
+            for item_id in set(held) | set(logged)
+        ], batch_size=1000)
+
+        _save_cursor(currency_cursor)
+        _save_cursor(inventory_cursor)
+
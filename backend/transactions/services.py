@@ -1,8 +1,13 @@
+from collections import namedtuple
 from django.db import transaction
-from .models import InventoryTransaction, CurrencyTransaction
-from accounts.models import User, UserCurrency
-from items.models import Item, InventoryItem
+from .models import InventoryTransaction
+from accounts.models import User
+from . import ledger
+from .ledger import LedgerEntry
+from items.models import Item, InventoryItem, InventorySummary
+from items.inventory_summary_service import InventorySummaryService
 
+GLOBAL_INVENTORY_LIMIT = 200
 
 def atomic_item_currency_transfer(user, item, item_delta, currency, currency_delta, action, source, metadata=None):
     """
@@ -18,17 +23,18 @@ def atomic_item_currency_transfer(user, item, item_delta, currency, currency_del
     with transaction.atomic():
         # --- Handle Item Transfer ---
         if item and item_delta != 0:
-            GLOBAL_INVENTORY_LIMIT = 200
             PER_ITEM_LIMIT = getattr(item, 'max_per_user', 99)
-            total_items = sum(i.quantity for i in InventoryItem.objects.filter(user=user))
+            total_items = InventorySummaryService.lock(user).total_quantity
             unique_id = metadata.get('unique_id')
 
             if unique_id:
+                already_held = InventoryItem.objects.filter(user=user, item=item, quantity__gt=0).exists()
                 inv = InventoryItem.objects.create(user=user, item=item, quantity=1, unique_id=unique_id, metadata=metadata)
                 before_qty = 0
                 new_item_qty = 1
                 if (total_items + 1) > GLOBAL_INVENTORY_LIMIT:
                     raise ValueError(f"Cannot hold more than {GLOBAL_INVENTORY_LIMIT} total items.")
+                InventorySummaryService.apply(user, 1, 0 if already_held else 1)
             else:
                 inv, _ = InventoryItem.objects.get_or_create(user=user, item=item, defaults={"quantity": 0})
                 before_qty = inv.quantity
@@ -40,6 +46,7 @@ def atomic_item_currency_transfer(user, item, item_delta, currency, currency_del
                         raise ValueError(f"Cannot hold more than {GLOBAL_INVENTORY_LIMIT} total items.")
                 inv.quantity = new_item_qty
                 inv.save()
+                InventorySummaryService.apply_stack_change(user, before_qty, new_item_qty)
             
             inv_tx = InventoryTransaction.objects.create(
                 user=user, item=item, quantity=item_delta, action=action, source=source,
@@ -48,16 +55,185 @@ def atomic_item_currency_transfer(user, item, item_delta, currency, currency_del
 
         # --- Handle Currency Transfer ---
         if currency and currency_delta != 0:
-            from accounts.models import Currency
-            currency_obj = Currency.objects.get(code=currency)
-            uc, _ = UserCurrency.objects.get_or_create(user=user, currency=currency_obj, defaults={"balance": 0})
-            before_bal = uc.balance
-            uc.balance += currency_delta
-            uc.save()
-            
-            cur_tx = CurrencyTransaction.objects.create(
-                user=user, currency=currency_obj, amount=currency_delta, action=action, source=source,
-                metadata=metadata, before_balance=before_bal, after_balance=uc.balance
-            )
+            from accounts.currency_registry import CurrencyRegistry
+            currency_obj = CurrencyRegistry.get().by_code(currency)
+            cur_tx = ledger.post([LedgerEntry(user, currency_obj, currency_delta, action, source, metadata)])[0]
 
     return inv_tx, cur_tx
+
+
+def atomic_use_item(inventory_item, action, source, metadata=None):
+    """
+    Uses up one unit of a specific inventory row: the row loses one unit, or is deleted
+    once empty, the user's summary is adjusted and an InventoryTransaction is logged.
+    distinct_items only drops if no other row of the same item is still held, which
+    matters for non-stackable items. Returns the InventoryTransaction.
+    """
+    with transaction.atomic():
+        inv = InventoryItem.objects.select_for_update().select_related('user').get(pk=inventory_item.pk)
+        before_qty = inv.quantity
+        if before_qty <= 1:
+            inv.delete()
+        else:
+            inv.quantity -= 1
+            inv.save(update_fields=['quantity'])
+        still_held = InventoryItem.objects.filter(user=inv.user, item_id=inv.item_id, quantity__gt=0).exists()
+        InventorySummaryService.apply(inv.user, -min(before_qty, 1), 0 if still_held else -1)
+        return InventoryTransaction.objects.create(
+            user=inv.user, item_id=inv.item_id, quantity=-1, action=action, source=source,
+            metadata=metadata or {}, before_quantity=before_qty, after_quantity=max(before_qty - 1, 0)
+        )
+
+
+def atomic_batch_item_grant(user, item_quantities, action, source, metadata=None):
+    """
+    Grants many items to one user in a single pass: items are loaded with in_bulk,
+    inventory capacity is checked once for the whole grant, existing stacks are
+    updated with one bulk_update, new stacks are created with one bulk_create and
+    all InventoryTransaction rows are written with one bulk_create.
+
+    item_quantities maps item IDs to the quantity to add. Unknown item IDs are skipped.
+    Returns (granted_items, inventory_transactions) where granted_items maps item IDs to Items.
+    Raises ValueError, without granting anything, if the grant would exceed a limit.
+    """
+    if metadata is None:
+        metadata = {}
+    item_quantities = {item_id: quantity for item_id, quantity in item_quantities.items() if quantity > 0}
+    if not item_quantities:
+        return {}, []
+
+    with transaction.atomic():
+        # The summary row doubles as the per-user inventory lock, so take it first.
+        total_items = InventorySummaryService.lock(user).total_quantity
+        items = Item.objects.in_bulk(list(item_quantities))
+
+        stacks = {}
+        held_item_ids = set()
+        for inv in InventoryItem.objects.select_for_update().filter(user=user, item_id__in=list(items)).order_by('id'):
+            stacks.setdefault(inv.item_id, inv)
+            if inv.quantity > 0:
+                held_item_ids.add(inv.item_id)
+
+        granted_total = sum(item_quantities[item_id] for item_id in items)
+        if total_items + granted_total > GLOBAL_INVENTORY_LIMIT:
+            raise ValueError(f"Cannot hold more than {GLOBAL_INVENTORY_LIMIT} total items.")
+
+        to_create, to_update, logs = [], [], []
+        for item_id, item in items.items():
+            quantity = item_quantities[item_id]
+            inv = stacks.get(item_id)
+            before_qty = inv.quantity if inv else 0
+            new_item_qty = before_qty + quantity
+            if new_item_qty > getattr(item, 'max_per_user', 99):
+                raise ValueError(f"Cannot hold more than {item.max_per_user} of {item.name}.")
+
+            if inv:
+                inv.quantity = new_item_qty
+                to_update.append(inv)
+            else:
+                to_create.append(InventoryItem(user=user, item=item, quantity=new_item_qty))
+
+            logs.append(InventoryTransaction(
+                user=user, item=item, quantity=quantity, action=action, source=source,
+                metadata=metadata, before_quantity=before_qty, after_quantity=new_item_qty
+            ))
+
+        InventoryItem.objects.bulk_update(to_update, ['quantity'])
+        InventoryItem.objects.bulk_create(to_create)
+        inventory_transactions = InventoryTransaction.objects.bulk_create(logs)
+        InventorySummaryService.apply(user, granted_total, len(set(items) - held_item_ids))
+
+    return items, inventory_transactions
+
+
+TransferOperation = namedtuple('TransferOperation', ['user', 'target', 'delta', 'action', 'source', 'metadata'], defaults=[None])
+
+
+def atomic_batch_transfer(operations):
+    """
+    Applies many item and currency transfers, for any number of users, in one transaction.
+
+    Each operation is a (user, target, delta, action, source, metadata) tuple, where target
+    is an Item, a Currency or a currency code. Operations are applied in the order given,
+    with the same limits as atomic_item_currency_transfer. Currency codes are resolved from
+    the in-memory CurrencyRegistry. Inventory summaries and stacks are locked in (user, item)
+    order so overlapping batches cannot deadlock, and stacks are written with bulk updates and bulk inserts.
+    Currency changes are one ledger.post(), which only locks the accounts being debited.
+
+    Returns (inventory_transactions, currency_transactions).
+    Raises ValueError, and applies nothing, if any operation breaks a limit.
+    """
+    from accounts.currency_registry import CurrencyRegistry
+
+    operations = [TransferOperation(*operation) for operation in operations]
+    operations = [operation._replace(metadata=operation.metadata or {}) for operation in operations if operation.delta]
+    item_ops = [operation for operation in operations if isinstance(operation.target, Item)]
+    currency_ops = [operation for operation in operations if not isinstance(operation.target, Item)]
+
+    codes = {operation.target for operation in currency_ops if isinstance(operation.target, str)}
+    currencies = CurrencyRegistry.get().many(codes)
+    currency_ops = [
+        operation._replace(target=currencies[operation.target]) if isinstance(operation.target, str) else operation
+        for operation in currency_ops
+    ]
+
+    with transaction.atomic():
+        inventory_transactions = _apply_item_operations(item_ops)
+        currency_transactions = _apply_currency_operations(currency_ops)
+    return inventory_transactions, currency_transactions
+
+
+def _apply_item_operations(operations):
+    if not operations:
+        return []
+
+    summaries = InventorySummaryService.lock_many(operation.user.id for operation in operations)
+    stacks = {}
+    for inv in InventoryItem.objects.select_for_update().filter(
+        user_id__in=list(summaries), item_id__in={operation.target.id for operation in operations}
+    ).order_by('user_id', 'item_id', 'id'):
+        stacks.setdefault((inv.user_id, inv.item_id), inv)
+
+    totals = {user_id: summary.total_quantity for user_id, summary in summaries.items()}
+    starting = {key: inv.quantity for key, inv in stacks.items()}
+    to_create = {}
+    logs = []
+    for operation in operations:
+        user, item, delta = operation.user, operation.target, operation.delta
+        key = (user.id, item.id)
+        inv = stacks.get(key)
+        if inv is None:
+            inv = stacks[key] = to_create[key] = InventoryItem(user=user, item=item, quantity=0)
+        before_qty = inv.quantity
+        new_item_qty = before_qty + delta
+        if delta > 0:
+            if new_item_qty > getattr(item, 'max_per_user', 99):
+                raise ValueError(f"{user.username} cannot hold more than {item.max_per_user} of {item.name}.")
+            if totals[user.id] + delta > GLOBAL_INVENTORY_LIMIT:
+                raise ValueError(f"{user.username} cannot hold more than {GLOBAL_INVENTORY_LIMIT} total items.")
+        elif new_item_qty < 0:
+            raise ValueError(f"{user.username} does not have {-delta} of {item.name}.")
+        inv.quantity = new_item_qty
+        totals[user.id] += delta
+        logs.append(InventoryTransaction(
+            user=user, item=item, quantity=delta, action=operation.action, source=operation.source,
+            metadata=operation.metadata, before_quantity=before_qty, after_quantity=new_item_qty
+        ))
+
+    for key, inv in stacks.items():
+        before, after = starting.get(key, 0), inv.quantity
+        summary = summaries[key[0]]
+        summary.distinct_items += (after > 0) - (before > 0)
+        summary.total_quantity = totals[key[0]]
+
+    InventoryItem.objects.bulk_update([inv for key, inv in stacks.items() if key not in to_create], ['quantity'])
+    InventoryItem.objects.bulk_create(list(to_create.values()))
+    InventorySummary.objects.bulk_update(list(summaries.values()), ['total_quantity', 'distinct_items'])
+    return InventoryTransaction.objects.bulk_create(logs)
+
+
+def _apply_currency_operations(operations):
+    return ledger.post([
+        LedgerEntry(operation.user, operation.target, operation.delta, operation.action, operation.source, operation.metadata)
+        for operation in operations
+    ])
@@ -0,0 +1,41 @@
+import logging
+from celery import shared_task
+from . import ledger, rollups
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def snapshot_currency_balances():
+    """Periodic task that folds new ledger entries into the UserCurrency balance snapshots."""
+    updated = ledger.take_snapshots()
+    if updated:
+        logger.info("Snapshotted %d currency balances.", updated)
+    return updated
+
+
+@shared_task
+def verify_currency_ledger(repair=False):
+    """Daily task that rebuilds every balance snapshot from the ledger, reports disagreements and, with repair, fixes them."""
+    mismatches = ledger.verify_balances(repair=repair)
+    for user_id, currency_id, snapshot_balance, rebuilt in mismatches[:50]:
+        logger.warning(
+            "Currency snapshot mismatch for user %d, currency %d: %s in the snapshot, %s in the ledger.",
+            user_id, currency_id, snapshot_balance, rebuilt,
+        )
+    return len(mismatches)
+
+
+@shared_task
+def fold_economy_rollups():
+    """Periodic task that folds new currency and inventory transactions into the dashboard rollups."""
+    return rollups.fold_all()
+
+
+@shared_task
+def reconcile_item_circulation():
+    """Daily task that corrects ItemCirculation for inventory changes that were never logged."""
+    corrected = rollups.reconcile_item_circulation()
+    if corrected:
+        logger.info("Corrected the circulation of %d items.", corrected)
+    return corrected
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+from accounts.currency_registry import CurrencyRegistry
+from accounts.models import User, Currency, UserCurrency
+from items.models import Item, InventoryItem
+from . import ledger, rollups
+from .currency_services import convert_currency
+from .models import CurrencyTransaction, CurrencyCirculation, ItemCirculation, RollupCursor, UserTransactionHour
+from .services import atomic_item_currency_transfer
+
+
+class CurrencyLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='saver@example.com', username='saver', password='testpassword')
+        self.gold = Currency.objects.create(name='Gold', code='G')
+        self.gems = Currency.objects.create(name='Gems', code='GEM')
+        CurrencyRegistry._bump_version()
+
+    def snapshot(self):
+        return ledger.take_snapshots(now=timezone.now() + timedelta(minutes=5))
+
+    def test_credit_is_a_single_insert(self):
+        with self.assertNumQueries(1):
+            ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        self.assertEqual(ledger.balance(self.user, self.gold), 40)
+
+    def test_debits_cannot_overdraw(self):
+        ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        ledger.debit(self.user, self.gold, 30, 'purchase', 'test')
+        with self.assertRaises(ValueError):
+            ledger.debit(self.user, self.gold, 11, 'purchase', 'test')
+        self.assertEqual(ledger.balance(self.user, self.gold), 10)
+        self.assertEqual(CurrencyTransaction.objects.filter(user=self.user).count(), 2)
+
+    def test_snapshots_fold_entries_and_reads_add_the_rest(self):
+        ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        convert_currency(self.user, self.gold, self.gems, 10, 2)
+        self.assertEqual(self.snapshot(), 2)
+        self.assertEqual(UserCurrency.objects.get(user=self.user, currency=self.gold).balance, 30)
+
+        ledger.credit(self.user, self.gems, 5, 'reward', 'test')
+        self.assertEqual(ledger.balances(self.user), {self.gold.id: Decimal('30'), self.gems.id: Decimal('25')})
+        self.assertEqual(self.snapshot(), 1)
+        self.assertEqual(self.snapshot(), 0)
+
+    def test_snapshots_wait_for_entries_that_have_not_committed(self):
+        ledger.credit(self.user, self.gold, 1, 'reward', 'test')
+        self.snapshot()
+        late = ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        ledger.credit(self.user, self.gems, 5, 'reward', 'test')
+        # Pretend the gold entry's transaction had not committed when the pass ran.
+        CurrencyTransaction.objects.filter(pk=late.pk).delete()
+        self.assertEqual(self.snapshot(), 0)
+
+        late.save(force_insert=True)
+        self.assertEqual(self.snapshot(), 2)
+        self.assertEqual(UserCurrency.objects.get(user=self.user, currency=self.gold).balance, 41)
+        self.assertEqual(ledger.verify_balances(), [])
+
+    def test_snapshots_give_up_on_rolled_back_ids(self):
+        ledger.credit(self.user, self.gold, 1, 'reward', 'test')
+        self.snapshot()
+        rolled_back = ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        ledger.credit(self.user, self.gems, 5, 'reward', 'test')
+        CurrencyTransaction.objects.filter(pk=rolled_back.pk).delete()
+
+        later = timezone.now() + ledger.SNAPSHOT_GAP_TIMEOUT + timedelta(minutes=1)
+        self.assertEqual(ledger.take_snapshots(now=later), 1)
+        self.assertEqual(ledger.balances(self.user), {self.gold.id: Decimal('1'), self.gems.id: Decimal('5')})
+
+    def test_verify_rebuilds_snapshots_from_entries(self):
+        ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        self.snapshot()
+        UserCurrency.objects.filter(user=self.user, currency=self.gold).update(balance=999)
+
+        self.assertEqual(ledger.verify_balances(chunk_size=1, repair=True), [(self.user.id, self.gold.id, Decimal('999'), Decimal('40'))])
+        self.assertEqual(ledger.verify_balances(), [])
+        self.assertEqual(ledger.balance(self.user, self.gold), 40)
+
+
+class EconomyRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='trader@example.com', username='trader', password='testpassword')
+        self.gold = Currency.objects.create(name='Gold', code='G')
+        CurrencyRegistry._bump_version()
+        self.sword = Item.objects.create(name='Sword', base_price=10)
+        self.later = timezone.now() + timedelta(minutes=5)
+
+    def test_folds_only_new_rows(self):
+        ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        atomic_item_currency_transfer(self.user, self.sword, 3, 'G', -15, 'purchase', 'test')
+        self.assertEqual(rollups.fold_all(now=self.later), {'currency_transactions': 2, 'inventory_transactions': 1})
+        self.assertEqual(rollups.fold_all(now=self.later), {'currency_transactions': 0, 'inventory_transactions': 0})
+
+        ledger.credit(self.user, self.gold, 5, 'reward', 'test')
+        rollups.fold_all(now=self.later)
+        self.assertEqual(CurrencyCirculation.objects.get(currency=self.gold).total, 30)
+        self.assertEqual(ItemCirculation.objects.get(item=self.sword).quantity, 3)
+        self.assertEqual(UserTransactionHour.objects.filter(user=self.user).aggregate(total=Sum('currency_transactions'))['total'], 3)
+
+    def test_rebuild_matches_folding(self):
+        ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        atomic_item_currency_transfer(self.user, self.sword, 2, None, 0, 'gain', 'test')
+        rollups.rebuild()
+        self.assertEqual(CurrencyCirculation.objects.get(currency=self.gold).total, 40)
+        self.assertEqual(ItemCirculation.objects.get(item=self.sword).transactions, 1)
+        self.assertEqual(rollups.fold_all(now=self.later), {'currency_transactions': 0, 'inventory_transactions': 0})
+
+    def test_rows_committed_below_the_cursor_are_folded_once(self):
+        ledger.credit(self.user, self.gold, 1, 'reward', 'test')
+        rollups.fold_currency_transactions(now=self.later)
+        late = ledger.credit(self.user, self.gold, 40, 'reward', 'test')
+        ledger.credit(self.user, self.gold, 5, 'reward', 'test')
+        # Pretend the first entry's transaction had not committed when the fold ran.
+        CurrencyTransaction.objects.filter(pk=late.pk).delete()
+        self.assertEqual(rollups.fold_currency_transactions(now=self.later), 1)
+        self.assertIn(str(late.pk), RollupCursor.objects.get(name=rollups.CURRENCY_CURSOR).gaps)
+
+        late.save(force_insert=True)
+        self.assertEqual(rollups.fold_currency_transactions(now=self.later), 1)
+        self.assertEqual(rollups.fold_currency_transactions(now=self.later), 0)
+        self.assertEqual(CurrencyCirculation.objects.get(currency=self.gold).total, 46)
+        self.assertEqual(RollupCursor.objects.get(name=rollups.CURRENCY_CURSOR).gaps, {})
+
+    def test_reconcile_corrects_unlogged_inventory_changes(self):
+        atomic_item_currency_transfer(self.user, self.sword, 3, None, 0, 'gain', 'test')
+        rollups.fold_all(now=self.later)
+        InventoryItem.objects.filter(user=self.user, item=self.sword).update(quantity=1)
+        atomic_item_currency_transfer(self.user, self.sword, 2, None, 0, 'gain', 'test')
+
+        self.assertEqual(rollups.reconcile_item_circulation(), 1)
+        rollups.fold_all(now=self.later)
+        self.assertEqual(ItemCirculation.objects.get(item=self.sword).quantity, 3)
+        self.assertEqual(rollups.reconcile_item_circulation(), 0)